@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+'''
+Seen-listings benchmark: memory-mapped Bloom filter vs a Python set and SQLite
+
+Incremental scrapes ask, for every listing on a results page, whether its eBay
+item id was stored before. This script fills mtgscraper.bloom.BloomFilter, a
+Python set and the exact SQLite store of mtgscraper.seen with the same random
+item ids, then times lookups of ids that were added and of ids that were not.
+It reports the memory or disk each one takes per id, and the Bloom filter's
+measured false positive rate against the rate it was sized for.
+
+Usage:
+    python benchmarks/bloom_filter.py
+    python benchmarks/bloom_filter.py --ids 10000000 --error-rate 0.001
+'''
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+
+def item_ids(count, seed):
+    '''
+    count distinct ids shaped like eBay item ids (12 digits)
+    '''
+    rng = random.Random(seed)
+    return rng.sample(range(100_000_000_000, 400_000_000_000), count)
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ids', type=int, default=1000000, help='Item ids added to each store')
+    parser.add_argument('--lookups', type=int, default=200000, help='Ids looked up, half added and half not')
+    parser.add_argument('--error-rate', type=float, default=0.0001, help='False positive rate of the Bloom filter')
+    args = parser.parse_args()
+    
+    from mtgscraper.bloom import BloomFilter
+    from mtgscraper.seen import SeenListings
+    
+    ids = item_ids(args.ids + args.lookups // 2, seed=42)
+    added, absent = ids[:args.ids], ids[args.ids:]
+    present = random.Random(7).sample(added, args.lookups // 2)
+    
+    tracemalloc.start()
+    seen_set, set_add = timed(set, added)
+    # The table, plus the int objects it keeps alive
+    set_bytes = tracemalloc.get_traced_memory()[0] + sum(sys.getsizeof(i) for i in added)
+    tracemalloc.stop()
+    _, set_lookup = timed(lambda: [i in seen_set for i in present + absent])
+    
+    with tempfile.TemporaryDirectory() as directory:
+        bloom_path = os.path.join(directory, 'seen.bloom')
+        bloom = BloomFilter(bloom_path, args.ids, args.error_rate)
+        _, bloom_add = timed(bloom.add_many, added)
+        _, bloom_lookup = timed(bloom.contains_many, present + absent)
+        false_positives = len(bloom.contains_many(absent))
+        bloom.close()
+        bloom_bytes = os.path.getsize(bloom_path)
+        
+        sqlite_path = os.path.join(directory, 'seen.db')
+        store = SeenListings(sqlite_path)
+        _, sqlite_add = timed(store.add, added)
+        _, sqlite_lookup = timed(store.known, present + absent)
+        store.close()
+        sqlite_bytes = os.path.getsize(sqlite_path)
+    
+    lookups = len(present) + len(absent)
+    print(f'{args.ids:,} ids, {lookups:,} lookups')
+    print()
+    for name, size, add, lookup in (
+        ('Python set', set_bytes, set_add, set_lookup),
+        ('Bloom filter (mmap)', bloom_bytes, bloom_add, bloom_lookup),
+        ('SQLite set', sqlite_bytes, sqlite_add, sqlite_lookup),
+    ):
+        print(f'  {name:20} {size / args.ids:6.1f} bytes/id  {size / 2 ** 20:8.1f} MiB  '
+              f'add {args.ids / add:12,.0f} ids/s  lookup {lookups / lookup:12,.0f} ids/s')
+    print()
+    print(f'  Bloom filter false positives: {false_positives:,} of {len(absent):,} '
+          f'({false_positives / len(absent):.4%}, sized for {args.error_rate:.4%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+'''
+Card filter benchmark: LIKE '%...%' scan vs the FTS5 search index
+
+Generates a synthetic mtg_cards.db (see dbt_backends.py), builds the search
+index with mtgscraper.search and times the newest-listings card filter the
+view command runs, once with the old LIKE condition and once through the index,
+for filters that match many, few and no listings. The first matches are near
+the newest rows for common names, which is where LIKE does best.
+
+Usage:
+    python benchmarks/card_search.py
+    python benchmarks/card_search.py --rows 5000000 --keep
+'''
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+FILTERS = ['Card 4999', 'card 12', 'Revised', 'Modern Masters', 'no such card']
+
+
+def best_time(connection, query, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        rows = connection.execute(query).all()
+        timings.append(time.perf_counter() - started)
+    return min(timings), len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='Synthetic listings to generate')
+    parser.add_argument('--limit', type=int, default=20, help='Listings per lookup, as in the view command')
+    parser.add_argument('--runs', type=int, default=3, help='Times each lookup is run; the fastest is reported')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated database and print its path')
+    args = parser.parse_args()
+    
+    from sqlalchemy import create_engine, select
+    from benchmarks.dbt_backends import generate_database
+    from mtgscraper.pipelines import MtgCard
+    from mtgscraper.search import ensure_search_index, listing_condition
+    
+    workdir = tempfile.mkdtemp(prefix='mtg_search_')
+    path = os.path.join(workdir, 'mtg_cards.db')
+    try:
+        print(f'Generating {args.rows:,} listings...')
+        generate_database(path, args.rows)
+        engine = create_engine(f'sqlite:///{path}')
+        
+        started = time.perf_counter()
+        if not ensure_search_index(engine):
+            sys.exit('This SQLite build has no FTS5')
+        print(f'Search index built in {time.perf_counter() - started:.2f} s, '
+              f'database {os.path.getsize(path) / 1024 / 1024:,.0f} MB')
+        print()
+        print(f'  {"filter":16} {"LIKE":>10} {"FTS5":>10}  rows')
+        
+        newest = select(MtgCard.id, MtgCard.card_name).order_by(MtgCard.id.desc()).limit(args.limit)
+        with engine.connect() as connection:
+            for text in FILTERS:
+                like, like_rows = best_time(
+                    connection, newest.where(MtgCard.card_name.like(f'%{text}%')), args.runs
+                )
+                fts, fts_rows = best_time(
+                    connection, newest.where(listing_condition(engine, text, limit=args.limit)), args.runs
+                )
+                print(f'  {text:16} {like * 1000:8.1f}ms {fts * 1000:8.1f}ms  {like_rows}/{fts_rows}')
+    finally:
+        if args.keep:
+            print(f'\nKept {path}')
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+'''
+dbt backend benchmark: SQLite (dev target) vs DuckDB (duckdb target)
+
+Generates a synthetic mtg_cards.db, copies the dbt project next to it and
+times `dbt run` for each target, then prints wall time and per-model
+execution times from run_results.json. The project directory is never
+touched; everything runs in a temporary directory.
+
+Requires dbt-core with dbt-sqlite and dbt-duckdb installed.
+
+Usage:
+    python benchmarks/dbt_backends.py
+    python benchmarks/dbt_backends.py --rows 1000000 --runs 3
+    python benchmarks/dbt_backends.py --targets duckdb --keep
+'''
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+PROJECT_FILES = ['dbt_project.yml', 'profiles.yml', 'packages.yml', 'models', 'macros']
+
+SOURCES = ['eBay API (Official)', 'eBay (Playwright)', 'eBay (Scrapy)']
+SETS = ['Alpha', 'Beta', 'Unlimited', 'Revised', 'Modern Masters']
+CONDITIONS = ['New', 'Near Mint', 'Lightly Played', 'Played']
+
+
+def generate_database(path, rows, cards=5000, days=90):
+    '''
+    Write a mtg_cards table with the same columns and value formats the scraper produces
+    '''
+    from mtgscraper.normalize import NORMALIZED_COLUMNS, normalize_listing
+    
+    rng = random.Random(42)
+    start = datetime(2026, 1, 1)
+    base_prices = [rng.uniform(0.5, 2000) for _ in range(cards)]
+    
+    connection = sqlite3.connect(path)
+    connection.execute('''
+        CREATE TABLE mtg_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            card_name VARCHAR, set_name VARCHAR, price VARCHAR, condition VARCHAR,
+            seller VARCHAR, url VARCHAR, source VARCHAR, timestamp VARCHAR,
+            shipping VARCHAR, buy_it_now BOOLEAN,
+            price_value FLOAT, price_max FLOAT, currency VARCHAR,
+            shipping_value FLOAT, condition_normalized VARCHAR,
+            title VARCHAR, foil BOOLEAN
+        )
+    ''')
+    columns = ['card_name', 'set_name', 'price', 'condition', 'seller', 'url', 'source', 'timestamp', 'shipping', 'buy_it_now']
+    
+    def listings():
+        for i in range(rows):
+            card = rng.randrange(cards)
+            price = base_prices[card] * rng.uniform(0.7, 1.3)
+            scraped = start + timedelta(days=rng.randrange(days), seconds=rng.randrange(86400))
+            listing = dict(zip(columns, (
+                f'Card {card}',
+                SETS[card % len(SETS)],
+                f'${price:,.2f}',
+                rng.choice(CONDITIONS),
+                f'seller_{rng.randrange(2000)}',
+                f'https://www.ebay.com/itm/{i}',
+                rng.choice(SOURCES),
+                scraped.isoformat(),
+                'Free shipping' if i % 3 else '$4.99 shipping',
+                bool(i % 2),
+            )))
+            normalized = dict(listing, **normalize_listing(listing))
+            yield tuple(normalized[name] for name in names)
+    
+    names = columns + NORMALIZED_COLUMNS + ['title', 'foil']
+    connection.executemany(
+        f'INSERT INTO mtg_cards ({", ".join(names)}) VALUES ({", ".join("?" * len(names))})',
+        listings()
+    )
+    connection.commit()
+    connection.close()
+
+
+def run_target(workdir, target):
+    '''
+    Run `dbt run` for one target and return (wall_seconds, {model: execution_seconds})
+    '''
+    started = time.perf_counter()
+    result = subprocess.run(
+        ['dbt', 'run', '--profiles-dir', '.', '--target', target],
+        cwd=workdir,
+        capture_output=True,
+        text=True
+    )
+    wall = time.perf_counter() - started
+    
+    if result.returncode != 0:
+        raise RuntimeError(f'dbt run --target {target} failed:\n{result.stdout}{result.stderr}')
+    
+    with open(os.path.join(workdir, 'target', 'run_results.json')) as f:
+        run_results = json.load(f)
+    models = {
+        entry['unique_id'].split('.')[-1]: entry['execution_time']
+        for entry in run_results['results']
+    }
+    return wall, models
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='Synthetic listings to generate')
+    parser.add_argument('--runs', type=int, default=1, help='dbt runs per target; the fastest is reported')
+    parser.add_argument('--targets', default='dev,duckdb', help='Comma separated profiles.yml targets')
+    parser.add_argument('--keep', action='store_true', help='Keep the temporary project directory')
+    args = parser.parse_args()
+    
+    if shutil.which('dbt') is None:
+        print('dbt is not installed! Install with: pip install dbt-core dbt-sqlite dbt-duckdb')
+        sys.exit(1)
+    
+    workdir = tempfile.mkdtemp(prefix='mtg-dbt-bench-')
+    try:
+        for name in PROJECT_FILES:
+            source = os.path.join(PROJECT_DIR, name)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(workdir, name))
+            elif os.path.exists(source):
+                shutil.copy(source, workdir)
+        
+        print(f'Generating {args.rows:,} listings...')
+        started = time.perf_counter()
+        generate_database(os.path.join(workdir, 'mtg_cards.db'), args.rows)
+        print(f'  done in {time.perf_counter() - started:.1f} s')
+        print()
+        
+        targets = args.targets.split(',')
+        results = {}
+        for target in targets:
+            runs = [run_target(workdir, target) for _ in range(args.runs)]
+            results[target] = min(runs, key=lambda run: run[0])
+            print(f'dbt run --target {target}: {results[target][0]:.2f} s')
+        
+        models = sorted({model for _, timings in results.values() for model in timings})
+        print()
+        print(f'{"model":24}' + ''.join(f'{target:>12}' for target in targets))
+        for model in models:
+            print(f'{model:24}' + ''.join(f'{results[target][1].get(model, 0.0):>11.2f}s' for target in targets))
+        print(f'{"wall time (dbt run)":24}' + ''.join(f'{results[target][0]:>11.2f}s' for target in targets))
+    finally:
+        if args.keep:
+            print()
+            print(f'Project kept in {workdir}')
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
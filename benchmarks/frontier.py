@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+
+'''
+Offline check and benchmark for the shared request frontier
+
+Runs mtgscraper.frontier against each backend. It checks that requests come out
+by priority and first in, first out within a priority, that requests a
+crawler took but did not hand out go back to the queue when it closes, and
+that several crawlers popping at once get every request exactly once, with
+how the requests were split between them. It also checks
+that fingerprints filter duplicates, and that FrontierScheduler round-trips
+Scrapy requests and drops its fingerprints when a crawl finishes. It then
+times pushes and pops. By default Redis is an in-process fakeredis server,
+so no Redis is needed. Pass --redis-url to run against a real server instead.
+
+Usage:
+    pip install fakeredis
+    python benchmarks/frontier.py
+    python benchmarks/frontier.py --requests 100000 --consumers 8
+    python benchmarks/frontier.py --redis-url redis://localhost:6379/15
+'''
+
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+
+def check_order(frontier, key):
+    '''
+    Higher priorities first, then the order requests were pushed in
+    '''
+    pushed = [(b'low-1', -1), (b'mid-1', 0), (b'high-1', 5), (b'mid-2', 0), (b'low-2', -1), (b'high-2', 5)]
+    for data, priority in pushed:
+        frontier.push(key, data, priority)
+    popped = [frontier.pop(key) for _ in pushed]
+    expected = [b'high-1', b'high-2', b'mid-1', b'mid-2', b'low-1', b'low-2']
+    return popped == expected and frontier.pop(key) is None
+
+
+def check_give_back(open_frontier, key):
+    '''
+    Close a frontier after one pop: the rest of the queue is still there, in order
+    '''
+    frontier = open_frontier()
+    for i in range(5):
+        frontier.push(key, str(i).encode())
+    first = frontier.pop(key)
+    frontier.close()
+    
+    frontier = open_frontier()
+    rest = [frontier.pop(key) for _ in range(5)]
+    frontier.close()
+    return first == b'0' and rest == [b'1', b'2', b'3', b'4', None]
+
+
+def check_fingerprints(frontier, key):
+    first = frontier.add_fingerprint(key, b'fingerprint')
+    again = frontier.add_fingerprint(key, b'fingerprint')
+    frontier.clear_fingerprints(key)
+    cleared = frontier.add_fingerprint(key, b'fingerprint')
+    frontier.clear(key)
+    return first and not again and cleared
+
+
+def check_consumers(open_frontier, key, requests, consumers, work):
+    '''
+    Pop a queue from several threads, each with its own connection as separate
+    crawlers would, pausing work seconds after each request in place of the
+    crawl; returns the number of requests popped more or less than once and
+    how many each thread got
+    '''
+    frontier = open_frontier()
+    for i in range(requests):
+        frontier.push(key, str(i).encode())
+    frontier.close()
+    
+    popped = [[] for _ in range(consumers)]
+    start = threading.Barrier(consumers)
+    
+    def consume(index):
+        own = open_frontier()
+        start.wait()
+        while True:
+            data = own.pop(key)
+            if data is None:
+                break
+            popped[index].append(data)
+            if work:
+                time.sleep(work)
+        own.close()
+    
+    threads = [threading.Thread(target=consume, args=(index,)) for index in range(consumers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    counts = {}
+    for data in (data for batch in popped for data in batch):
+        counts[data] = counts.get(data, 0) + 1
+    wrong = sum(1 for i in range(requests) if counts.get(str(i).encode()) != 1)
+    return wrong, [len(batch) for batch in popped]
+
+
+def check_scheduler(open_frontier, key):
+    '''
+    FrontierScheduler with FrontierDupeFilter: a request comes back with its
+    callback, meta and priority, a duplicate is filtered, and finishing with
+    nothing queued drops the fingerprints unless persist is set
+    '''
+    import scrapy
+    from scrapy.utils.request import RequestFingerprinter
+    from scrapy.utils.test import get_crawler
+    from mtgscraper.frontier import FrontierDupeFilter, FrontierScheduler
+    
+    class CheckSpider(scrapy.Spider):
+        name = 'frontier-check'
+        
+        def parse_page(self, response):
+            pass
+    
+    crawler = get_crawler(CheckSpider)
+    spider = CheckSpider.from_crawler(crawler)
+    results = []
+    for persist in (False, True):
+        frontier = open_frontier()
+        dupefilter = FrontierDupeFilter(frontier, key, RequestFingerprinter())
+        scheduler = FrontierScheduler(frontier, key, dupefilter, crawler.stats, persist=persist)
+        scheduler.open(spider)
+        request = scrapy.Request(
+            'https://www.ebay.com/sch/i.html?_nkw=black+lotus&_pgn=2',
+            callback=spider.parse_page,
+            meta={'card': 'Black Lotus', 'page': 2},
+            priority=3,
+        )
+        queued = scheduler.enqueue_request(request)
+        duplicate = scheduler.enqueue_request(request.replace())
+        restored = scheduler.next_request()
+        empty = scheduler.next_request() is None
+        scheduler.close('finished')
+        
+        frontier = open_frontier()
+        kept = not frontier.add_fingerprint(key, RequestFingerprinter().fingerprint(request))
+        frontier.clear(key)
+        frontier.close()
+        results.append(
+            queued and not duplicate and empty and restored is not None
+            and restored.url == request.url and restored.callback == spider.parse_page
+            and restored.meta.get('card') == 'Black Lotus' and restored.priority == 3
+            and kept == persist
+        )
+    return all(results)
+
+
+def time_push_pop(frontier, key, requests):
+    data = pickle.dumps({'url': 'https://www.ebay.com/sch/i.html?_nkw=black+lotus', 'meta': {'page': 1}})
+    started = time.perf_counter()
+    for i in range(requests):
+        frontier.push(key, data, i % 3)
+    pushed = time.perf_counter() - started
+    started = time.perf_counter()
+    while frontier.pop(key) is not None:
+        pass
+    popped = time.perf_counter() - started
+    frontier.clear(key)
+    return requests / pushed, requests / popped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000, help='Requests pushed and popped per backend')
+    parser.add_argument('--consumers', type=int, default=4, help='Threads popping one queue at once')
+    parser.add_argument('--work-ms', type=float, default=0.1, help='Pause of each consumer after a request, in place of the crawl')
+    parser.add_argument('--redis-url', help='Redis server to use; defaults to an in-process fakeredis server')
+    args = parser.parse_args()
+    
+    from mtgscraper.frontier import RedisFrontier, SQLiteFrontier, connect
+    
+    if args.redis_url:
+        def open_redis():
+            return connect(args.redis_url)
+    else:
+        try:
+            import fakeredis
+        except ImportError:
+            print('fakeredis is not installed! Install with: pip install fakeredis')
+            sys.exit(1)
+        server = fakeredis.FakeServer()
+        
+        def open_redis():
+            return RedisFrontier(fakeredis.FakeRedis(server=server))
+    
+    key = f'frontier-check-{os.getpid()}'
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'frontier.db')
+        
+        def open_sqlite():
+            return SQLiteFrontier(path)
+        
+        print(f'{args.requests:,} requests, {args.consumers} consumers')
+        print()
+        for name, open_frontier in (('sqlite', open_sqlite), ('redis', open_redis)):
+            frontier = open_frontier()
+            frontier.clear(key)
+            if not check_order(frontier, key):
+                failures.append(f'{name}: requests did not come out by priority, then first in, first out')
+            if not check_give_back(open_frontier, key):
+                failures.append(f'{name}: requests taken but not handed out were lost or reordered on close')
+            if not check_fingerprints(frontier, key):
+                failures.append(f'{name}: fingerprints did not filter duplicates or were not cleared')
+            push_rate, pop_rate = time_push_pop(frontier, key, args.requests)
+            frontier.close()
+            
+            wrong, shares = check_consumers(open_frontier, key, args.requests, args.consumers, args.work_ms / 1000)
+            if wrong:
+                failures.append(f'{name}: {wrong} requests were popped more or less than once')
+            if not check_scheduler(open_frontier, key):
+                failures.append(f'{name}: FrontierScheduler did not round-trip, filter or clean up requests')
+            
+            print(f'  {name:7} push {push_rate:10,.0f} requests/s  pop {pop_rate:10,.0f} requests/s  '
+                  f'consumers got {"/".join(str(share) for share in shares)}')
+    
+    if failures:
+        print()
+        for failure in failures:
+            print(f'FAIL: {failure}')
+        sys.exit(1)
+    
+    print()
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
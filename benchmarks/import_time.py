@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+'''
+Import-time benchmark for the mtgscraper.py CLI entry point
+
+Runs `python -X importtime mtgscraper.py --help` and reports the total
+import time and the slowest modules. Exits non-zero when startup exceeds
+the budget or when a heavy module is imported before any command runs,
+so it can be used as a guard in CI or before a release.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-ms 150 --runs 5
+'''
+
+import argparse
+import os
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINT = os.path.join(PROJECT_DIR, 'mtgscraper.py')
+
+# Modules that must only load inside the commands that need them
+HEAVY_MODULES = [
+    'sqlalchemy',
+    'tabulate',
+    'pyfiglet',
+    'scrapy',
+    'twisted',
+    'playwright',
+    'boto3',
+    'requests',
+]
+
+
+def measure_once():
+    '''
+    Run the entry point once and parse the -X importtime report
+    Returns (total_us, {module: cumulative_us})
+    '''
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', ENTRY_POINT, '--help'],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'CLI failed to start:\n{result.stderr}')
+
+    total_us = 0
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total_us += int(self_us)
+        # Nested imports are indented; keep the indentation to spot top-level ones
+        cumulative[name.rstrip()[1:]] = int(cumulative_us)
+
+    return total_us, cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=150.0, help='Maximum allowed import time (best of runs)')
+    parser.add_argument('--runs', type=int, default=5, help='Number of runs; the fastest is compared to the budget')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest top-level imports to print')
+    args = parser.parse_args()
+
+    timings = [measure_once() for _ in range(args.runs)]
+    best_us, cumulative = min(timings, key=lambda t: t[0])
+    best_ms = best_us / 1000
+
+    print(f'Import time (best of {args.runs}): {best_ms:.1f} ms (budget {args.budget_ms:.0f} ms)')
+    print()
+    print('Slowest top-level imports:')
+    top_level = {name: us for name, us in cumulative.items() if not name.startswith(' ')}
+    for name, us in sorted(top_level.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f'  {us / 1000:8.1f} ms  {name}')
+
+    failures = []
+    loaded_heavy = sorted({name.strip().split('.')[0] for name in cumulative} & set(HEAVY_MODULES))
+    if loaded_heavy:
+        failures.append(f'heavy modules imported at startup: {", ".join(loaded_heavy)}')
+    if best_ms > args.budget_ms:
+        failures.append(f'import time {best_ms:.1f} ms exceeds budget of {args.budget_ms:.0f} ms')
+
+    if failures:
+        print()
+        for failure in failures:
+            print(f'FAIL: {failure}')
+        sys.exit(1)
+
+    print()
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+'''
+Item benchmark: scrapy.Item with ORM writes vs slotted MtgListing rows
+
+The eBay spider used to fill an MtgCardItem (a scrapy.Item, one dict per
+instance) for every listing. MtgScraperPipeline then wrapped it in ItemAdapter
+and copied its fields into an MtgCard ORM object for the session to flush. The
+spider now yields MtgListing, an attrs class with slots whose constant and
+repeated strings are shared. The pipeline turns it into a plain row dict and
+inserts each checkpoint's rows as one batch.
+
+This script builds the same synthetic results pages both ways and reports the
+memory each item holds on its own (tracemalloc). It then feeds the items through
+the old pipeline, kept below, and the current MtgScraperPipeline, each into
+a fresh SQLite database, and reports items per second.
+
+Usage:
+    python benchmarks/item_pipeline.py
+    python benchmarks/item_pipeline.py --items 200000 --checkpoint 1000
+'''
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+CONDITIONS = ['Brand New', 'Pre-Owned', 'Near Mint', 'Lightly Played', None]
+SHIPPINGS = ['Free shipping', '+$4.99 shipping', '+$1.25 shipping', None]
+PAGE_SIZE = 60
+
+
+def generate_pages(items, seed=42):
+    '''
+    Results pages of raw extracted texts, as the spider's selectors return
+    them: fresh string objects with surrounding whitespace
+    '''
+    rng = random.Random(seed)
+    pages = []
+    for start in range(0, items, PAGE_SIZE):
+        page = []
+        for i in range(start, min(start + PAGE_SIZE, items)):
+            condition = rng.choice(CONDITIONS)
+            shipping = rng.choice(SHIPPINGS)
+            page.append((
+                f' MTG Black Lotus Alpha #{i} ',
+                f'${rng.lognormvariate(3, 1.5):,.2f} ',
+                f'{condition} ' if condition else None,
+                f'https://www.ebay.com/itm/Black-Lotus/{100000000000 + i}?hash=item{i:x}',
+                f'{shipping} ' if shipping else None,
+            ))
+        pages.append(page)
+    return pages
+
+
+def card_items(pages):
+    '''
+    MtgCardItems built the way the spider built them before MtgListing
+    '''
+    from mtgscraper.items import MtgCardItem
+    
+    items = []
+    for page in pages:
+        for title, price, condition, url, shipping in page:
+            item = MtgCardItem()
+            item['card_name'] = title.strip()
+            item['price'] = price.strip()
+            item['condition'] = condition.strip() if condition else 'Not specified'
+            item['url'] = url
+            item['source'] = 'eBay'
+            item['timestamp'] = datetime.now().isoformat()
+            item['shipping'] = shipping.strip() if shipping else 'See listing'
+            item['buy_it_now'] = True
+            item['seller'] = 'eBay Seller'
+            item['set_name'] = 'Unknown'
+            items.append(item)
+    return items
+
+
+def slotted_items(pages):
+    '''
+    MtgListings built the way the spider builds them
+    '''
+    from mtgscraper.items import EBAY_SELLER, EBAY_SOURCE, UNKNOWN_SET, MtgListing
+    
+    items = []
+    for page in pages:
+        timestamp = datetime.now().isoformat()
+        for title, price, condition, url, shipping in page:
+            items.append(MtgListing(
+                card_name=title.strip(),
+                set_name=UNKNOWN_SET,
+                price=price.strip(),
+                condition=sys.intern(condition.strip()) if condition else 'Not specified',
+                seller=EBAY_SELLER,
+                url=url,
+                source=EBAY_SOURCE,
+                timestamp=timestamp,
+                shipping=sys.intern(shipping.strip()) if shipping else 'See listing',
+                buy_it_now=True,
+            ))
+    return items
+
+
+def measure(build, pages):
+    '''
+    (items, bytes per item, seconds) of build(pages); bytes are what the
+    items allocate beyond the raw page texts
+    '''
+    started = time.perf_counter()
+    build(pages)
+    seconds = time.perf_counter() - started
+    # Traced separately: tracemalloc slows allocation down
+    tracemalloc.start()
+    items = build(pages)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return items, size / len(items), seconds
+
+
+class OrmPipeline:
+    '''
+    MtgScraperPipeline.process_item as it was: ItemAdapter, a normalized
+    dict copy and an MtgCard ORM object per item, committed by the session
+    '''
+    
+    def __init__(self, url, checkpoint_items):
+        from mtgscraper.storage import session_factory
+        
+        self.session = session_factory(url)()
+        self.checkpoint_items = checkpoint_items
+        self.uncommitted = 0
+    
+    def process_item(self, item, spider):
+        from itemadapter import ItemAdapter
+        from mtgscraper.normalize import normalized
+        from mtgscraper.pipelines import MtgCard
+        
+        adapter = ItemAdapter(item)
+        listing = normalized(dict(
+            card_name=adapter.get('card_name'),
+            set_name=adapter.get('set_name'),
+            price=adapter.get('price'),
+            condition=adapter.get('condition'),
+            seller=adapter.get('seller'),
+            url=adapter.get('url'),
+            source=adapter.get('source'),
+            timestamp=adapter.get('timestamp'),
+            shipping=adapter.get('shipping'),
+            buy_it_now=adapter.get('buy_it_now', False)
+        ))
+        self.session.add(MtgCard(**listing))
+        self.uncommitted += 1
+        if self.uncommitted >= self.checkpoint_items:
+            self.session.commit()
+            self.uncommitted = 0
+        return item
+    
+    def close_spider(self, spider):
+        self.session.commit()
+        self.session.close()
+
+
+def stand_in_spider(url, checkpoint_items):
+    '''
+    The parts of a running spider the pipelines use
+    '''
+    from scrapy.settings import Settings
+    from scrapy.signalmanager import SignalManager
+    
+    settings = Settings({
+        'DATABASE_URL': url,
+        'PIPELINE_CHECKPOINT_ITEMS': checkpoint_items,
+        'PIPELINE_CHECKPOINT_SECONDS': 3600,
+        'SEEN_LISTINGS_PATH': None,
+        'STATS_SUMMARY_ENABLED': False,
+    })
+    return SimpleNamespace(
+        settings=settings,
+        logger=logging.getLogger('benchmark'),
+        crawler=SimpleNamespace(signals=SignalManager()),
+    )
+
+
+def run_pipeline(pipeline, items, spider):
+    started = time.perf_counter()
+    for item in items:
+        pipeline.process_item(item, spider)
+    pipeline.close_spider(spider)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100000, help='Synthetic listings to build and store')
+    parser.add_argument('--checkpoint', type=int, default=500, help='Items per commit (PIPELINE_CHECKPOINT_ITEMS)')
+    args = parser.parse_args()
+    
+    from mtgscraper.normalize import normalize_listing
+    from mtgscraper.pipelines import MtgScraperPipeline
+    from mtgscraper.storage import dispose, get_engine
+    
+    pages = generate_pages(args.items)
+    
+    before, before_bytes, before_build = measure(card_items, pages)
+    after, after_bytes, after_build = measure(slotted_items, pages)
+    
+    # Fill the normalizer's caches, so neither pipeline pays for the first parse
+    for item in after:
+        normalize_listing(item.row())
+    
+    with tempfile.TemporaryDirectory() as directory:
+        timings = {}
+        for name, items in (('before', before), ('after', after)):
+            url = f'sqlite:///{os.path.join(directory, name)}.db'
+            get_engine(url, create=True)
+            spider = stand_in_spider(url, args.checkpoint)
+            if name == 'before':
+                pipeline = OrmPipeline(url, args.checkpoint)
+            else:
+                pipeline = MtgScraperPipeline()
+                pipeline.open_spider(spider)
+            timings[name] = run_pipeline(pipeline, items, spider)
+            with get_engine(url).connect() as connection:
+                stored = connection.exec_driver_sql('SELECT count(*) FROM mtg_cards').scalar()
+            assert stored == args.items, f'{name}: {stored} of {args.items} listings stored'
+            dispose(url)
+    
+    print(f'{args.items:,} listings, {args.checkpoint} per commit')
+    print()
+    print(f'  {"":38} {"bytes/item":>10}  {"build items/s":>14}  {"pipeline items/s":>16}')
+    print(f'  {"MtgCardItem + ItemAdapter + ORM (before)":38} {before_bytes:10,.0f}  '
+          f'{args.items / before_build:14,.0f}  {args.items / timings["before"]:16,.0f}')
+    print(f'  {"MtgListing + row batches (after)":38} {after_bytes:10,.0f}  '
+          f'{args.items / after_build:14,.0f}  {args.items / timings["after"]:16,.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+'''
+Price parsing benchmark: ingest-time normalizer vs the old SQL expression
+
+The staging model used to pull price_numeric out of the price text with nested
+replace/instr/substr/cast calls on every query. This script times that
+expression in SQLite against mtgscraper.normalize, which parses each listing
+once at ingest, and against reading the stored price_value column. It also
+counts the prices the SQL expression gets wrong (currency prefixes, decimal
+commas) and shows a few examples.
+
+Usage:
+    python benchmarks/normalize_prices.py
+    python benchmarks/normalize_prices.py --rows 1000000 --queries 5
+'''
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+# price_numeric as the staging model computed it on SQLite before prices were parsed at ingest
+SQL_PRICE = '''
+    cast(
+        replace(
+            replace(
+                replace(
+                    case
+                        when instr(replace(replace(price, '$', ''), ',', ''), ' to ') > 0
+                        then substr(replace(replace(price, '$', ''), ',', ''), 1, instr(replace(replace(price, '$', ''), ',', ''), ' to ') - 1)
+                        else replace(replace(price, '$', ''), ',', '')
+                    end,
+                    '$', ''
+                ),
+                ',', ''
+            ),
+            ' ', ''
+        )
+    as real)
+'''
+
+SHIPPING = ['Free shipping', '+$4.99 shipping', '$3.99 shipping', 'See listing', '+C $6.50 shipping estimate']
+CONDITIONS = ['Near Mint', 'NM/M', 'Lightly Played', 'Pre-Owned', 'Brand New', 'Heavily Played', 'Buy It Now']
+
+
+def generate_listings(rows, seed=42):
+    '''
+    Listing dicts with the price formats eBay shows; most are plain dollar prices
+    '''
+    rng = random.Random(seed)
+    listings = []
+    for _ in range(rows):
+        value = round(rng.lognormvariate(3, 1.5), 2)
+        kind = rng.random()
+        if kind < 0.85:
+            price = f'${value:,.2f}'
+        elif kind < 0.92:
+            price = f'${value:,.2f} to ${value * 1.5:,.2f}'
+        elif kind < 0.96:
+            price = f'{rng.choice(["US", "C", "AU"])} ${value:,.2f}'
+        else:
+            # European separators: EUR 1.234,56
+            price = f'EUR {value:,.2f}'.translate(str.maketrans(',.', '.,'))
+        listings.append({
+            'price': price,
+            'shipping': rng.choice(SHIPPING),
+            'condition': rng.choice(CONDITIONS),
+        })
+    return listings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500000, help='Synthetic listings to parse')
+    parser.add_argument('--queries', type=int, default=3, help='Times each SQL query is run; the fastest is reported')
+    args = parser.parse_args()
+    
+    from mtgscraper import normalize
+    
+    listings = generate_listings(args.rows)
+    
+    started = time.perf_counter()
+    normalized = [normalize.normalize_listing(listing) for listing in listings]
+    cold = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    for listing in listings:
+        normalize.normalize_listing(listing)
+    warm = time.perf_counter() - started
+    
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE mtg_cards (id INTEGER PRIMARY KEY, price VARCHAR, price_value FLOAT)')
+    connection.executemany(
+        'INSERT INTO mtg_cards (price, price_value) VALUES (?, ?)',
+        ((listing['price'], values['price_value']) for listing, values in zip(listings, normalized))
+    )
+    
+    def best_time(sql):
+        timings = []
+        for _ in range(args.queries):
+            started = time.perf_counter()
+            connection.execute(sql).fetchall()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
+    
+    sql_parse = best_time(f'SELECT sum({SQL_PRICE}) FROM mtg_cards')
+    stored = best_time('SELECT sum(price_value) FROM mtg_cards')
+    
+    mismatches = connection.execute(
+        f'SELECT price, {SQL_PRICE}, price_value FROM mtg_cards '
+        f'WHERE abs(coalesce({SQL_PRICE}, -1) - coalesce(price_value, -1)) > 0.001'
+    ).fetchall()
+    
+    cache = normalize.cache_info()['price']
+    print(f'{args.rows:,} listings')
+    print()
+    print(f'  normalize_listing, cold cache   {cold:7.3f} s  {args.rows / cold:12,.0f} rows/s  (ingest, once per listing)')
+    print(f'  normalize_listing, warm cache   {warm:7.3f} s  {args.rows / warm:12,.0f} rows/s')
+    print(f'  SQL price expression per query  {sql_parse:7.3f} s  {args.rows / sql_parse:12,.0f} rows/s')
+    print(f'  stored price_value per query    {stored:7.3f} s  {args.rows / stored:12,.0f} rows/s')
+    print()
+    print(f'  price cache: {cache.hits:,} hits, {cache.misses:,} misses')
+    print(f'  SQL expression disagrees with the normalizer on {len(mismatches):,} prices '
+          f'({len(mismatches) / args.rows:.1%}), for example:')
+    for price, sql_value, value in mismatches[:5]:
+        print(f'    {price!r:32} SQL {sql_value!r:10} normalizer {value!r}')
+
+
+if __name__ == '__main__':
+    main()
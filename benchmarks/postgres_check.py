@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+
+'''
+Check of the PostgreSQL storage against a throwaway server
+
+Starts a scratch PostgreSQL server with initdb and pg_ctl in a temporary
+directory and runs mtgscraper.postgres against it. It checks the following:
+
+- COPY writes every row, and the ids set on the listing dicts are the ids
+  the rows got.
+- Each row lands in its month's partition, or in the default partition when
+  it has no timestamp.
+- Rows left in the default partition by a plain INSERT move into a month's
+  partition when that partition is created.
+- Several writers at once commit in id order: no row commits after a row
+  with a higher id, and a stats summary refreshed while they write ends up
+  with every row.
+- Merging a shard whose batches bring a new month after rows already went
+  to the default partition finishes instead of hanging.
+
+The server is stopped and its directory removed at the end.
+
+Requires the PostgreSQL server binaries (initdb, pg_ctl) and psycopg2
+(pip install psycopg2-binary). initdb refuses to run as root, so run this as
+an unprivileged user.
+
+Usage:
+    python benchmarks/postgres_check.py
+    python benchmarks/postgres_check.py --bindir /usr/lib/postgresql/16/bin --rows 50000 --workers 8
+'''
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+# How long the shard merge may take before it counts as hung
+MERGE_TIMEOUT_SECONDS = 60
+
+
+def find_bindir(bindir=None):
+    '''
+    Directory of initdb and pg_ctl: bindir, else pg_config --bindir, else PATH
+    '''
+    if bindir:
+        return bindir
+    try:
+        return subprocess.run(['pg_config', '--bindir'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        initdb = shutil.which('initdb')
+        return os.path.dirname(initdb) if initdb else None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(bindir, directory):
+    '''
+    initdb and start a server in directory; returns its URL
+    '''
+    data = os.path.join(directory, 'data')
+    port = free_port()
+    subprocess.run(
+        [os.path.join(bindir, 'initdb'), '-D', data, '-U', 'postgres', '-A', 'trust', '--no-sync'],
+        check=True, capture_output=True
+    )
+    subprocess.run(
+        [os.path.join(bindir, 'pg_ctl'), '-D', data, '-l', os.path.join(directory, 'server.log'), '-w',
+         '-o', f'-p {port} -k {directory} -c listen_addresses=127.0.0.1 -c fsync=off -c track_commit_timestamp=on', 'start'],
+        check=True, capture_output=True
+    )
+    return f'postgresql+psycopg2://postgres@127.0.0.1:{port}/postgres'
+
+
+def stop_server(bindir, directory, mode='fast'):
+    subprocess.run(
+        [os.path.join(bindir, 'pg_ctl'), '-D', os.path.join(directory, 'data'), '-m', mode, '-w', 'stop'],
+        capture_output=True
+    )
+
+
+def listings(count, prefix, months=('2026-01', '2026-02', '2026-03'), undated_every=0):
+    '''
+    Normalized listing dicts spread over months; every undated_every-th has no timestamp
+    '''
+    from mtgscraper.normalize import normalize_listing
+    
+    rows = []
+    for i in range(count):
+        month = months[i % len(months)]
+        start = datetime(int(month[:4]), int(month[5:]), 1)
+        listing = {
+            'card_name': f'Card {i % 500}',
+            'set_name': 'Unknown',
+            'price': f'${1 + i % 997}.00',
+            'condition': 'Near Mint',
+            'seller': 'eBay Seller',
+            'url': f'https://www.ebay.com/itm/{prefix}-{i}',
+            'source': 'eBay (Scrapy)',
+            'timestamp': None if undated_every and i % undated_every == 0
+                         else (start + timedelta(days=i % 28, seconds=i % 86400)).isoformat(),
+            'shipping': 'Free shipping',
+            'buy_it_now': True,
+        }
+        listing.update(normalize_listing(listing))
+        rows.append(listing)
+    return rows
+
+
+def expected_partition(timestamp):
+    from mtgscraper.postgres import partition_name
+    
+    return partition_name(timestamp[:7]) if timestamp else 'mtg_cards_default'
+
+
+def check_copy(engine, failures):
+    '''
+    Ids, row count and partition of a COPY batch, and rows moved out of the default partition
+    '''
+    from sqlalchemy import text
+    from mtgscraper.storage import insert_listings
+    
+    with engine.begin() as conn:
+        # A plain INSERT before April has a partition: lands in the default one
+        conn.execute(text(
+            "INSERT INTO mtg_cards (card_name, url, timestamp) VALUES ('Early', 'https://www.ebay.com/itm/early-1', '2026-04-02T10:00:00')"
+        ))
+    rows = listings(3000, 'copy', months=('2026-03', '2026-04'), undated_every=7)
+    with engine.begin() as conn:
+        insert_listings(conn, rows)
+    
+    with engine.connect() as conn:
+        stored = {
+            url: (listing_id, partition)
+            for listing_id, url, partition in conn.execute(text('SELECT id, url, tableoid::regclass::text FROM mtg_cards'))
+        }
+    if len(stored) != len(rows) + 1:
+        failures.append(f'copy: {len(stored)} rows stored, expected {len(rows) + 1}')
+    wrong_ids = sum(1 for row in rows if stored.get(row['url'], (None,))[0] != row.get('id'))
+    if wrong_ids:
+        failures.append(f'copy: {wrong_ids} listings were given another id than their row')
+    misplaced = sum(1 for row in rows if stored.get(row['url'], (None, None))[1] != expected_partition(row['timestamp']))
+    if misplaced:
+        failures.append(f'copy: {misplaced} rows are not in their month partition')
+    if stored.get('https://www.ebay.com/itm/early-1', (None, None))[1] != 'mtg_cards_2026_04':
+        failures.append('copy: a row in the default partition was not moved into its new month')
+    return len(stored)
+
+
+def copy_worker(url, rows, batch_size, go):
+    from mtgscraper.postgres import ListingCopyWriter
+    from mtgscraper.storage import get_engine
+    
+    writer = ListingCopyWriter(get_engine(url), batch_size)
+    go.wait()
+    for row in rows:
+        writer.write(row)
+    writer.close()
+
+
+def check_concurrent(url, engine, rows, workers, batch_size, failures):
+    '''
+    Writers at once, with the stats summary refreshed all the while; a batch
+    committing after a higher id was folded in would be missed for good
+    '''
+    from sqlalchemy import func, select, text
+    from mtgscraper.pipelines import MtgCardSummary
+    from mtgscraper.stats import refresh_summary
+    
+    context = multiprocessing.get_context('spawn')
+    go = context.Barrier(workers + 1)
+    processes = [
+        context.Process(target=copy_worker, args=(url, listings(rows, f'worker{i}'), batch_size, go))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    go.wait()
+    refreshes = 0
+    while any(process.is_alive() for process in processes):
+        refresh_summary(engine)
+        refreshes += 1
+    for process in processes:
+        process.join()
+    if any(process.exitcode for process in processes):
+        failures.append('concurrent: a COPY writer failed')
+    refresh_summary(engine)
+    
+    with engine.connect() as conn:
+        total, distinct = conn.execute(text('SELECT count(*), count(DISTINCT id) FROM mtg_cards')).one()
+        summarized = conn.execute(select(func.sum(MtgCardSummary.listings))).scalar() or 0
+        # Rows whose transaction committed before that of a row with a lower id
+        out_of_order = conn.execute(text(
+            'SELECT count(*) FROM (SELECT pg_xact_commit_timestamp(xmin) AS committed, '
+            'max(pg_xact_commit_timestamp(xmin)) OVER (ORDER BY id ROWS UNBOUNDED PRECEDING) AS latest '
+            'FROM mtg_cards) AS rows WHERE committed < latest'
+        )).scalar()
+    if distinct != total:
+        failures.append(f'concurrent: {total - distinct} duplicate ids')
+    if out_of_order:
+        failures.append(f'concurrent: {out_of_order} rows committed after a row with a higher id')
+    if summarized != total:
+        failures.append(f'concurrent: the summary has {summarized} of {total} rows after {refreshes} refreshes')
+    return total, refreshes
+
+
+def check_merge(url, directory, failures):
+    '''
+    A shard whose first batch has no timestamps and whose later one a new month
+    '''
+    from sqlalchemy import text
+    from mtgscraper.storage import get_engine, insert_listings, merge_shards
+    
+    shard = f'sqlite:///{os.path.join(directory, "worker-0.db")}'
+    with get_engine(shard, create=True).begin() as conn:
+        insert_listings(conn, listings(100, 'undated', undated_every=1))
+        insert_listings(conn, listings(100, 'july', months=('2026-07',)))
+    
+    outcome = {}
+    
+    def merge():
+        try:
+            outcome['merged'] = merge_shards([shard], url=url, batch_size=50)
+        except Exception as e:
+            outcome['error'] = e
+    
+    thread = threading.Thread(target=merge, daemon=True)
+    thread.start()
+    thread.join(MERGE_TIMEOUT_SECONDS)
+    if thread.is_alive():
+        failures.append(f'merge: still waiting after {MERGE_TIMEOUT_SECONDS} s')
+        return None
+    if 'error' in outcome:
+        failures.append(f'merge: {outcome["error"]}')
+        return None
+    with get_engine(url).connect() as conn:
+        july = conn.execute(text("SELECT count(*) FROM mtg_cards_2026_07 WHERE url LIKE '%/july-%'")).scalar()
+    if outcome['merged'] != 200 or july != 100:
+        failures.append(f'merge: {outcome["merged"]} rows merged, {july} of 100 in mtg_cards_2026_07')
+    return outcome['merged']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bindir', help='Directory of initdb and pg_ctl; defaults to pg_config --bindir, then PATH')
+    parser.add_argument('--rows', type=int, default=20000, help='Listings each concurrent writer copies')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent COPY writers')
+    parser.add_argument('--batch-size', type=int, default=200, help='Listings per COPY transaction')
+    args = parser.parse_args()
+    
+    bindir = find_bindir(args.bindir)
+    if not bindir or not os.path.exists(os.path.join(bindir, 'initdb')):
+        print('initdb was not found! Install the PostgreSQL server or pass --bindir')
+        sys.exit(1)
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        print('initdb cannot run as root! Run this as an unprivileged user')
+        sys.exit(1)
+    try:
+        import psycopg2  # noqa: F401
+    except ImportError:
+        print('psycopg2 is not installed! Install with: pip install psycopg2-binary')
+        sys.exit(1)
+    
+    from mtgscraper.storage import dispose, get_engine
+    
+    failures = []
+    directory = tempfile.mkdtemp(prefix='mtg-pg-')
+    hung = False
+    try:
+        url = start_server(bindir, directory)
+        print(f'Scratch server at {url}')
+        print()
+        engine = get_engine(url, create=True)
+        
+        stored = check_copy(engine, failures)
+        print(f'  copy        {stored:,} rows, ids and partitions checked')
+        total, refreshes = check_concurrent(url, engine, args.rows, args.workers, args.batch_size, failures)
+        print(f'  concurrent  {total:,} rows from {args.workers} writers, summary refreshed {refreshes} times')
+        merged = check_merge(url, directory, failures)
+        hung = merged is None
+        print(f'  merge       {merged if merged is not None else "no"} shard rows merged')
+        if not hung:
+            dispose(url)
+    finally:
+        # A hung merge holds its connection; stop without waiting for it
+        stop_server(bindir, directory, 'immediate' if hung else 'fast')
+        shutil.rmtree(directory, ignore_errors=True)
+    
+    if failures:
+        print()
+        for failure in failures:
+            print(f'FAIL: {failure}')
+        sys.exit(1)
+    
+    print()
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
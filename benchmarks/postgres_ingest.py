@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+'''
+PostgreSQL ingest benchmark: row INSERTs vs batched COPY, one and several writers
+
+Creates a scratch database on the server at --url, sets up the partitioned
+mtg_cards table through mtgscraper.storage, and writes synthetic listings
+three ways: SQLAlchemy executemany INSERTs, mtgscraper.postgres COPY batches
+from one process, and COPY from --workers processes at once, as parallel
+crawlers would. It then checks every row arrived, shows how the rows spread
+over the month partitions and that a date filter reads only its month.
+The scratch database is dropped afterwards unless --keep is given.
+
+Requires a PostgreSQL server and psycopg2 (pip install psycopg2-binary).
+
+Usage:
+    python benchmarks/postgres_ingest.py --url postgresql://postgres@localhost:5432/postgres
+    python benchmarks/postgres_ingest.py --url postgresql://... --rows 1000000 --workers 8
+'''
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+SOURCES = ['eBay API (Official)', 'eBay (Playwright)', 'eBay (Scrapy)']
+CONDITIONS = ['New', 'Near Mint', 'Lightly Played', 'Played']
+
+
+def generate_listings(count, seed, days=90):
+    '''
+    Normalized listing dicts as the scrapers produce them, over days days from 2026-01-01
+    '''
+    from mtgscraper.normalize import normalize_listing
+    
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    listings = []
+    for i in range(count):
+        card = rng.randrange(5000)
+        listing = {
+            'card_name': f'Card {card}',
+            'set_name': 'Unknown',
+            'price': f'${rng.uniform(0.5, 2000):,.2f}',
+            'condition': rng.choice(CONDITIONS),
+            'seller': f'seller_{rng.randrange(2000)}',
+            'url': f'https://www.ebay.com/itm/{seed}-{i}',
+            'source': rng.choice(SOURCES),
+            'timestamp': (start + timedelta(days=rng.randrange(days), seconds=rng.randrange(86400))).isoformat(),
+            'shipping': 'Free shipping' if i % 3 else '$4.99 shipping',
+            'buy_it_now': bool(i % 2),
+        }
+        listing.update(normalize_listing(listing))
+        listings.append(listing)
+    return listings
+
+
+def copy_worker(url, listings, batch_size, ready, go):
+    from mtgscraper.postgres import ListingCopyWriter
+    from mtgscraper.storage import get_engine
+    
+    writer = ListingCopyWriter(get_engine(url), batch_size)
+    ready.wait()
+    go.wait()
+    for listing in listings:
+        writer.write(listing)
+    writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=os.environ.get('MTG_DATABASE_URL'), help='Any database URL on the PostgreSQL server to use')
+    parser.add_argument('--rows', type=int, default=200000, help='Listings written by each method')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent COPY writers')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Listings per INSERT batch or COPY')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch database and print its URL')
+    args = parser.parse_args()
+    if not args.url or not args.url.startswith('postgresql'):
+        parser.error('--url must be a postgresql:// URL')
+    
+    from sqlalchemy import create_engine, insert, text
+    from sqlalchemy.engine import make_url
+    from mtgscraper.pipelines import MtgCard
+    from mtgscraper.postgres import ListingCopyWriter, ensure_partitions
+    from mtgscraper.storage import dispose, get_engine
+    
+    server = create_engine(args.url, isolation_level='AUTOCOMMIT')
+    name = f'mtg_ingest_{os.getpid()}'
+    url = make_url(args.url).set(database=name).render_as_string(hide_password=False)
+    with server.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE {name}'))
+    
+    try:
+        engine = get_engine(url, create=True)
+        print(f'Generating {args.rows:,} listings...')
+        listings = generate_listings(args.rows, seed=0)
+        per_worker = args.rows // args.workers
+        # Partitions up front, so the INSERTs are not left in the default partition
+        with engine.begin() as conn:
+            ensure_partitions(conn, {listing['timestamp'][:7] for listing in listings})
+        print()
+        
+        def report(label, seconds, rows):
+            print(f'  {label:28} {seconds:7.2f} s  {rows / seconds:10,.0f} rows/s')
+        
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            for offset in range(0, len(listings), args.batch_size):
+                conn.execute(insert(MtgCard), listings[offset:offset + args.batch_size])
+        report('INSERT executemany', time.perf_counter() - started, len(listings))
+        
+        started = time.perf_counter()
+        writer = ListingCopyWriter(engine, args.batch_size)
+        for listing in listings:
+            writer.write(listing)
+        writer.close()
+        report('COPY, 1 writer', time.perf_counter() - started, len(listings))
+        
+        context = multiprocessing.get_context('spawn')
+        ready = context.Barrier(args.workers + 1)
+        go = context.Barrier(args.workers + 1)
+        workers = [
+            context.Process(target=copy_worker, args=(
+                url, listings[i * per_worker:(i + 1) * per_worker], args.batch_size, ready, go
+            ))
+            for i in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        ready.wait()
+        started = time.perf_counter()
+        go.wait()
+        for worker in workers:
+            worker.join()
+        if any(worker.exitcode for worker in workers):
+            sys.exit('A COPY worker failed')
+        report(f'COPY, {args.workers} writers', time.perf_counter() - started, per_worker * args.workers)
+        
+        expected = 2 * len(listings) + per_worker * args.workers
+        with engine.connect() as conn:
+            total = conn.execute(text('SELECT count(*) FROM mtg_cards')).scalar()
+            distinct = conn.execute(text('SELECT count(DISTINCT id) FROM mtg_cards')).scalar()
+            partitions = conn.execute(text(
+                'SELECT tableoid::regclass::text, count(*) FROM mtg_cards GROUP BY 1 ORDER BY 1'
+            )).all()
+            plan = conn.execute(text(
+                "EXPLAIN SELECT count(*) FROM mtg_cards WHERE timestamp >= '2026-02-01' AND timestamp < '2026-02-08'"
+            )).scalars().all()
+        
+        print()
+        print(f'  rows {total:,} of {expected:,}, {distinct:,} distinct ids')
+        for partition, rows in partitions:
+            print(f'  {partition:24} {rows:10,} rows')
+        scanned = sorted({line.split(' on ')[1].split()[0] for line in plan if ' on mtg_cards' in line})
+        print(f'  one week in February scans: {", ".join(scanned)}')
+        if total != expected or distinct != total:
+            sys.exit('Row count mismatch')
+    finally:
+        dispose(url)
+        if args.keep:
+            print(f'\nKept {make_url(url).render_as_string(hide_password=True)}')
+        else:
+            with server.connect() as conn:
+                conn.execute(text(f'DROP DATABASE IF EXISTS {name}'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+'''
+Card identity benchmark: title resolution throughput and how far it collapses cards
+
+Generates eBay-style listing titles for the cards in the bundled card list (or
+the list given with --index), padded with sets, grades, foil flags and sales
+words, and times mtgscraper.cards resolving them with a cold and a warm memo
+cache. It then reports how many distinct card_name values the titles produce
+before and after resolution, which is the number of rows card_price_stats gets.
+
+Usage:
+    python benchmarks/resolve_titles.py
+    python benchmarks/resolve_titles.py --titles 1000000 --index scryfall-default-cards.json
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+PREFIXES = ['', '', 'MTG', 'Magic the Gathering', 'MTG Magic', '1x']
+SUFFIXES = ['NM', 'Near Mint', 'LP', 'HP', 'PSA 8', 'BGS 9.5', 'English', 'Foil', 'Non-Foil', 'Rare', 'Vintage', 'Mythic', '']
+OTHER_TITLES = ['MTG Bulk Lot 1000 Commons', 'Magic the Gathering Booster Box', 'Pokemon Charizard Holo', 'Deck Box Ultra Pro']
+
+
+def generate_titles(index, count, seed=42):
+    '''
+    Listing titles naming random cards and printings from index, plus some
+    titles that name no card
+    '''
+    rng = random.Random(seed)
+    cards = list(index.printings.items())
+    titles = []
+    for _ in range(count):
+        if rng.random() < 0.05:
+            titles.append(rng.choice(OTHER_TITLES))
+            continue
+        name, printings = rng.choice(cards)
+        if rng.random() < 0.5:
+            name = name.replace(',', '').replace("'", '')
+        words = [rng.choice(PREFIXES), name]
+        if printings and rng.random() < 0.7:
+            code = rng.choice(printings)
+            words.append(rng.choice([code, index.set_names[code]]))
+        words.extend(rng.sample(SUFFIXES, 2))
+        titles.append(' '.join(word for word in words if word))
+    return titles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--titles', type=int, default=200000, help='Synthetic listing titles to resolve')
+    parser.add_argument('--index', help='Card list or Scryfall bulk data file (default: the bundled list)')
+    args = parser.parse_args()
+    
+    from mtgscraper import cards
+    
+    started = time.perf_counter()
+    index = cards.load_card_index(args.index)
+    loaded = time.perf_counter() - started
+    cards.use_card_index(index)
+    
+    titles = generate_titles(index, args.titles)
+    
+    started = time.perf_counter()
+    matches = [cards.resolve_title(title) for title in titles]
+    cold = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    for title in titles:
+        cards.resolve_title(title)
+    warm = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    for title in titles:
+        index.resolve(title)
+    uncached = time.perf_counter() - started
+    
+    resolved = [match for match in matches if match.card_name]
+    card_names = {match.card_name or title for match, title in zip(matches, titles)}
+    printings = {(match.card_name, match.set_code) for match in resolved}
+    
+    print(f'{len(index):,} known cards, index loaded in {loaded:.3f} s')
+    print(f'{args.titles:,} titles')
+    print()
+    print(f'  resolve_title, cold cache   {cold:7.3f} s  {args.titles / cold:12,.0f} titles/s')
+    print(f'  resolve_title, warm cache   {warm:7.3f} s  {args.titles / warm:12,.0f} titles/s')
+    print(f'  CardIndex.resolve, no cache {uncached:7.3f} s  {args.titles / uncached:12,.0f} titles/s')
+    cache = cards.resolve_title.cache_info()
+    print(f'  title cache: {cache.hits:,} hits, {cache.misses:,} misses, size {cache.maxsize:,}')
+    print()
+    print(f'  resolved to a known card    {len(resolved):,} ({len(resolved) / args.titles:.1%})')
+    print(f'  with a set                  {sum(1 for match in resolved if match.set_code):,}')
+    print(f'  foil                        {sum(1 for match in resolved if match.foil):,}')
+    print(f'  distinct card_name values   {len(set(titles)):,} raw titles -> {len(card_names):,} '
+          f'({len(printings):,} card and set pairs)')
+
+
+if __name__ == '__main__':
+    main()
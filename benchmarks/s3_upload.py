@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+'''
+Offline check and benchmark for the streaming S3 uploader
+
+Builds a synthetic listings database, streams it to S3 in each export format
+and verifies the uploaded object and the part count. It also checks that a
+second export of the same rows goes to the same object name and is skipped
+without starting an upload, and that a new row gives a new object. By default everything runs against an in-process moto
+mock, so no network or AWS account is needed. Pass --endpoint-url to run
+against a real S3-compatible server such as a local MinIO instead.
+
+Usage:
+    pip install moto
+    python benchmarks/s3_upload.py
+    python benchmarks/s3_upload.py --rows 1000000 --part-size 8 --workers 8
+    python benchmarks/s3_upload.py --endpoint-url http://localhost:9000 --bucket mtg-bench
+'''
+
+import argparse
+import contextlib
+import gzip
+import os
+import random
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+
+def build_database(path, rows):
+    '''
+    Create a mtg_cards table with synthetic listings
+    '''
+    from sqlalchemy import create_engine, insert
+    from mtgscraper.pipelines import Base, MtgCard
+    
+    engine = create_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        for start in range(0, rows, 50000):
+            conn.execute(insert(MtgCard), [
+                {
+                    'card_name': f'Card {rng.randrange(5000)}',
+                    'set_name': 'Benchmark',
+                    'price': f'${rng.uniform(0.25, 5000):,.2f}',
+                    'condition': rng.choice(['Near Mint', 'Lightly Played', 'Played']),
+                    'seller': f'seller_{rng.randrange(1000)}',
+                    'url': f'https://www.ebay.com/itm/{start + i}',
+                    'source': 'Benchmark',
+                    'timestamp': f'2026-01-{1 + (start + i) % 28:02d}T12:00:00',
+                    'shipping': 'Free shipping',
+                    'buy_it_now': bool(i % 2),
+                }
+                for i in range(min(50000, rows - start))
+            ])
+    return engine
+
+
+def check_object(client, bucket, key, fmt, rows):
+    '''
+    Download an uploaded export and confirm it holds every row
+    '''
+    body = client.get_object(Bucket=bucket, Key=key)['Body'].read()
+    
+    if fmt == 'parquet':
+        import io
+        import pyarrow.parquet as pq
+        return pq.read_table(io.BytesIO(body)).num_rows == rows
+    if fmt == 'csv.gz':
+        body = gzip.decompress(body)
+    elif fmt == 'csv.zst':
+        import zstandard
+        body = zstandard.ZstdDecompressor().stream_reader(body).read()
+    return body.count(b'\n') == rows + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='Synthetic listings to export')
+    parser.add_argument('--part-size', type=int, default=5, help='Multipart part size in MB')
+    parser.add_argument('--workers', type=int, default=4, help='Parts uploaded in parallel')
+    parser.add_argument('--formats', default='csv,csv.gz,csv.zst,parquet', help='Comma separated export formats')
+    parser.add_argument('--endpoint-url', help='S3-compatible endpoint; defaults to an in-process moto mock')
+    parser.add_argument('--bucket', default='mtgscraper-benchmark', help='Bucket to create and upload into')
+    args = parser.parse_args()
+    
+    from mtgscraper import s3
+    
+    if args.endpoint_url:
+        mock = contextlib.nullcontext()
+    else:
+        try:
+            from moto import mock_aws
+        except ImportError:
+            print('moto is not installed! Install with: pip install moto')
+            sys.exit(1)
+        for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+            os.environ.setdefault(name, 'benchmark')
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+        mock = mock_aws()
+    
+    failures = []
+    with tempfile.TemporaryDirectory() as workdir, mock:
+        engine = build_database(os.path.join(workdir, 'bench.db'), args.rows)
+        client = s3.create_client(args.endpoint_url)
+        with contextlib.suppress(client.exceptions.BucketAlreadyOwnedByYou):
+            client.create_bucket(Bucket=args.bucket)
+        
+        print(f'Streaming {args.rows:,} rows, {args.part_size} MB parts, {args.workers} workers')
+        print()
+        options = {
+            'part_size': args.part_size * 1024 * 1024,
+            'workers': args.workers,
+            'client': client,
+        }
+        
+        # Count the uploads started, to see that a skipped export starts none
+        uploads = []
+        for call in ('PutObject', 'CreateMultipartUpload'):
+            client.meta.events.register(f'before-call.s3.{call}', lambda **kwargs: uploads.append(1))
+        
+        for fmt in args.formats.split(','):
+            started = time.perf_counter()
+            first = s3.stream_export(engine, f's3://{args.bucket}/bench', fmt=fmt, **options)
+            elapsed = time.perf_counter() - started
+            before = len(uploads)
+            second = s3.stream_export(engine, f's3://{args.bucket}/bench', fmt=fmt, **options)
+            
+            mb = first['bytes'] / (1024 * 1024)
+            print(f'  {fmt:8} {mb:8.1f} MB  {first["parts"]:3} parts  {elapsed:6.2f} s  {mb / elapsed:7.1f} MB/s  '
+                  f'{first["url"].rsplit("/", 1)[1]}')
+            
+            key = first['url'][len(f's3://{args.bucket}/'):]
+            if first['rows'] != args.rows or not check_object(client, args.bucket, key, fmt, args.rows):
+                failures.append(f'{fmt}: uploaded object does not contain {args.rows} rows')
+            if second['url'] != first['url']:
+                failures.append(f'{fmt}: the same rows were exported to {second["url"]} after {first["url"]}')
+            if not second['skipped'] or len(uploads) != before:
+                failures.append(f'{fmt}: identical re-export was not skipped before uploading')
+        
+        from sqlalchemy import insert
+        from mtgscraper.pipelines import MtgCard
+        
+        with engine.begin() as conn:
+            conn.execute(insert(MtgCard), [{'card_name': 'New Card', 'url': 'https://www.ebay.com/itm/new'}])
+        third = s3.stream_export(engine, f's3://{args.bucket}/bench', fmt='csv', **options)
+        if third['skipped'] or third['url'] == first['url'] or third['rows'] != args.rows + 1:
+            failures.append(f'a new row was not exported to a new object: {third["url"]}')
+        
+        if client.list_multipart_uploads(Bucket=args.bucket).get('Uploads'):
+            failures.append('unfinished multipart uploads were left behind')
+    
+    if failures:
+        print()
+        for failure in failures:
+            print(f'FAIL: {failure}')
+        sys.exit(1)
+    
+    print()
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+-- Adapter-specific SQL so the same models run on dbt-sqlite and dbt-duckdb
+
+-- Raw listings relation: the scraper's SQLite table, or on DuckDB optionally the Parquet lake
+{% macro raw_listings() %}
+  {{ return(adapter.dispatch('raw_listings', 'mtg_analytics')()) }}
+{% endmacro %}
+
+{% macro default__raw_listings() %}
+    mtg_cards
+{% endmacro %}
+
+{% macro duckdb__raw_listings() %}
+  {% if var('raw_format', 'sqlite') == 'parquet' %}
+    -- id is the mtg_cards id each lake row was written with, stable across new files and
+    -- compaction. Files from before the lake stored it get negative ids, which stay below
+    -- every incremental watermark; --full-refresh once to load them
+    (
+        select
+            coalesce(id, -row_number() over (order by timestamp, url)) as id,
+            card_name, set_name, price, condition, seller, url,
+            source, timestamp, shipping, buy_it_now,
+            price_value, price_max, currency, shipping_value, condition_normalized,
+            title, foil
+        from read_parquet(
+            '{{ var("lake_path", "lake") }}/**/*.parquet',
+            hive_partitioning = true,
+            union_by_name = true
+        )
+    )
+  {% else %}
+    -- sqlite_scan instead of ATTACH: DuckDB cannot parse the SQLite views the dev target creates
+    sqlite_scan('{{ var("sqlite_path", "mtg_cards.db") }}', 'mtg_cards')
+  {% endif %}
+{% endmacro %}
+
+
+-- Parse the scraper's ISO timestamp strings
+{% macro to_timestamp(expression) %}
+  {{ return(adapter.dispatch('to_timestamp', 'mtg_analytics')(expression)) }}
+{% endmacro %}
+
+{% macro default__to_timestamp(expression) %}
+    datetime({{ expression }})
+{% endmacro %}
+
+{% macro duckdb__to_timestamp(expression) %}
+    try_cast({{ expression }} as timestamp)
+{% endmacro %}
+
+
+{% macro to_date(expression) %}
+  {{ return(adapter.dispatch('to_date', 'mtg_analytics')(expression)) }}
+{% endmacro %}
+
+{% macro default__to_date(expression) %}
+    date({{ expression }})
+{% endmacro %}
+
+{% macro duckdb__to_date(expression) %}
+    cast(try_cast({{ expression }} as timestamp) as date)
+{% endmacro %}
+
+
+-- Monday of the week a date falls in
+{% macro week_start(expression) %}
+  {{ return(adapter.dispatch('week_start', 'mtg_analytics')(expression)) }}
+{% endmacro %}
+
+{% macro default__week_start(expression) %}
+    date({{ expression }}, '-6 days', 'weekday 1')
+{% endmacro %}
+
+{% macro duckdb__week_start(expression) %}
+    cast(date_trunc('week', {{ expression }}) as date)
+{% endmacro %}
+
+
+-- Index for the lookups view_dbt_analytics runs, created from a post_hook.
+-- DuckDB scans with zone maps instead, and dropping indexes while dbt swaps tables
+-- races other threads on its catalog, so no index is created there
+{% macro create_index(relation, name, columns) %}
+  {{ return(adapter.dispatch('create_index', 'mtg_analytics')(relation, name, columns)) }}
+{% endmacro %}
+
+{% macro default__create_index(relation, name, columns) %}
+    create index if not exists {{ name }} on {{ relation.identifier }} ({{ columns }})
+{% endmacro %}
+
+{% macro duckdb__create_index(relation, name, columns) %}
+{% endmacro %}
@@ -0,0 +1,35 @@
+-- Mergeable quantile sketch for prices (log-bucketed, DDSketch style)
+-- A price p is counted in bucket ceil(log(p) / log(gamma)) with gamma = (1 + a) / (1 - a),
+-- so any quantile read from the buckets is within a relative error of a
+-- (var sketch_relative_accuracy, default 1%). Sketches for longer periods are the
+-- per-day bucket counts added together.
+
+{% macro sketch_gamma() %}
+  {%- set accuracy = var('sketch_relative_accuracy', 0.01) -%}
+  {{ return((1 + accuracy) / (1 - accuracy)) }}
+{% endmacro %}
+
+-- Bucket index of a positive price
+{% macro price_bucket(expression) %}
+    cast(ceil(log({{ expression }}) / log({{ sketch_gamma() }})) as integer)
+{% endmacro %}
+
+-- Representative price of a bucket index
+{% macro bucket_price(bucket) %}
+    (2 * power({{ sketch_gamma() }}, {{ bucket }}) / ({{ sketch_gamma() }} + 1))
+{% endmacro %}
+
+-- Window columns needed by sketch_quantile, for rows of (partition_by..., bucket, bucket_count)
+{% macro sketch_running_counts(partition_by) %}
+    sum(bucket_count) over (
+        partition by {{ partition_by | join(', ') }}
+        order by bucket
+        rows between unbounded preceding and current row
+    ) as running_count,
+    sum(bucket_count) over (partition by {{ partition_by | join(', ') }}) as total_count
+{% endmacro %}
+
+-- Aggregate reading quantile q (0-1) from rows carrying sketch_running_counts
+{% macro sketch_quantile(q) %}
+    {{ bucket_price('min(case when running_count >= ' ~ q ~ ' * total_count then bucket end)') }}
+{% endmacro %}
@@ -1,12 +1,42 @@
 {{
   config(
-    materialized='table',
-    tags=['analytics', 'pricing']
+    materialized='incremental',
+    unique_key='card_id',
+    incremental_strategy='delete+insert',
+    tags=['analytics', 'pricing'],
+    post_hook=[
+      "{{ create_index(this, 'card_price_stats_card_id_idx', 'card_id') }}",
+      "{{ create_index(this, 'card_price_stats_avg_price_idx', 'avg_price') }}",
+      "{{ create_index(this, 'card_price_stats_card_name_idx', 'card_name') }}"
+    ]
   )
 }}
 
 -- Analytics: Price statistics by card
+-- Incremental runs re-aggregate only the cards with prices loaded since the last run
+{% if is_incremental() %}
+with touched_cards as (
+    select distinct card_name, set_name
+    from {{ ref('fct_card_prices') }}
+    where price_id > (select coalesce(max(last_price_id), 0) from {{ this }})
+),
+
+prices as (
+    select f.*
+    from {{ ref('fct_card_prices') }} f
+    inner join touched_cards t
+        on f.card_name = t.card_name
+        and coalesce(f.set_name, '') = coalesce(t.set_name, '')
+)
+{% else %}
+with prices as (
+    select * from {{ ref('fct_card_prices') }}
+)
+{% endif %}
+
 select
+    -- set_name can be null, so the merge key folds it into one non-null column
+    card_name || '|' || coalesce(set_name, '') as card_id,
     card_name,
     set_name,
     
@@ -30,9 +60,11 @@ select
     
     -- Price spread
     max(price_numeric) - min(price_numeric) as price_spread,
-    (max(price_numeric) - min(price_numeric)) / nullif(avg(price_numeric), 0) * 100 as price_spread_pct
+    (max(price_numeric) - min(price_numeric)) / nullif(avg(price_numeric), 0) * 100 as price_spread_pct,
+    
+    -- High-water mark for the next incremental run
+    max(price_id) as last_price_id
     
-from {{ ref('fct_card_prices') }} main
+from prices
 group by card_name, set_name
 having count(*) >= 1
-order by avg_price desc
@@ -1,40 +1,45 @@
 {{
   config(
     materialized='table',
-    tags=['analytics', 'trends']
+    tags=['analytics', 'trends'],
+    post_hook=[
+      "{{ create_index(this, 'price_trends_scraped_date_idx', 'scraped_date') }}",
+      "{{ create_index(this, 'price_trends_card_name_idx', 'card_name, scraped_date') }}"
+    ]
   )
 }}
 
 -- Analytics: Price trends over time by card and date
+-- Reads the daily rollup, so it scans card-days rather than listings
+with daily as (
+    select
+        *,
+        lag(avg_price) over (
+            partition by card_name, set_name 
+            order by scraped_date
+        ) as prev_day_avg_price
+    from {{ ref('fct_daily_card_prices') }}
+)
+
 select
     card_name,
     set_name,
     scraped_date,
     
-    count(*) as daily_listing_count,
-    min(price_numeric) as daily_min_price,
-    max(price_numeric) as daily_max_price,
-    avg(price_numeric) as daily_avg_price,
+    listing_count as daily_listing_count,
+    min_price as daily_min_price,
+    max_price as daily_max_price,
+    avg_price as daily_avg_price,
+    median_price as daily_median_price,
+    p90_price as daily_p90_price,
     
     -- Calculate day-over-day change
-    avg(price_numeric) - lag(avg(price_numeric)) over (
-        partition by card_name, set_name 
-        order by scraped_date
-    ) as price_change_from_prev_day,
+    avg_price - prev_day_avg_price as price_change_from_prev_day,
     
     -- Percent change
     round(
-        (avg(price_numeric) - lag(avg(price_numeric)) over (
-            partition by card_name, set_name 
-            order by scraped_date
-        )) / nullif(lag(avg(price_numeric)) over (
-            partition by card_name, set_name 
-            order by scraped_date
-        ), 0) * 100,
+        (avg_price - prev_day_avg_price) / nullif(prev_day_avg_price, 0) * 100,
         2
     ) as price_change_pct
     
-from {{ ref('fct_card_prices') }}
-group by card_name, set_name, scraped_date
-order by card_name, set_name, scraped_date desc
-
+from daily
@@ -0,0 +1,75 @@
+{{
+  config(
+    materialized='table',
+    tags=['analytics', 'trends']
+  )
+}}
+
+-- Analytics: Weekly price trends by card
+-- Merges the daily sketch buckets into weeks, so medians stay within the sketch accuracy
+with weekly_buckets as (
+    select
+        card_name,
+        set_name,
+        {{ week_start('scraped_date') }} as week_start,
+        bucket,
+        sum(bucket_count) as bucket_count,
+        sum(price_sum) as price_sum,
+        min(min_price) as min_price,
+        max(max_price) as max_price
+    from {{ ref('fct_daily_price_sketch') }}
+    group by card_name, set_name, {{ week_start('scraped_date') }}, bucket
+),
+
+cumulative as (
+    select
+        *,
+        {{ sketch_running_counts(['card_name', 'set_name', 'week_start']) }}
+    from weekly_buckets
+),
+
+weekly as (
+    select
+        card_name,
+        set_name,
+        week_start,
+        sum(bucket_count) as listing_count,
+        min(min_price) as min_price,
+        max(max_price) as max_price,
+        sum(price_sum) / sum(bucket_count) as avg_price,
+        {{ sketch_quantile(0.5) }} as median_price,
+        {{ sketch_quantile(0.9) }} as p90_price
+    from cumulative
+    group by card_name, set_name, week_start
+),
+
+changes as (
+    select
+        *,
+        lag(median_price) over (
+            partition by card_name, set_name
+            order by week_start
+        ) as prev_week_median_price
+    from weekly
+)
+
+select
+    card_name,
+    set_name,
+    week_start,
+    
+    listing_count as weekly_listing_count,
+    min_price as weekly_min_price,
+    max_price as weekly_max_price,
+    avg_price as weekly_avg_price,
+    median_price as weekly_median_price,
+    p90_price as weekly_p90_price,
+    
+    -- Week-over-week change of the median
+    median_price - prev_week_median_price as median_change_from_prev_week,
+    round(
+        (median_price - prev_week_median_price) / nullif(prev_week_median_price, 0) * 100,
+        2
+    ) as median_change_pct
+    
+from changes
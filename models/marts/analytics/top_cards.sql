@@ -1,7 +1,11 @@
 {{
   config(
     materialized='table',
-    tags=['analytics', 'summary']
+    tags=['analytics', 'summary'],
+    post_hook=[
+      "{{ create_index(this, 'top_cards_hotness_score_idx', 'hotness_score') }}",
+      "{{ create_index(this, 'top_cards_card_name_idx', 'card_name') }}"
+    ]
   )
 }}
 
@@ -1,42 +1,96 @@
 {{
   config(
-    materialized='table',
-    tags=['core', 'dimension']
+    materialized='incremental',
+    unique_key='card_id',
+    incremental_strategy='delete+insert',
+    tags=['core', 'dimension'],
+    post_hook=[
+      "{{ create_index(this, 'dim_cards_card_id_idx', 'card_id') }}",
+      "{{ create_index(this, 'dim_cards_card_key_idx', 'card_key') }}",
+      "{{ create_index(this, 'dim_cards_card_name_idx', 'card_name') }}"
+    ]
   )
 }}
 
 -- Dimension table: Unique cards with their latest information
-with latest_cards as (
+-- One row_number() pass picks each card's newest listing (ties broken by id). Incremental
+-- runs only look at new listings and keep the card_key a card was first given; after
+-- resolve-cards moves stored listings to other cards it rebuilds this with --full-refresh
+{% if is_incremental() %}
+{% set last_listing_id %}(select coalesce(max(last_listing_id), 0) from {{ this }}){% endset %}
+{% endif %}
+
+with listings as (
     select
+        card_name || '|' || coalesce(set_name, '') as card_id,
+        id as listing_id,
         card_name,
         set_name,
-        max(scraped_at) as latest_scrape
+        condition,
+        source,
+        scrape_method,
+        scraped_at
     from {{ ref('stg_mtg_cards') }}
-    group by card_name, set_name
+    {% if is_incremental() %}
+    where id > {{ last_listing_id }}
+    {% endif %}
 ),
 
-card_details as (
+candidates as (
+    select * from listings
+    {% if is_incremental() %}
+    
+    -- Stored latest listing of the cards seen again, so an older scrape never replaces it
+    union all
     select
-        s.card_name,
-        s.set_name,
-        s.condition,
-        s.source,
-        s.scrape_method,
-        s.scraped_at
-    from {{ ref('stg_mtg_cards') }} s
-    inner join latest_cards l
-        on s.card_name = l.card_name
-        and s.set_name = l.set_name
-        and s.scraped_at = l.latest_scrape
+        card_id,
+        listing_id,
+        card_name,
+        set_name,
+        typical_condition,
+        latest_source,
+        scrape_method,
+        last_updated
+    from {{ this }}
+    where card_id in (select card_id from listings)
+    {% endif %}
+),
+
+ranked as (
+    select
+        *,
+        row_number() over (
+            partition by card_id
+            order by scraped_at desc, listing_id desc
+        ) as recency,
+        max(listing_id) over (partition by card_id) as last_listing_id
+    from candidates
 )
 
 select
-    row_number() over (order by card_name, set_name) as card_key,
-    card_name,
-    set_name,
-    condition as typical_condition,
-    source as latest_source,
-    scrape_method,
-    scraped_at as last_updated
-from card_details
-
+    {% if is_incremental() %}
+    -- Known cards keep their key; new cards are numbered after the highest one
+    coalesce(
+        existing.card_key,
+        (select coalesce(max(card_key), 0) from {{ this }}) + row_number() over (
+            order by case when existing.card_key is null then 0 else 1 end, ranked.card_id
+        )
+    ) as card_key,
+    {% else %}
+    row_number() over (order by ranked.card_id) as card_key,
+    {% endif %}
+    ranked.card_id,
+    ranked.card_name,
+    ranked.set_name,
+    ranked.condition as typical_condition,
+    ranked.source as latest_source,
+    ranked.scrape_method,
+    ranked.scraped_at as last_updated,
+    ranked.listing_id,
+    ranked.last_listing_id
+from ranked
+{% if is_incremental() %}
+left join {{ this }} existing
+    on existing.card_id = ranked.card_id
+{% endif %}
+where ranked.recency = 1
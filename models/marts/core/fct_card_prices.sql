@@ -1,20 +1,37 @@
 {{
   config(
-    materialized='table',
-    tags=['core', 'fact']
+    materialized='incremental',
+    unique_key='price_id',
+    incremental_strategy='delete+insert',
+    on_schema_change='append_new_columns',
+    tags=['core', 'fact'],
+    post_hook=[
+      "{{ create_index(this, 'fct_card_prices_price_id_idx', 'price_id') }}",
+      "{{ create_index(this, 'fct_card_prices_card_idx', 'card_name, set_name') }}",
+      "{{ create_index(this, 'fct_card_prices_date_idx', 'scraped_date') }}"
+    ]
   )
 }}
 
 -- Fact table: All card price observations
+-- Listing ids only grow, so incremental runs load the rows above the highest price_id.
+-- Rows loaded before are not revisited: resolve-cards runs --full-refresh after it
+-- changes the card identity of stored listings
 select
     id as price_id,
     card_name,
     set_name,
+    foil,
+    title,
     price_numeric,
+    price_max,
+    currency,
     price_raw,
     condition,
+    condition_normalized,
     seller,
     shipping,
+    shipping_value,
     buy_it_now,
     source,
     scrape_method,
@@ -24,4 +41,6 @@ select
 from {{ ref('stg_mtg_cards') }}
 where price_numeric > 0  -- Filter out invalid prices
   and price_numeric < 1000000  -- Filter out unrealistic prices
-
+{% if is_incremental() %}
+  and id > (select coalesce(max(price_id), 0) from {{ this }})
+{% endif %}
@@ -0,0 +1,51 @@
+{{
+  config(
+    materialized='incremental',
+    unique_key='scraped_date',
+    incremental_strategy='delete+insert',
+    tags=['core', 'fact'],
+    post_hook=[
+      "{{ create_index(this, 'fct_daily_card_prices_date_idx', 'scraped_date') }}"
+    ]
+  )
+}}
+
+-- Fact table: Daily price rollup per card, read from the sketch buckets
+-- Incremental runs rebuild the days whose buckets changed since the last run
+with buckets as (
+    select *
+    from {{ ref('fct_daily_price_sketch') }}
+    {% if is_incremental() %}
+    where scraped_date in (
+        select distinct scraped_date
+        from {{ ref('fct_daily_price_sketch') }}
+        where last_price_id > (select coalesce(max(last_price_id), 0) from {{ this }})
+    )
+    {% endif %}
+),
+
+cumulative as (
+    select
+        *,
+        {{ sketch_running_counts(['card_name', 'set_name', 'scraped_date']) }}
+    from buckets
+)
+
+select
+    card_name,
+    set_name,
+    scraped_date,
+    
+    sum(bucket_count) as listing_count,
+    sum(price_sum) as price_sum,
+    min(min_price) as min_price,
+    max(max_price) as max_price,
+    sum(price_sum) / sum(bucket_count) as avg_price,
+    {{ sketch_quantile(0.5) }} as median_price,
+    {{ sketch_quantile(0.9) }} as p90_price,
+    
+    -- High-water mark for the next incremental run
+    max(last_price_id) as last_price_id
+    
+from cumulative
+group by card_name, set_name, scraped_date
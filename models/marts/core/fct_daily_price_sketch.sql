@@ -0,0 +1,35 @@
+{{
+  config(
+    materialized='incremental',
+    unique_key='scraped_date',
+    incremental_strategy='delete+insert',
+    tags=['core', 'fact'],
+    post_hook=[
+      "{{ create_index(this, 'fct_daily_price_sketch_date_idx', 'scraped_date') }}"
+    ]
+  )
+}}
+
+-- Fact table: Price distribution per card and day as quantile sketch buckets
+-- (see macros/price_sketch.sql). Incremental runs rebuild the days that received new prices
+select
+    card_name,
+    set_name,
+    scraped_date,
+    {{ price_bucket('price_numeric') }} as bucket,
+    
+    count(*) as bucket_count,
+    sum(price_numeric) as price_sum,
+    min(price_numeric) as min_price,
+    max(price_numeric) as max_price,
+    max(price_id) as last_price_id
+    
+from {{ ref('fct_card_prices') }}
+{% if is_incremental() %}
+where scraped_date in (
+    select distinct scraped_date
+    from {{ ref('fct_card_prices') }}
+    where price_id > (select coalesce(max(last_price_id), 0) from {{ this }})
+)
+{% endif %}
+group by card_name, set_name, scraped_date, bucket
@@ -6,49 +6,42 @@
 }}
 
 -- Staging model: Clean and standardize raw MTG card data
+-- Prices, shipping, condition and the card identity are parsed at ingest
+-- (mtgscraper/normalize.py), so this view only renames columns and parses the timestamp
+
 with source_data as (
-    select * from mtg_cards
+    select * from {{ raw_listings() }}
 ),
 
 cleaned as (
     select
         id,
+        -- Canonical card and set resolved from the listing title at ingest (mtgscraper/cards.py);
+        -- titles that name no known card are kept as the card name
         card_name,
         set_name,
+        title,
+        cast(foil as boolean) as foil,
         
-        -- Clean price: extract numeric value
-        -- Convert "$1,234.56" to 1234.56
-        replace(replace(replace(price, '$', ''), ',', ''), ' to ', '-') as price_raw,
-        
-        -- Try to extract first price if range
-        cast(
-            replace(
-                replace(
-                    replace(
-                        case 
-                            when instr(replace(replace(price, '$', ''), ',', ''), ' to ') > 0 
-                            then substr(replace(replace(price, '$', ''), ',', ''), 1, instr(replace(replace(price, '$', ''), ',', ''), ' to ') - 1)
-                            else replace(replace(price, '$', ''), ',', '')
-                        end,
-                        '$', ''
-                    ),
-                    ',', ''
-                ),
-                ' ', ''
-            ) as real
-        ) as price_numeric,
+        -- Price as scraped and its numeric value (low end of a "to" range)
+        price as price_raw,
+        price_value as price_numeric,
+        price_max,
+        currency,
         
         condition,
+        condition_normalized,
         seller,
         url,
         source,
         
         -- Parse timestamp
-        datetime(timestamp) as scraped_at,
-        date(timestamp) as scraped_date,
+        {{ to_timestamp('timestamp') }} as scraped_at,
+        {{ to_date('timestamp') }} as scraped_date,
         
         shipping,
-        buy_it_now,
+        shipping_value,
+        cast(buy_it_now as boolean) as buy_it_now,
         
         -- Extract source type
         case 
@@ -60,8 +53,7 @@ cleaned as (
         
     from source_data
     where card_name is not null
-      and price is not null
+      and price_value is not null
 )
 
 select * from cleaned
-
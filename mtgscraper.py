@@ -5,30 +5,61 @@ MTG Scraper - CLI tool for scraping Magic: The Gathering card prices
 '''
 
 import click
+import contextlib
+import functools
+import json
 import os
 import sys
 from colorama import init, Fore, Style
-from tabulate import tabulate
-# Scrapy imports removed - using subprocess instead to avoid reactor issues
-from sqlalchemy import create_engine, desc
-from sqlalchemy.orm import sessionmaker
-from mtgscraper.pipelines import MtgCard, Base
-import pyfiglet
+# Heavy modules (SQLAlchemy, tabulate, pyfiglet, Scrapy) are imported inside
+# the functions that use them so startup stays fast for cron and direct mode
 from mtgscraper.colors import (
     Colors, gradient_text, cyber_gradient, purple_gradient, 
     magic_gradient, fire_gradient, green_gradient, rainbow_gradient,
     center_colored_text, visible_length, strip_ansi
 )
+from mtgscraper.storage import database_exists, database_name, database_path, get_engine
 
 # Initialize colorama
 init(autoreset=True)
 
 
+BANNER_TEXT = 'MTG Scraper'
+BANNER_FONT = 'slant'
+BANNER_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'mtgscraper', f'banner_{BANNER_FONT}.txt')
+
+
+@functools.lru_cache(maxsize=None)
+def render_figlet_banner():
+    '''
+    Render the figlet banner, reusing the on-disk copy when available
+    pyfiglet font loading is slow, so it only runs the first time
+    '''
+    try:
+        with open(BANNER_CACHE_PATH, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        pass
+    
+    import pyfiglet
+    banner = pyfiglet.figlet_format(BANNER_TEXT, font=BANNER_FONT)
+    
+    try:
+        os.makedirs(os.path.dirname(BANNER_CACHE_PATH), exist_ok=True)
+        with open(BANNER_CACHE_PATH, 'w', encoding='utf-8') as f:
+            f.write(banner)
+    except OSError:
+        # Caching is best effort - a read-only home still gets a banner
+        pass
+    
+    return banner
+
+
 def print_banner():
     '''
     Display ASCII art banner with gradient effects
     '''
-    banner = pyfiglet.figlet_format('MTG Scraper', font='slant')
+    banner = render_figlet_banner()
     
     # Apply gradient to each line of the banner
     banner_lines = banner.split('\n')
@@ -77,6 +108,19 @@ def print_info(message):
     print(f'{icon} {Colors.BRIGHT_CYAN}{message}{Colors.RESET}')
 
 
+def print_crawl_summary(result):
+    '''
+    Print the stats reported by the crawl worker
+    '''
+    errors_color = Fore.RED if result['errors'] else Fore.GREEN
+    print_info(
+        f'Items: {Fore.YELLOW}{result["items"]}{Fore.CYAN}  '
+        f'Pages: {Fore.YELLOW}{result["pages"]}{Fore.CYAN}  '
+        f'Errors: {errors_color}{result["errors"]}{Fore.CYAN}  '
+        f'Time: {Fore.YELLOW}{result["elapsed_seconds"]:.1f}s'
+    )
+
+
 # strip_ansi now imported from colors module
 
 
@@ -232,9 +276,6 @@ def ebay_api_search():
     '''
     Search using eBay's official Browse API (RESTful, OAuth 2.0)
     '''
-    import requests
-    from datetime import datetime
-    
     header = gradient_text('━━━ eBay BROWSE API (OAuth 2.0) ━━━', (0, 255, 255), (0, 150, 255))
     print(f'\n{header}\n')
     print_info('This uses eBay\'s modern RESTful API with OAuth')
@@ -301,59 +342,112 @@ def ebay_api_search():
     print()
     
     try:
-        if client_id == 'DEMO_MODE':
-            # Simulated API response for demo purposes
-            print_info('Simulating API call (demo mode)...')
-            results = _simulate_ebay_api_response(card, limit)
-        else:
-            # Real API call with OAuth
-            results = _call_ebay_browse_api(client_id, client_secret, card, limit)
+        saved = search_ebay_api(get_engine(create=True), card, limit, client_id, client_secret)
         
-        if not results:
+        if not saved:
             print_error('No results found')
             return
         
-        # Save to database
-        db_path = os.path.join(os.getcwd(), 'mtg_cards.db')
-        engine = create_engine(f'sqlite:///{db_path}')
-        Base.metadata.create_all(engine)
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        for item in results:
-            api_card = MtgCard(
-                card_name=item['title'],
-                price=item['price'],
-                condition=item.get('condition', 'Not specified'),
-                url=item['url'],
-                source='eBay API (Official)',
-                timestamp=datetime.now().isoformat(),
-                shipping=item.get('shipping', 'See listing'),
-                buy_it_now=True,
-                seller=item.get('seller', 'eBay'),
-                set_name='Unknown'
-            )
-            session.add(api_card)
-        
-        session.commit()
-        session.close()
-        
         print()
-        print_success(f'API search completed! Found {len(results)} cards.')
-        print_info(f'Results saved to: {Fore.YELLOW}mtg_cards.db')
+        print_success(f'API search completed! Found {saved} cards.')
+        print_info(f'Results saved to: {Fore.YELLOW}{database_name()}')
         print_info(f'Use {Fore.YELLOW}option 4{Fore.CYAN} to view the results!')
         
     except Exception as e:
         print_error(f'API search failed: {str(e)}')
 
 
+def search_ebay_api(engine, card, limit, client_id, client_secret, incremental=False):
+    '''
+    Run a Browse API search and save the results, returning the number saved
+    Pass 'DEMO_MODE' credentials to use a simulated response
+    incremental fetches the newest listings first and stops at the ones
+    already saved (see mtgscraper/seen.py)
+    '''
+    from mtgscraper.seen import open_seen
+    
+    seen = open_seen(engine=engine) if incremental else None
+    try:
+        if client_id == 'DEMO_MODE':
+            # Simulated API response for demo purposes
+            print_info('Simulating API call (demo mode)...')
+            results = _simulate_ebay_api_response(card, limit)
+        else:
+            # Real API call with OAuth - items are streamed page by page
+            results = _call_ebay_browse_api(client_id, client_secret, card, limit, seen)
+        
+        # Save to database as the results arrive
+        return _save_api_results(engine, results, seen=seen)
+    finally:
+        if seen is not None:
+            seen.close()
+
+
+def _save_api_results(engine, results, batch_size=500, seen=None):
+    '''
+    Write API results to the database in fixed-size batches
+    Consumes the results iterable lazily so only one batch is held at a time,
+    and commits every batch in its own transaction
+    The ids of the saved listings are added to seen once they are committed
+    '''
+    from datetime import datetime
+    from mtgscraper.lake import open_lake_writer
+    from mtgscraper.normalize import normalized
+    from mtgscraper.seen import listing_id
+    from mtgscraper.stats import refresh_summary
+    from mtgscraper.storage import insert_listings
+    
+    lake = open_lake_writer()
+    
+    def flush(batch):
+        # Each batch commits on its own, so the write lock is not held while
+        # the next page is fetched and a failure keeps the batches before it
+        with engine.begin() as connection:
+            insert_listings(connection, batch)
+        if lake:
+            lake.write_many(batch)
+        if seen is not None:
+            seen.add(listing_id(listing['url']) for listing in batch)
+        return len(batch)
+    
+    batch = []
+    saved = 0
+    try:
+        for item in results:
+            batch.append(normalized({
+                'card_name': item['title'],
+                'price': item['price'],
+                'condition': item.get('condition', 'Not specified'),
+                'url': item['url'],
+                'source': 'eBay API (Official)',
+                'timestamp': datetime.now().isoformat(),
+                'shipping': item.get('shipping', 'See listing'),
+                'buy_it_now': True,
+                'seller': item.get('seller', 'eBay'),
+                'set_name': 'Unknown'
+            }))
+            
+            if len(batch) >= batch_size:
+                saved += flush(batch)
+                batch = []
+        
+        if batch:
+            saved += flush(batch)
+    finally:
+        if lake:
+            lake.close()
+        if saved:
+            refresh_summary(engine)
+    
+    return saved
+
+
 def _simulate_ebay_api_response(card_name, limit):
     '''
     Simulate eBay API response for demonstration
     '''
     import random
     
-    results = []
     sets = ['Alpha', 'Beta', 'Unlimited', 'Revised', 'Modern Masters']
     conditions = ['New', 'Like New', 'Very Good', 'Good']
     
@@ -363,16 +457,14 @@ def _simulate_ebay_api_response(card_name, limit):
         else:
             price = random.randint(5, 500)
         
-        results.append({
+        yield {
             'title': f'{card_name} - {random.choice(sets)}',
             'price': f'${price:,}.{random.randint(0, 99):02d}',
             'condition': random.choice(conditions),
             'url': f'https://www.ebay.com/itm/demo-{i}',
             'shipping': random.choice(['Free shipping', f'${random.randint(3, 10)}.99 shipping']),
             'seller': f'seller_{random.randint(100, 999)}'
-        })
-    
-    return results
+        }
 
 
 def _get_ebay_oauth_token(client_id, client_secret):
@@ -406,11 +498,15 @@ def _get_ebay_oauth_token(client_id, client_secret):
     return token_data['access_token']
 
 
-def _call_ebay_browse_api(client_id, client_secret, keywords, limit):
+def _call_ebay_browse_api(client_id, client_secret, keywords, limit, seen=None):
     '''
     Call eBay's Browse API (RESTful with OAuth 2.0)
+    Yields one result dict per listing, fetching pages of up to 200 items
+    With a seen-listings set, newest listings come first, the ones in seen are
+    skipped, and no more pages are fetched after one that is mostly seen
     '''
     import requests
+    from mtgscraper.seen import mostly_seen
     
     # Get OAuth token
     print_info('Getting OAuth access token...')
@@ -427,46 +523,87 @@ def _call_ebay_browse_api(client_id, client_secret, keywords, limit):
         'Content-Type': 'application/json'
     }
     
-    params = {
-        'q': f'mtg {keywords}',
-        'limit': str(min(limit, 200)),
-        'sort': 'price'
-    }
-    
-    response = requests.get(search_url, headers=headers, params=params, timeout=10)
-    response.raise_for_status()
-    
-    data = response.json()
-    
-    results = []
-    items = data.get('itemSummaries', [])
+    offset = 0
     
-    for item in items:
-        # Extract price
-        price_info = item.get('price', {})
-        price_value = price_info.get('value', '0')
-        price_currency = price_info.get('currency', 'USD')
+    while offset < limit:
+        page_size = min(limit - offset, 200)
+        params = {
+            'q': f'mtg {keywords}',
+            'limit': str(page_size),
+            'offset': str(offset),
+            'sort': 'newlyListed' if seen is not None else 'price'
+        }
         
-        # Extract shipping
-        shipping_info = item.get('shippingOptions', [{}])[0] if item.get('shippingOptions') else {}
-        shipping_cost = shipping_info.get('shippingCost', {})
-        shipping_value = shipping_cost.get('value', '0')
+        response = requests.get(search_url, headers=headers, params=params, timeout=10, stream=True)
+        response.raise_for_status()
         
-        if shipping_value == '0' or shipping_value == '0.0':
-            shipping_text = 'Free shipping'
-        else:
-            shipping_text = f'${shipping_value} shipping'
-        
-        results.append({
-            'title': item.get('title', 'Unknown'),
-            'price': f'${price_value}',
-            'condition': item.get('condition', 'Not specified'),
-            'url': item.get('itemWebUrl', ''),
-            'shipping': shipping_text,
-            'seller': item.get('seller', {}).get('username', 'Unknown')
-        })
+        page_count = 0
+        page = []
+        try:
+            for item in _iter_item_summaries(response):
+                page_count += 1
+                if seen is None:
+                    yield _parse_item_summary(item)
+                else:
+                    page.append(_parse_item_summary(item))
+        finally:
+            response.close()
+        
+        if seen is not None:
+            unseen = seen.unseen(page)
+            yield from unseen
+            if mostly_seen(len(page) - len(unseen), len(page)):
+                print_info(f'{len(page) - len(unseen)} of {len(page)} listings already saved, stopping')
+                break
+        
+        # A short page means eBay has no more results for this query
+        if page_count < page_size:
+            break
+        offset += page_count
+
+
+def _iter_item_summaries(response):
+    '''
+    Incrementally parse the itemSummaries array of a streamed Browse API response
+    Falls back to parsing the whole page when ijson is not installed
+    '''
+    try:
+        import ijson
+    except ImportError:
+        yield from response.json().get('itemSummaries', [])
+        return
     
-    return results
+    # Let urllib3 undo gzip/deflate so ijson sees plain JSON bytes
+    response.raw.decode_content = True
+    yield from ijson.items(response.raw, 'itemSummaries.item', use_float=True)
+
+
+def _parse_item_summary(item):
+    '''
+    Convert a single Browse API item summary into a result dict
+    '''
+    # Extract price
+    price_info = item.get('price', {})
+    price_value = price_info.get('value', '0')
+    
+    # Extract shipping
+    shipping_info = item.get('shippingOptions', [{}])[0] if item.get('shippingOptions') else {}
+    shipping_cost = shipping_info.get('shippingCost', {})
+    shipping_value = shipping_cost.get('value', '0')
+    
+    if shipping_value == '0' or shipping_value == '0.0':
+        shipping_text = 'Free shipping'
+    else:
+        shipping_text = f'${shipping_value} shipping'
+    
+    return {
+        'title': item.get('title', 'Unknown'),
+        'price': f'${price_value}',
+        'condition': item.get('condition', 'Not specified'),
+        'url': item.get('itemWebUrl', ''),
+        'shipping': shipping_text,
+        'seller': item.get('seller', {}).get('username', 'Unknown')
+    }
 
 
 def playwright_scraper():
@@ -571,210 +708,21 @@ def playwright_scraper():
     print()
     
     try:
-        from datetime import datetime
-        from mtgscraper.analyzer import PageStructureAnalyzer
-        results = []
-        
-        with sync_playwright() as p:
-            # Launch browser (headless or visible)
-            browser = p.chromium.launch(
-                headless=headless,
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-dev-shm-usage',
-                    '--no-sandbox'
-                ],
-                slow_mo=100 if not headless else 0  # Slow down in visible mode
-            )
-            
-            # Create context with realistic settings
-            context = browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-            )
-            
-            page = context.new_page()
-            
-            # Navigate to eBay search
-            search_url = f'https://www.ebay.com/sch/i.html?_nkw=mtg+{card.replace(" ", "+")}&LH_BIN=1{sort_param}'
-            print_info(f'Navigating to eBay...')
-            
-            # Pagination loop
-            current_page = 1
-            selectors = None
-            
-            while current_page <= max_pages and len(results) < limit * max_pages:
-                try:
-                    # Navigate to page
-                    if current_page == 1:
-                        page_url = search_url
-                    else:
-                        page_url = f'{search_url}&_pgn={current_page}'
-                    
-                    print_info(f'Scraping page {current_page}...')
-                    page.goto(page_url, wait_until='domcontentloaded', timeout=30000)
-                    
-                    # Wait a bit for dynamic content
-                    page.wait_for_timeout(3000)
-                    
-                    # Analyze page structure on first page
-                    if current_page == 1:
-                        print_info('Running structure analyzer...')
-                        analyzer = PageStructureAnalyzer(page)
-                        selectors = analyzer.analyze()
-                        print()
-                    
-                    # Use discovered selectors
-                    listings = page.query_selector_all(selectors.get('container', '.s-item'))
-                    
-                    if not listings:
-                        # Take screenshot for debugging
-                        page.screenshot(path='ebay_debug.png')
-                        
-                        # Also save HTML for inspection
-                        with open('ebay_debug.html', 'w', encoding='utf-8') as f:
-                            f.write(page.content())
-                        
-                        print_error('Could not find listings on page')
-                        print_info('Debug files saved:')
-                        print(Fore.CYAN + '   • ebay_debug.png (screenshot)')
-                        print(Fore.CYAN + '   • ebay_debug.html (page source)')
-                        print()
-                        print(Fore.YELLOW + 'eBay may have changed their HTML structure or is blocking')
-                        break
-                    
-                    # Extract listings using JavaScript (more reliable)
-                    print_info(f'Found {len(listings)} listings, extracting data...')
-                    
-                    # Use JavaScript to extract data directly with discovered selectors
-                    results_js = page.evaluate('''
-                        (selectors) => {
-                            const items = [];
-                            const containerSelector = selectors.container || '.s-item';
-                            const titleSelector = selectors.title || '.s-item__title';
-                            const priceSelector = selectors.price || '.s-item__price';
-                            
-                            const listings = document.querySelectorAll(containerSelector + ', .s-item, li.s-item, [class*="s-item"]');
-                            
-                            listings.forEach((listing, index) => {
-                                try {
-                                    // Get title using discovered selector
-                                    const titleEl = listing.querySelector(titleSelector + ', .s-item__title span, .s-item__title, h3');
-                                    const title = titleEl ? titleEl.textContent.trim() : null;
-                                    
-                                    // Get price using discovered selector
-                                    const priceEl = listing.querySelector(priceSelector + ', .s-item__price, span.s-item__price');
-                                    const price = priceEl ? priceEl.textContent.trim() : null;
-                                    
-                                    // Get bid count
-                                    const bidEl = listing.querySelector('.s-item__bids, .s-item__bidCount, [class*="bid"]');
-                                    const bids = bidEl ? bidEl.textContent.trim() : '0 bids';
-                                    
-                                    // Get shipping info
-                                    const shippingEl = listing.querySelector('.s-item__shipping, .s-item__freeXDays, [class*="shipping"]');
-                                    const shipping = shippingEl ? shippingEl.textContent.trim() : 'See listing';
-                                    
-                                    // Get URL
-                                    const linkEl = listing.querySelector('a.s-item__link, a[href*="/itm/"]');
-                                    const url = linkEl ? linkEl.href : '';
-                                    
-                                    // Only include if we have title and price
-                                    if (title && price && title.toLowerCase() !== 'shop on ebay' && price.includes('$')) {
-                                        items.push({
-                                            title: title,
-                                            price: price,
-                                            bids: bids,
-                                            shipping: shipping,
-                                            url: url
-                                        });
-                                    }
-                                } catch (e) {
-                                    // Skip items that fail
-                                }
-                            });
-                            
-                            return items;
-                        }
-                    ''', selectors)
-                    
-                    # Convert JavaScript results to Python
-                    print_info(f'JavaScript extracted {len(results_js)} items from page {current_page}')
-                    
-                    page_results = 0
-                    for item in results_js:
-                        if len(results) >= limit * max_pages:
-                            break
-                            
-                        # Extract bid count for display
-                        bid_info = item.get('bids', '0 bids')
-                        has_bids = 'bid' in bid_info.lower() and bid_info.strip() != '0 bids'
-                        
-                        results.append({
-                            'card_name': item['title'],
-                            'price': item['price'],
-                            'url': item['url'],
-                            'source': 'eBay (Playwright)',
-                            'timestamp': datetime.now().isoformat(),
-                            'condition': bid_info if has_bids else 'Buy It Now',
-                            'shipping': item.get('shipping', 'See listing'),
-                            'buy_it_now': not has_bids,
-                            'seller': 'eBay Seller',
-                            'set_name': 'Unknown'
-                        })
-                        
-                        # Display with bid info
-                        bid_display = f' | {Fore.YELLOW}{bid_info}{Style.RESET_ALL}' if has_bids else ''
-                        price_display = f' | {Fore.GREEN}{item["price"]}{Style.RESET_ALL}'
-                        print(f'   {Fore.GREEN}✓{Style.RESET_ALL} {item["title"][:45]}{price_display}{bid_display}')
-                        page_results += 1
-                    
-                    print_info(f'Collected {page_results} items from page {current_page}. Total so far: {len(results)}')
-                    print()
-                    
-                    # Check if there's a next page
-                    if current_page >= max_pages:
-                        print_info(f'Reached max pages limit ({max_pages})')
-                        break
-                    
-                    # Check for next page button
-                    next_button = page.query_selector('a.pagination__next, nav.pagination a[aria-label="Next page"]')
-                    if not next_button:
-                        print_info('No more pages available')
-                        break
-                    
-                    current_page += 1
-                    
-                except Exception as e:
-                    print_error(f'Error on page {current_page}: {str(e)}')
-                    # Save debug files if no results
-                    if not results:
-                        page.screenshot(path='ebay_debug.png')
-                        with open('ebay_debug.html', 'w', encoding='utf-8') as f:
-                            f.write(page.content())
-                        print()
-                        print_info('Debug files saved for inspection')
-                    break
-            
-            browser.close()
+        results = run_playwright_scrape(
+            card,
+            sort_param=sort_param,
+            limit=limit,
+            max_pages=max_pages,
+            headless=headless
+        )
         
         # Save to database
         if results:
-            db_path = os.path.join(os.getcwd(), 'mtg_cards.db')
-            engine = create_engine(f'sqlite:///{db_path}')
-            Base.metadata.create_all(engine)
-            Session = sessionmaker(bind=engine)
-            session = Session()
-            
-            for item in results:
-                card = MtgCard(**item)
-                session.add(card)
-            
-            session.commit()
-            session.close()
+            save_scraped_results(get_engine(create=True), results)
             
             print()
             print_success(f'Found {Fore.YELLOW}{len(results)}{Fore.GREEN} cards!')
-            print_info(f'Results saved to: {Fore.YELLOW}mtg_cards.db')
+            print_info(f'Results saved to: {Fore.YELLOW}{database_name()}')
             print_info(f'Use {Fore.YELLOW}option 4{Fore.CYAN} to view results')
         else:
             print()
@@ -805,6 +753,246 @@ def playwright_scraper():
         print(Fore.CYAN + '   3. Use option 1 (eBay API) for reliable access')
 
 
+def run_playwright_scrape(card, sort_param='', limit=20, max_pages=5, headless=True, seen=None):
+    '''
+    Scrape eBay search results with a Playwright-driven browser
+    Returns a list of result dicts ready to be saved to the database
+    Listings in seen, a seen-listings set, are skipped, and no more pages are
+    scraped after one that is mostly seen; sort newly listed for that
+    '''
+    from mtgscraper.seen import mostly_seen
+    
+    from datetime import datetime
+    from playwright.sync_api import sync_playwright
+    from mtgscraper.analyzer import PageStructureAnalyzer
+    
+    results = []
+    
+    with sync_playwright() as p:
+        # Launch browser (headless or visible)
+        browser = p.chromium.launch(
+            headless=headless,
+            args=[
+                '--disable-blink-features=AutomationControlled',
+                '--disable-dev-shm-usage',
+                '--no-sandbox'
+            ],
+            slow_mo=100 if not headless else 0  # Slow down in visible mode
+        )
+        
+        # Create context with realistic settings
+        context = browser.new_context(
+            viewport={'width': 1920, 'height': 1080},
+            user_agent='Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        )
+        
+        page = context.new_page()
+        
+        # Navigate to eBay search
+        search_url = f'https://www.ebay.com/sch/i.html?_nkw=mtg+{card.replace(" ", "+")}&LH_BIN=1{sort_param}'
+        print_info(f'Navigating to eBay...')
+        
+        # Pagination loop
+        current_page = 1
+        selectors = None
+        
+        while current_page <= max_pages and len(results) < limit * max_pages:
+            try:
+                # Navigate to page
+                if current_page == 1:
+                    page_url = search_url
+                else:
+                    page_url = f'{search_url}&_pgn={current_page}'
+                
+                print_info(f'Scraping page {current_page}...')
+                page.goto(page_url, wait_until='domcontentloaded', timeout=30000)
+                
+                # Wait a bit for dynamic content
+                page.wait_for_timeout(3000)
+                
+                # Analyze page structure on first page
+                if current_page == 1:
+                    print_info('Running structure analyzer...')
+                    analyzer = PageStructureAnalyzer(page)
+                    selectors = analyzer.analyze()
+                    print()
+                
+                # Use discovered selectors
+                listings = page.query_selector_all(selectors.get('container', '.s-item'))
+                
+                if not listings:
+                    # Take screenshot for debugging
+                    page.screenshot(path='ebay_debug.png')
+                    
+                    # Also save HTML for inspection
+                    with open('ebay_debug.html', 'w', encoding='utf-8') as f:
+                        f.write(page.content())
+                    
+                    print_error('Could not find listings on page')
+                    print_info('Debug files saved:')
+                    print(Fore.CYAN + '   • ebay_debug.png (screenshot)')
+                    print(Fore.CYAN + '   • ebay_debug.html (page source)')
+                    print()
+                    print(Fore.YELLOW + 'eBay may have changed their HTML structure or is blocking')
+                    break
+                
+                # Extract listings using JavaScript (more reliable)
+                print_info(f'Found {len(listings)} listings, extracting data...')
+                
+                # Use JavaScript to extract data directly with discovered selectors
+                results_js = page.evaluate('''
+                    (selectors) => {
+                        const items = [];
+                        const containerSelector = selectors.container || '.s-item';
+                        const titleSelector = selectors.title || '.s-item__title';
+                        const priceSelector = selectors.price || '.s-item__price';
+                        
+                        const listings = document.querySelectorAll(containerSelector + ', .s-item, li.s-item, [class*="s-item"]');
+                        
+                        listings.forEach((listing, index) => {
+                            try {
+                                // Get title using discovered selector
+                                const titleEl = listing.querySelector(titleSelector + ', .s-item__title span, .s-item__title, h3');
+                                const title = titleEl ? titleEl.textContent.trim() : null;
+                                
+                                // Get price using discovered selector
+                                const priceEl = listing.querySelector(priceSelector + ', .s-item__price, span.s-item__price');
+                                const price = priceEl ? priceEl.textContent.trim() : null;
+                                
+                                // Get bid count
+                                const bidEl = listing.querySelector('.s-item__bids, .s-item__bidCount, [class*="bid"]');
+                                const bids = bidEl ? bidEl.textContent.trim() : '0 bids';
+                                
+                                // Get shipping info
+                                const shippingEl = listing.querySelector('.s-item__shipping, .s-item__freeXDays, [class*="shipping"]');
+                                const shipping = shippingEl ? shippingEl.textContent.trim() : 'See listing';
+                                
+                                // Get URL
+                                const linkEl = listing.querySelector('a.s-item__link, a[href*="/itm/"]');
+                                const url = linkEl ? linkEl.href : '';
+                                
+                                // Only include if we have title and price
+                                if (title && price && title.toLowerCase() !== 'shop on ebay' && price.includes('$')) {
+                                    items.push({
+                                        title: title,
+                                        price: price,
+                                        bids: bids,
+                                        shipping: shipping,
+                                        url: url
+                                    });
+                                }
+                            } catch (e) {
+                                // Skip items that fail
+                            }
+                        });
+                        
+                        return items;
+                    }
+                ''', selectors)
+                
+                # Convert JavaScript results to Python
+                print_info(f'JavaScript extracted {len(results_js)} items from page {current_page}')
+                
+                known = 0
+                if seen is not None:
+                    fresh = seen.unseen(results_js)
+                    known = len(results_js) - len(fresh)
+                    print_info(f'{known} of {len(results_js)} listings already saved')
+                    results_js = fresh
+                
+                page_results = 0
+                for item in results_js:
+                    if len(results) >= limit * max_pages:
+                        break
+                        
+                    # Extract bid count for display
+                    bid_info = item.get('bids', '0 bids')
+                    has_bids = 'bid' in bid_info.lower() and bid_info.strip() != '0 bids'
+                    
+                    results.append({
+                        'card_name': item['title'],
+                        'price': item['price'],
+                        'url': item['url'],
+                        'source': 'eBay (Playwright)',
+                        'timestamp': datetime.now().isoformat(),
+                        'condition': bid_info if has_bids else 'Buy It Now',
+                        'shipping': item.get('shipping', 'See listing'),
+                        'buy_it_now': not has_bids,
+                        'seller': 'eBay Seller',
+                        'set_name': 'Unknown'
+                    })
+                    
+                    # Display with bid info
+                    bid_display = f' | {Fore.YELLOW}{bid_info}{Style.RESET_ALL}' if has_bids else ''
+                    price_display = f' | {Fore.GREEN}{item["price"]}{Style.RESET_ALL}'
+                    print(f'   {Fore.GREEN}✓{Style.RESET_ALL} {item["title"][:45]}{price_display}{bid_display}')
+                    page_results += 1
+                
+                print_info(f'Collected {page_results} items from page {current_page}. Total so far: {len(results)}')
+                print()
+                
+                if seen is not None and mostly_seen(known, known + len(results_js)):
+                    print_info('Reached listings already saved')
+                    break
+                
+                # Check if there's a next page
+                if current_page >= max_pages:
+                    print_info(f'Reached max pages limit ({max_pages})')
+                    break
+                
+                # Check for next page button
+                next_button = page.query_selector('a.pagination__next, nav.pagination a[aria-label="Next page"]')
+                if not next_button:
+                    print_info('No more pages available')
+                    break
+                
+                current_page += 1
+                
+            except Exception as e:
+                print_error(f'Error on page {current_page}: {str(e)}')
+                # Save debug files if no results
+                if not results:
+                    page.screenshot(path='ebay_debug.png')
+                    with open('ebay_debug.html', 'w', encoding='utf-8') as f:
+                        f.write(page.content())
+                    print()
+                    print_info('Debug files saved for inspection')
+                break
+        
+        browser.close()
+    
+    return results
+
+
+def save_scraped_results(engine, results, seen=None):
+    '''
+    Save scraped result dicts (MtgCard column names) to the database
+    Their ids are added to seen, the seen-listings set of an incremental scrape
+    '''
+    from mtgscraper.lake import open_lake_writer
+    from mtgscraper.normalize import normalized
+    from mtgscraper.seen import record_listings
+    from mtgscraper.stats import refresh_summary
+    from mtgscraper.storage import insert_listings
+    
+    if not results:
+        return 0
+    
+    results = [normalized(result) for result in results]
+    with engine.begin() as connection:
+        insert_listings(connection, results)
+    refresh_summary(engine)
+    
+    record_listings(seen, results)
+    
+    lake = open_lake_writer()
+    if lake:
+        lake.write_many(results)
+        lake.close()
+    
+    return len(results)
+
+
 def scrape_cards():
     '''
     Interactive scraping menu with Scrapy (fast but blocked by robots.txt)
@@ -853,50 +1041,25 @@ def scrape_cards():
     print()
     
     try:
-        # Use subprocess to avoid Twisted reactor issues
-        import subprocess
-        
-        cmd = [
-            'scrapy', 'crawl', 'ebay',
-            '-a', f'card_name={card}',
-            '-a', f'max_pages={pages}',
-            '--nolog'  # Suppress verbose Scrapy logging
-        ]
+        # Crawls run in a long-lived worker process that owns the Twisted reactor
+        from mtgscraper.runner import run_crawl
         
+        settings = {'LOG_ENABLED': False}  # Suppress verbose Scrapy logging
         if captcha_key:
-            cmd.extend(['-s', f'CAPTCHA_API_KEY={captcha_key}'])
+            settings['CAPTCHA_API_KEY'] = captcha_key
         
         print_info('Starting Scrapy spider...')
         print()
         
-        # Run with real-time output
-        result = subprocess.run(cmd, capture_output=False, text=True)
+        result = run_crawl(card, pages, settings=settings)
+        items_found = result['items']
         
+        print_crawl_summary(result)
         print()
         
-        # Check how many items were actually scraped
-        db_path = os.path.join(os.getcwd(), 'mtg_cards.db')
-        items_found = 0
-        
-        if os.path.exists(db_path):
-            try:
-                engine = create_engine(f'sqlite:///{db_path}')
-                Session = sessionmaker(bind=engine)
-                session = Session()
-                
-                # Count items from this scrape (recent items)
-                from datetime import datetime, timedelta
-                recent_time = (datetime.now() - timedelta(minutes=5)).isoformat()
-                items_found = session.query(MtgCard).filter(
-                    MtgCard.timestamp >= recent_time
-                ).count()
-                session.close()
-            except:
-                pass
-        
         if items_found > 0:
             print_success(f'Scraping completed! Found {Fore.YELLOW}{items_found}{Fore.GREEN} cards!')
-            print_info(f'Results saved to: {Fore.YELLOW}mtg_cards.db')
+            print_info(f'Results saved to: {Fore.YELLOW}{database_name()}')
             print_info(f'Use {Fore.YELLOW}option 3{Fore.CYAN} to view results')
         else:
             print_error('Scraping completed but found 0 results')
@@ -909,9 +1072,9 @@ def scrape_cards():
             print(Fore.CYAN + '   The API provides legal, reliable data access')
             print(Fore.CYAN + '   Or test with a site that allows scraping')
         
-    except FileNotFoundError:
+    except ImportError:
         print()
-        print_error('Scrapy command not found!')
+        print_error('Scrapy is not installed!')
         print_info('Make sure you\'re in the virtual environment:')
         print(Fore.CYAN + '  source venv/bin/activate')
     except Exception as e:
@@ -1002,123 +1165,206 @@ def configure_settings():
     print()
 
 
-def view_results():
+CARD_COLUMNS = ['id', 'card_name', 'set_name', 'price', 'condition', 'seller', 'shipping', 'buy_it_now', 'url', 'source', 'timestamp']
+
+
+def query_results(engine, limit=20, card_filter=None, before_id=None, after_id=None, day=None):
     '''
-    Interactive results viewing menu
+    Fetch a page of listings, newest first, optionally filtered by card name
+    The filter goes through the full-text index (mtgscraper.search) and matches word prefixes
+    before_id/after_id page from a listing id and day starts at the newest listing
+    scraped on or before that date (see mtgscraper.browse)
+    Returns (rows, total) where rows are dicts keyed by column name
     '''
-    db_path = os.path.join(os.getcwd(), 'mtg_cards.db')
+    from sqlalchemy import func, select
+    from mtgscraper.browse import date_cursor, fetch_page
+    from mtgscraper.pipelines import MtgCard
+    
+    if day is not None:
+        before_id = date_cursor(engine, day)
+        if before_id is None:
+            return [], 0
+    rows = fetch_page(engine, CARD_COLUMNS, limit, card_filter, before_id, after_id)
     
-    if not os.path.exists(db_path):
+    with engine.connect() as connection:
+        total = connection.execute(select(func.count()).select_from(MtgCard)).scalar()
+    
+    return rows, total
+
+
+def get_card_detail(engine, card_id):
+    '''
+    Fetch a single listing by ID as a dict, or None if it does not exist
+    '''
+    from sqlalchemy import select
+    from mtgscraper.pipelines import MtgCard
+    
+    columns = [getattr(MtgCard, name) for name in CARD_COLUMNS]
+    
+    with engine.connect() as connection:
+        row = connection.execute(select(*columns).where(MtgCard.id == card_id)).first()
+    
+    return dict(row._mapping) if row else None
+
+
+def find_card_detail(engine, card):
+    '''
+    Fetch a listing by ID, or the best full-text match when card is not a number
+    '''
+    from mtgscraper.search import search_listings
+    
+    card = str(card).strip()
+    if card.isdigit():
+        return get_card_detail(engine, int(card))
+    
+    matches = search_listings(engine, card, limit=1)
+    return get_card_detail(engine, matches[0]['id']) if matches else None
+
+
+def view_results():
+    '''
+    Interactive results browser: pages through the listings newest first
+    '''
+    if not database_exists():
         print_error('No database found. Run a scrape first!')
         return
     
+    from mtgscraper.browse import ListingPager
+    
     header = gradient_text('━━━ VIEW RESULTS ━━━', (0, 255, 255), (100, 200, 255))
     print(f'\n{header}\n')
     
-    limit = input(Fore.CYAN + 'Number of results to show [20]: ' + Style.RESET_ALL).strip()
-    limit = int(limit) if limit.isdigit() else 20
+    limit = input(Fore.CYAN + 'Results per page [20]: ' + Style.RESET_ALL).strip()
+    limit = int(limit) if limit.isdigit() and int(limit) > 0 else 20
     
     card_filter = input(Fore.CYAN + 'Filter by card name (leave empty for all): ' + Style.RESET_ALL).strip()
     
     try:
-        engine = create_engine(f'sqlite:///{db_path}')
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        query = session.query(MtgCard).order_by(desc(MtgCard.id))
-        
-        if card_filter:
-            query = query.filter(MtgCard.card_name.like(f'%{card_filter}%'))
-        
-        results = query.limit(limit).all()
-        
-        if not results:
-            print_info('No results found')
-            return
-        
-        headers = ['ID', 'Card Name', 'Price', 'Condition', 'Source', 'Shipping']
-        rows = []
-        
-        for result in results:
-            rows.append([
-                result.id,
-                result.card_name[:40] + '...' if len(result.card_name) > 40 else result.card_name,
-                result.price,
-                result.condition[:20] if result.condition else 'N/A',
-                result.source,
-                result.shipping[:20] if result.shipping else 'N/A'
-            ])
-        
-        print()
-        print_info(f'Showing {len(results)} results:\n')
-        print(tabulate(rows, headers=headers, tablefmt='grid'))
-        print()
-        print_info(f'Total records in database: {Fore.YELLOW}{session.query(MtgCard).count()}')
-        
-        session.close()
+        engine = get_engine(create=True)
+        with ListingPager(engine, CARD_COLUMNS, limit, card_filter) as pager:
+            page = pager.first()
+            if not page:
+                print_info('No results found')
+                return
+            
+            from sqlalchemy import func, select
+            from mtgscraper.pipelines import MtgCard
+            with engine.connect() as connection:
+                total = connection.execute(select(func.count()).select_from(MtgCard)).scalar()
+            
+            while True:
+                print()
+                print_results_table(pager.page)
+                print_info(f'Listings {pager.page[0]["id"]} to {pager.page[-1]["id"]} '
+                           f'of {Fore.YELLOW}{total}{Colors.BRIGHT_CYAN} in the database')
+                
+                choice = input(Fore.CYAN + '[n]ext, [p]revious, [d]ate YYYY-MM-DD, [q]uit [n]: ' + Style.RESET_ALL).strip()
+                command, _, argument = choice.partition(' ')
+                command = command.lower() or 'n'
+                
+                if command == 'q':
+                    return
+                if command == 'n':
+                    page = pager.next()
+                    if not page:
+                        print_info('No older listings')
+                elif command == 'p':
+                    page = pager.prev()
+                    if not page:
+                        print_info('No newer listings')
+                elif command == 'd':
+                    try:
+                        page = pager.jump(argument.strip() or input(Fore.CYAN + 'Date (YYYY-MM-DD): ' + Style.RESET_ALL).strip())
+                    except ValueError:
+                        print_error('Dates look like 2024-01-31')
+                        continue
+                    if not page:
+                        print_info('No listings scraped by that date')
+                else:
+                    print_error('Unknown choice')
         
     except Exception as e:
         print_error(f'Failed to read database: {str(e)}')
 
 
+def print_results_table(results):
+    '''
+    Print listing rows as a grid table
+    '''
+    from tabulate import tabulate
+    
+    headers = ['ID', 'Card Name', 'Price', 'Condition', 'Source', 'Shipping']
+    rows = []
+    
+    for result in results:
+        card_name = result['card_name'] or ''
+        rows.append([
+            result['id'],
+            card_name[:40] + '...' if len(card_name) > 40 else card_name,
+            result['price'],
+            result['condition'][:20] if result['condition'] else 'N/A',
+            result['source'],
+            result['shipping'][:20] if result['shipping'] else 'N/A'
+        ])
+    
+    print(tabulate(rows, headers=headers, tablefmt='grid'))
+
+
 def view_detail():
     '''
     View detailed card information
     '''
-    db_path = os.path.join(os.getcwd(), 'mtg_cards.db')
-    
-    if not os.path.exists(db_path):
+    if not database_exists():
         print_error('No database found. Run a scrape first!')
         return
     
     header = gradient_text('━━━ VIEW CARD DETAILS ━━━', (138, 43, 226), (255, 0, 255))
     print(f'\n{header}\n')
     
-    card_id = input(Fore.CYAN + 'Enter card ID: ' + Style.RESET_ALL).strip()
-    if not card_id.isdigit():
+    card_id = input(Fore.CYAN + 'Enter card ID or name: ' + Style.RESET_ALL).strip()
+    if not card_id:
         print_error('Invalid ID!')
         return
     
     try:
-        engine = create_engine(f'sqlite:///{db_path}')
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        
-        card = session.query(MtgCard).filter(MtgCard.id == int(card_id)).first()
+        card = find_card_detail(get_engine(create=True), card_id)
         
         if not card:
-            print_error(f'No card found with ID: {card_id}')
+            print_error(f'No card found for: {card_id}')
             return
         
-        print()
-        print(Fore.CYAN + '─' * 70)
-        print(Fore.GREEN + f'Card Details (ID: {card.id})'.center(70))
-        print(Fore.CYAN + '─' * 70)
-        print()
-        print(f'{Fore.YELLOW}Card Name:{Style.RESET_ALL}  {card.card_name}')
-        print(f'{Fore.YELLOW}Price:{Style.RESET_ALL}      {card.price}')
-        print(f'{Fore.YELLOW}Condition:{Style.RESET_ALL}  {card.condition}')
-        print(f'{Fore.YELLOW}Shipping:{Style.RESET_ALL}   {card.shipping}')
-        print(f'{Fore.YELLOW}Source:{Style.RESET_ALL}     {card.source}')
-        print(f'{Fore.YELLOW}Seller:{Style.RESET_ALL}     {card.seller}')
-        print(f'{Fore.YELLOW}Timestamp:{Style.RESET_ALL}  {card.timestamp}')
-        print(f'{Fore.YELLOW}URL:{Style.RESET_ALL}        {card.url}')
-        print()
-        print(Fore.CYAN + '─' * 70)
-        
-        session.close()
+        print_card_detail(card)
         
     except Exception as e:
         print_error(f'Failed to read database: {str(e)}')
 
 
+def print_card_detail(card):
+    '''
+    Print the detail view for one listing dict
+    '''
+    print()
+    print(Fore.CYAN + '─' * 70)
+    print(Fore.GREEN + f'Card Details (ID: {card["id"]})'.center(70))
+    print(Fore.CYAN + '─' * 70)
+    print()
+    print(f'{Fore.YELLOW}Card Name:{Style.RESET_ALL}  {card["card_name"]}')
+    print(f'{Fore.YELLOW}Price:{Style.RESET_ALL}      {card["price"]}')
+    print(f'{Fore.YELLOW}Condition:{Style.RESET_ALL}  {card["condition"]}')
+    print(f'{Fore.YELLOW}Shipping:{Style.RESET_ALL}   {card["shipping"]}')
+    print(f'{Fore.YELLOW}Source:{Style.RESET_ALL}     {card["source"]}')
+    print(f'{Fore.YELLOW}Seller:{Style.RESET_ALL}     {card["seller"]}')
+    print(f'{Fore.YELLOW}Timestamp:{Style.RESET_ALL}  {card["timestamp"]}')
+    print(f'{Fore.YELLOW}URL:{Style.RESET_ALL}        {card["url"]}')
+    print()
+    print(Fore.CYAN + '─' * 70)
+
+
 def show_stats():
     '''
     Display database statistics
     '''
-    db_path = os.path.join(os.getcwd(), 'mtg_cards.db')
-    
-    if not os.path.exists(db_path):
+    if not database_exists():
         print_error('No database found. Run a scrape first!')
         return
     
@@ -1126,42 +1372,70 @@ def show_stats():
     print(f'\n{header}\n')
     
     try:
-        engine = create_engine(f'sqlite:///{db_path}')
-        Session = sessionmaker(bind=engine)
-        session = Session()
+        from mtgscraper.stats import collect_stats
         
-        total_cards = session.query(MtgCard).count()
+        stats = collect_stats(get_engine())
         
-        if total_cards == 0:
+        if stats['total'] == 0:
             print_info('Database is empty. Run a scrape to collect data!')
-            session.close()
             return
         
-        sources = session.query(MtgCard.source).distinct().all()
-        
-        print(f'{Fore.YELLOW}Total Cards:{Style.RESET_ALL}    {Fore.GREEN}{total_cards}')
-        print(f'{Fore.YELLOW}Sources:{Style.RESET_ALL}        {", ".join([s[0] for s in sources])}')
-        print()
-        
-        print(Fore.CYAN + 'Breakdown by Source:')
-        for source in sources:
-            count = session.query(MtgCard).filter(MtgCard.source == source[0]).count()
-            print(f'  {Fore.GREEN}●{Style.RESET_ALL} {source[0]}: {count} cards')
-        
-        print()
-        session.close()
+        print_stats(stats)
         
     except Exception as e:
         print_error(f'Failed to read database: {str(e)}')
 
 
+def print_stats(stats):
+    '''
+    Print the statistics collected by mtgscraper.stats.collect_stats()
+    '''
+    from tabulate import tabulate
+    
+    def money(value):
+        return '-' if value is None else f'${value:,.2f}'
+    
+    print(f'{Fore.YELLOW}Total Cards:{Style.RESET_ALL}    {Fore.GREEN}{stats["total"]}')
+    print(f'{Fore.YELLOW}Sources:{Style.RESET_ALL}        {", ".join(stats["sources"])}')
+    print(f'{Fore.YELLOW}Newest Listing:{Style.RESET_ALL} {stats["newest"] or "-"}')
+    print()
+    
+    print(Fore.CYAN + 'Breakdown by Source:')
+    for source, count in stats['sources'].items():
+        print(f'  {Fore.GREEN}●{Style.RESET_ALL} {source}: {count} cards')
+    print()
+    
+    if stats['cards']:
+        print(Fore.CYAN + f'Top {len(stats["cards"])} Cards by Listings:')
+        rows = [
+            [
+                card['card_name'][:40],
+                card['listings'],
+                money(card['min_price']),
+                money(card['median_price'] if stats['exact'] else card['avg_price']),
+                money(card['max_price']),
+                (card['newest'] or '-')[:19],
+            ]
+            for card in stats['cards']
+        ]
+        middle = 'Median' if stats['exact'] else 'Avg'
+        print(tabulate(rows, headers=['Card Name', 'Listings', 'Min', middle, 'Max', 'Newest'], tablefmt='grid'))
+        if not stats['exact']:
+            print_info('Averages shown; run "stats --exact" for median prices')
+        print()
+    
+    if stats['per_day']:
+        print(Fore.CYAN + 'Listings per Day:')
+        for day in stats['per_day']:
+            print(f'  {Fore.GREEN}●{Style.RESET_ALL} {day["day"] or "unknown"}: {day["listings"]}')
+        print()
+
+
 def export_to_csv():
     '''
     Export database results to CSV file on desktop
     '''
-    db_path = os.path.join(os.getcwd(), 'mtg_cards.db')
-    
-    if not os.path.exists(db_path):
+    if not database_exists():
         print_error('No database found. Run a scrape first!')
         return
     
@@ -1169,50 +1443,15 @@ def export_to_csv():
     print(f'\n{header}\n')
     
     try:
-        import csv
-        from datetime import datetime
-        
-        engine = create_engine(f'sqlite:///{db_path}')
-        Session = sessionmaker(bind=engine)
-        session = Session()
+        from mtgscraper.export import export_listings
         
-        # Get all results
-        results = session.query(MtgCard).order_by(desc(MtgCard.id)).all()
+        csv_path, count = export_listings(get_engine(), fmt='csv')
         
-        if not results:
+        if not count:
             print_info('No results to export')
-            session.close()
             return
         
-        # Get desktop path
-        desktop_path = os.path.join(os.path.expanduser('~'), 'Desktop')
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        csv_filename = f'mtg_cards_{timestamp}.csv'
-        csv_path = os.path.join(desktop_path, csv_filename)
-        
-        # Write CSV
-        with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['id', 'card_name', 'price', 'condition', 'seller', 'shipping', 'buy_it_now', 'url', 'source', 'timestamp']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
-            for result in results:
-                writer.writerow({
-                    'id': result.id,
-                    'card_name': result.card_name,
-                    'price': result.price,
-                    'condition': result.condition,
-                    'seller': result.seller,
-                    'shipping': result.shipping,
-                    'buy_it_now': result.buy_it_now,
-                    'url': result.url,
-                    'source': result.source,
-                    'timestamp': result.timestamp
-                })
-        
-        session.close()
-        
-        print_success(f'Exported {len(results)} records to CSV')
+        print_success(f'Exported {count} records to CSV')
         print_info(f'File saved: {Fore.YELLOW}{csv_path}')
         print()
         
@@ -1222,7 +1461,7 @@ def export_to_csv():
 
 def upload_to_s3():
     '''
-    Upload CSV export to S3 bucket
+    Stream a database export to an S3 bucket
     '''
     header = gradient_text('━━━ UPLOAD TO S3 ━━━', (255, 215, 0), (255, 140, 0))
     print(f'\n{header}\n')
@@ -1246,55 +1485,26 @@ def upload_to_s3():
         print_error('S3 bucket cannot be empty!')
         return
     
-    # Parse bucket name
-    if s3_bucket.startswith('s3://'):
-        bucket_name = s3_bucket.replace('s3://', '').split('/')[0]
-        prefix = '/'.join(s3_bucket.replace('s3://', '').split('/')[1:])
-    else:
-        bucket_name = s3_bucket.split('/')[0]
-        prefix = '/'.join(s3_bucket.split('/')[1:])
+    if not database_exists():
+        print_error('No database found. Run a scrape first!')
+        return
     
-    # Check for existing CSV or export new one
-    desktop_path = os.path.join(os.path.expanduser('~'), 'Desktop')
-    csv_files = [f for f in os.listdir(desktop_path) if f.startswith('mtg_cards_') and f.endswith('.csv')]
+    fmt = input(Fore.CYAN + 'Format [csv.gz/csv/csv.zst/parquet, default csv.gz]: ' + Style.RESET_ALL).strip() or 'csv.gz'
     
-    if csv_files:
-        csv_files.sort(reverse=True)
-        use_existing = input(Fore.CYAN + f'Use existing CSV ({csv_files[0]})? [yes/no]: ' + Style.RESET_ALL).strip().lower()
-        
-        if use_existing == 'yes':
-            csv_path = os.path.join(desktop_path, csv_files[0])
-        else:
-            print_info('Exporting new CSV...')
-            export_to_csv()
-            csv_files = [f for f in os.listdir(desktop_path) if f.startswith('mtg_cards_') and f.endswith('.csv')]
-            csv_files.sort(reverse=True)
-            csv_path = os.path.join(desktop_path, csv_files[0])
-    else:
-        print_info('No existing CSV found. Exporting...')
-        export_to_csv()
-        csv_files = [f for f in os.listdir(desktop_path) if f.startswith('mtg_cards_') and f.endswith('.csv')]
-        if not csv_files:
-            print_error('Failed to create CSV')
-            return
-        csv_files.sort(reverse=True)
-        csv_path = os.path.join(desktop_path, csv_files[0])
-    
-    # Upload to S3
+    # Stream the export straight into a multipart upload, no local file needed
     try:
-        s3_client = boto3.client('s3')
-        
-        # Construct S3 key
-        filename = os.path.basename(csv_path)
-        s3_key = f'{prefix}/{filename}' if prefix else filename
+        from mtgscraper.s3 import stream_export
         
         print()
-        print_info(f'Uploading to s3://{bucket_name}/{s3_key}...')
+        print_info(f'Streaming export to {s3_bucket}...')
         
-        s3_client.upload_file(csv_path, bucket_name, s3_key)
+        result = stream_export(get_engine(), s3_bucket, fmt=fmt)
         
-        print_success('Upload completed!')
-        print_info(f'S3 URL: {Fore.YELLOW}s3://{bucket_name}/{s3_key}')
+        if result['skipped']:
+            print_success(f'{result["url"]} is already up to date')
+        else:
+            print_success(f'Upload completed! {result["rows"]} records in {result["parts"]} part(s)')
+            print_info(f'S3 URL: {Fore.YELLOW}{result["url"]}')
         print()
         
     except NoCredentialsError:
@@ -1373,25 +1583,32 @@ def schedule_cron():
     python_path = sys.executable
     project_dir = os.getcwd()
     
-    # Build command
-    method_map = {
-        '1': f'cd {project_dir} && {python_path} {script_path} --method playwright --card "{card}"',
-        '2': f'cd {project_dir} && {python_path} {script_path} --method api --card "{card}"',
-        '3': f'cd {project_dir} && {python_path} {script_path} --method scrapy --card "{card}"'
-    }
-    command = method_map.get(method, method_map['1'])
+    # Build command - one process chains scrape, dbt, export and upload
+    method_map = {'1': 'playwright', '2': 'api', '3': 'scrapy'}
+    command = (
+        f'cd {project_dir} && {python_path} {script_path} '
+        f'scrape --method {method_map.get(method, "playwright")} --card "{card}"'
+    )
     
-    # Optional: Export CSV after scraping
-    export_csv = input(Fore.CYAN + '\nExport to CSV after each run? [yes/no]: ' + Style.RESET_ALL).strip().lower()
+    # Optional: Refresh dbt models after scraping
+    run_models = input(Fore.CYAN + '\nRun dbt models after each run? [yes/no]: ' + Style.RESET_ALL).strip().lower()
+    if run_models == 'yes':
+        command += ' dbt-run'
+    
+    # Optional: Export new rows after scraping, so nightly uploads only carry new data
+    export_csv = input(Fore.CYAN + 'Export new listings to CSV after each run? [yes/no]: ' + Style.RESET_ALL).strip().lower()
     if export_csv == 'yes':
-        command += f' && {python_path} {script_path} --export-csv'
+        command += f' export-delta --dir {project_dir}/exports'
+        snapshot_days = input(Fore.CYAN + 'Write a full snapshot every N days [7, 0 = never]: ' + Style.RESET_ALL).strip()
+        snapshot_days = int(snapshot_days) if snapshot_days.isdigit() else 7
+        if snapshot_days:
+            command += f' --snapshot-every {snapshot_days}'
     
     # Optional: Upload to S3
     upload_s3 = input(Fore.CYAN + 'Upload to S3 after each run? [yes/no]: ' + Style.RESET_ALL).strip().lower()
     if upload_s3 == 'yes':
         s3_bucket = input(Fore.CYAN + 'S3 bucket URL: ' + Style.RESET_ALL).strip()
-        os.environ['MTG_S3_BUCKET'] = s3_bucket
-        command += f' && {python_path} {script_path} --upload-s3 {s3_bucket}'
+        command += f' upload-s3 {s3_bucket}'
     
     # Create cron entry
     cron_line = f'{cron_expr} {command} >> {project_dir}/cron.log 2>&1'
@@ -1536,6 +1753,24 @@ def remove_cron():
         print()
 
 
+def run_dbt(args):
+    '''
+    Run a dbt command with the profiles.yml in the project directory
+    Returns the CompletedProcess; raises FileNotFoundError if dbt is missing
+    '''
+    import subprocess
+    
+    env = os.environ.copy()
+    env['DBT_PROFILES_DIR'] = os.getcwd()
+    
+    return subprocess.run(
+        ['dbt'] + list(args) + ['--profiles-dir', '.'],
+        capture_output=True,
+        text=True,
+        env=env
+    )
+
+
 def run_dbt_models():
     '''
     Run dbt models to transform data
@@ -1558,8 +1793,7 @@ def run_dbt_models():
         return
     
     # Check if database exists
-    db_path = os.path.join(os.getcwd(), 'mtg_cards.db')
-    if not os.path.exists(db_path):
+    if not database_exists():
         print_error('No database found. Run a scrape first!')
         return
     
@@ -1567,18 +1801,8 @@ def run_dbt_models():
     print()
     
     try:
-        import subprocess
-        
         # Run dbt with profiles in current directory
-        env = os.environ.copy()
-        env['DBT_PROFILES_DIR'] = os.getcwd()
-        
-        result = subprocess.run(
-            ['dbt', 'run', '--profiles-dir', '.'],
-            capture_output=True,
-            text=True,
-            env=env
-        )
+        result = run_dbt(['run'])
         
         print(result.stdout)
         
@@ -1609,17 +1833,7 @@ def run_dbt_tests():
     print()
     
     try:
-        import subprocess
-        
-        env = os.environ.copy()
-        env['DBT_PROFILES_DIR'] = os.getcwd()
-        
-        result = subprocess.run(
-            ['dbt', 'test', '--profiles-dir', '.'],
-            capture_output=True,
-            text=True,
-            env=env
-        )
+        result = run_dbt(['test'])
         
         print(result.stdout)
         
@@ -1634,13 +1848,119 @@ def run_dbt_tests():
         print_error(f'Failed to run tests: {str(e)}')
 
 
+ANALYTICS_QUERIES = {
+    'stats': 'SELECT * FROM card_price_stats ORDER BY avg_price DESC LIMIT :limit',
+    'trends': 'SELECT * FROM price_trends ORDER BY scraped_date DESC LIMIT :limit',
+    'top': 'SELECT * FROM top_cards ORDER BY hotness_score DESC LIMIT :limit',
+}
+
+
+def query_analytics(engine, view, card_filter=None, limit=20):
+    '''
+    Read one of the dbt analytics tables ('stats', 'trends' or 'top')
+    card_filter keeps the cards whose listings match it in the full-text index
+    Returns a list of row dicts keyed by column name
+    '''
+    from sqlalchemy import text
+    from mtgscraper.search import card_name_condition
+    
+    sql = ANALYTICS_QUERIES[view]
+    params = {'limit': limit}
+    
+    if card_filter:
+        condition, filter_params = card_name_condition(engine, card_filter)
+        sql = sql.replace(' ORDER BY', f' WHERE {condition} ORDER BY')
+        params.update(filter_params)
+    
+    with engine.connect() as connection:
+        return [dict(row._mapping) for row in connection.execute(text(sql), params)]
+
+
+DUCKDB_ANALYTICS_PATH = 'mtg_analytics.duckdb'
+
+
+def query_duckdb_analytics(view, card_filter=None, limit=20, path=DUCKDB_ANALYTICS_PATH):
+    '''
+    Read one of the dbt analytics tables built by the duckdb target
+    Returns a list of row dicts keyed by column name
+    '''
+    try:
+        import duckdb
+    except ImportError:
+        raise ImportError('duckdb is not installed! Install with: pip install dbt-duckdb')
+    
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'{path} not found. Run: dbt-run --target duckdb')
+    
+    sql = ANALYTICS_QUERIES[view].replace(':limit', '$limit')
+    params = {'limit': limit}
+    
+    if card_filter:
+        from mtgscraper.search import LIKE_ESCAPE, like_pattern
+        
+        sql = sql.replace(' ORDER BY', f" WHERE card_name LIKE $card_filter ESCAPE '{LIKE_ESCAPE}' ORDER BY")
+        params['card_filter'] = like_pattern(card_filter)
+    
+    with duckdb.connect(path, read_only=True) as connection:
+        cursor = connection.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def print_analytics(view, rows):
+    '''
+    Print rows returned by query_analytics() as a grid table
+    '''
+    from tabulate import tabulate
+    
+    table_rows = []
+    
+    if view == 'stats':
+        print_info(f'Top {len(rows)} Cards by Average Price:\n')
+        headers = ['Card Name', 'Set', 'Listings', 'Min $', 'Avg $', 'Max $', 'Spread']
+        for row in rows:
+            table_rows.append([
+                row['card_name'][:30],
+                (row['set_name'] or '')[:15],
+                row['listing_count'],
+                f'${row["min_price"]:.2f}',
+                f'${row["avg_price"]:.2f}',
+                f'${row["max_price"]:.2f}',
+                f'${row["price_spread"]:.2f}'
+            ])
+    elif view == 'trends':
+        print_info('Price Trends (Last 30 Days):\n')
+        headers = ['Date', 'Card', 'Avg $', 'Change $', 'Change %']
+        for row in rows:
+            change = row['price_change_from_prev_day']
+            change_pct = row['price_change_pct']
+            table_rows.append([
+                row['scraped_date'],
+                row['card_name'][:30],
+                f'${row["daily_avg_price"]:.2f}',
+                f'${change:.2f}' if change else 'N/A',
+                f'{change_pct:.1f}%' if change_pct else 'N/A'
+            ])
+    else:
+        print_info(f'Top {len(rows)} Hottest Cards (by price × volume):\n')
+        headers = ['Rank', 'Card Name', 'Avg $', 'Listings', 'Hotness']
+        for idx, row in enumerate(rows, 1):
+            table_rows.append([
+                idx,
+                row['card_name'][:35],
+                f'${row["avg_price"]:.2f}',
+                row['listing_count'],
+                f'{row["hotness_score"]:.0f}'
+            ])
+    
+    print(tabulate(table_rows, headers=headers, tablefmt='grid'))
+
+
 def view_dbt_analytics():
     '''
     View dbt analytics results
     '''
-    db_path = os.path.join(os.getcwd(), 'mtg_cards.db')
-    
-    if not os.path.exists(db_path):
+    if not database_exists():
         print_error('No database found. Run a scrape first!')
         return
     
@@ -1660,84 +1980,26 @@ def view_dbt_analytics():
     
     try:
         from sqlalchemy import text
-        engine = create_engine(f'sqlite:///{db_path}')
-        Session = sessionmaker(bind=engine)
-        session = Session()
+        from tabulate import tabulate
         
-        if choice == '1':
-            # Card price statistics
-            result = session.execute(text('SELECT * FROM card_price_stats ORDER BY avg_price DESC LIMIT 20'))
-            rows = result.fetchall()
-            
-            if rows:
-                print()
-                print_info('Top 20 Cards by Average Price:\n')
-                headers = ['Card Name', 'Set', 'Listings', 'Min $', 'Avg $', 'Max $', 'Spread']
-                table_rows = []
-                for row in rows:
-                    table_rows.append([
-                        row[0][:30],  # card_name
-                        row[1][:15],  # set_name
-                        row[2],       # listing_count
-                        f'${row[3]:.2f}',   # min_price
-                        f'${row[5]:.2f}',   # avg_price
-                        f'${row[4]:.2f}',   # max_price
-                        f'${row[12]:.2f}'   # price_spread
-                    ])
-                print(tabulate(table_rows, headers=headers, tablefmt='grid'))
-            else:
-                print_info('No analytics data. Run dbt models first (option 7)!')
-                
-        elif choice == '2':
-            # Price trends
-            card_filter = input(Fore.CYAN + '\nEnter card name (leave empty for all): ' + Style.RESET_ALL).strip()
+        engine = get_engine(create=True)
+        
+        if choice in ('1', '2', '3'):
+            view = {'1': 'stats', '2': 'trends', '3': 'top'}[choice]
+            card_filter = None
+            limit = 20
             
-            if card_filter:
-                result = session.execute(
-                    text(f"SELECT * FROM price_trends WHERE card_name LIKE '%{card_filter}%' ORDER BY scraped_date DESC LIMIT 30")
-                )
-            else:
-                result = session.execute(text('SELECT * FROM price_trends ORDER BY scraped_date DESC LIMIT 30'))
+            if view == 'trends':
+                card_filter = input(Fore.CYAN + '\nEnter card name (leave empty for all): ' + Style.RESET_ALL).strip()
+                limit = 30
             
-            rows = result.fetchall()
+            rows = query_analytics(engine, view, card_filter, limit)
             
             if rows:
                 print()
-                print_info('Price Trends (Last 30 Days):\n')
-                headers = ['Date', 'Card', 'Avg $', 'Change $', 'Change %']
-                table_rows = []
-                for row in rows:
-                    change_pct = f"{row[6]:.1f}%" if row[6] else 'N/A'
-                    table_rows.append([
-                        row[2],       # date
-                        row[0][:30],  # card_name
-                        f'${row[4]:.2f}',   # avg_price
-                        f'${row[5]:.2f}' if row[5] else 'N/A',   # change
-                        change_pct
-                    ])
-                print(tabulate(table_rows, headers=headers, tablefmt='grid'))
-            else:
+                print_analytics(view, rows)
+            elif view == 'trends':
                 print_info('No trend data. Run dbt models first (option 7)!')
-                
-        elif choice == '3':
-            # Top cards
-            result = session.execute(text('SELECT * FROM top_cards ORDER BY hotness_score DESC LIMIT 20'))
-            rows = result.fetchall()
-            
-            if rows:
-                print()
-                print_info('Top 20 Hottest Cards (by price × volume):\n')
-                headers = ['Rank', 'Card Name', 'Avg $', 'Listings', 'Hotness']
-                table_rows = []
-                for idx, row in enumerate(rows, 1):
-                    table_rows.append([
-                        idx,
-                        row[0][:35],  # card_name
-                        f'${row[2]:.2f}',   # avg_price
-                        row[3],       # listing_count
-                        f'{row[11]:.0f}'    # hotness_score
-                    ])
-                print(tabulate(table_rows, headers=headers, tablefmt='grid'))
             else:
                 print_info('No analytics data. Run dbt models first (option 7)!')
                 
@@ -1749,15 +2011,17 @@ def view_dbt_analytics():
             print('  • dim_cards - Card dimension')
             print('  • fct_card_prices - Price facts')
             print('  • card_price_stats - Price statistics')
+            print('  • fct_daily_card_prices - Daily price rollup')
             print('  • price_trends - Trends over time')
+            print('  • price_trends_weekly - Weekly trends')
             print('  • top_cards - Top cards')
             print()
             
             query = input(Fore.GREEN + 'Enter SQL query: ' + Style.RESET_ALL).strip()
             
             if query:
-                result = session.execute(text(query))
-                rows = result.fetchall()
+                with engine.connect() as connection:
+                    rows = connection.execute(text(query)).fetchall()
                 
                 if rows:
                     print()
@@ -1765,8 +2029,6 @@ def view_dbt_analytics():
                 else:
                     print_info('No results')
         
-        session.close()
-        
     except Exception as e:
         print_error(f'Failed to query analytics: {str(e)}')
         print()
@@ -1790,12 +2052,7 @@ def generate_dbt_docs():
         env['DBT_PROFILES_DIR'] = os.getcwd()
         
         # Generate docs
-        result = subprocess.run(
-            ['dbt', 'docs', 'generate', '--profiles-dir', '.'],
-            capture_output=True,
-            text=True,
-            env=env
-        )
+        result = run_dbt(['docs', 'generate'])
         
         if result.returncode == 0:
             print_success('Documentation generated!')
@@ -1829,9 +2086,11 @@ def clear_database():
     '''
     Clear all data from database
     '''
-    db_path = os.path.join(os.getcwd(), 'mtg_cards.db')
+    from mtgscraper import storage
     
-    if not os.path.exists(db_path):
+    db_path = database_path()
+    
+    if not database_exists():
         print_error('No database found.')
         return
     
@@ -1841,7 +2100,14 @@ def clear_database():
     
     if confirm == 'yes':
         try:
-            os.remove(db_path)
+            if db_path:
+                # Close pooled connections before the file goes away
+                storage.dispose()
+                os.remove(db_path)
+            else:
+                from mtgscraper.pipelines import Base
+                Base.metadata.drop_all(get_engine())
+                storage.dispose()
             print_success('Database cleared successfully!')
         except Exception as e:
             print_error(f'Failed to clear database: {str(e)}')
@@ -1904,16 +2170,73 @@ def interactive_menu():
         print('\n' * 2)
 
 
-@click.command()
+class CliContext:
+    '''
+    State shared by chained subcommands in one process
+    Holds a single database engine and the files written by the last export
+    '''
+    
+    def __init__(self, json_output=False):
+        self.json_output = json_output
+        self.last_exports = None
+        self._engine = None
+    
+    def engine(self, create=False):
+        '''
+        Return the shared engine, failing if the database is required but missing
+        '''
+        if self._engine is None:
+            if not create and not database_exists():
+                raise click.ClickException('No database found. Run a scrape first!')
+            self._engine = get_engine(create=True)
+        return self._engine
+    
+    def emit(self, action, render):
+        '''
+        Run a subcommand action and report its result
+        With --json, progress output goes to stderr and the result is printed
+        to stdout as one JSON object per line
+        '''
+        try:
+            if self.json_output:
+                with contextlib.redirect_stdout(sys.stderr):
+                    result = action()
+            else:
+                result = action()
+        except click.ClickException:
+            raise
+        except Exception as e:
+            # Stop the chain with a clean message and a non-zero exit code
+            raise click.ClickException(str(e))
+        
+        if self.json_output:
+            click.echo(json.dumps(result, default=str))
+        else:
+            render(result)
+        return result
+
+
+@click.group(chain=True, invoke_without_command=True)
 @click.option('--menu/--no-menu', default=True, help='Use interactive menu (default)')
 @click.option('--card', '-c', help='Card name to search for (direct mode)')
 @click.option('--pages', '-p', default=3, type=int, help='Number of pages to scrape (direct mode)')
-def main(menu, card, pages):
+@click.option('--json', 'json_output', is_flag=True, help='Print machine-readable JSON lines for subcommands')
+@click.pass_context
+def main(ctx, menu, card, pages, json_output):
     '''
     MTG Scraper - Scrape Magic: The Gathering card prices from various sources
     
     Run without arguments for interactive menu, or use --card for direct scraping.
+    Subcommands can be chained to run a whole pipeline in one process:
+    
+    \b
+        mtgscraper.py scrape -c "Black Lotus" dbt-run export upload-s3 s3://bucket
     '''
+    ctx.obj = CliContext(json_output=json_output)
+    
+    if ctx.invoked_subcommand is not None:
+        return
+    
     if menu and not card:
         # Interactive menu mode
         interactive_menu()
@@ -1925,20 +2248,14 @@ def main(menu, card, pages):
         print()
         
         try:
-            import subprocess
-            
-            cmd = [
-                'scrapy', 'crawl', 'ebay',
-                '-a', f'card_name={card}',
-                '-a', f'max_pages={pages}',
-                '--nolog'
-            ]
+            from mtgscraper.runner import run_crawl
             
-            subprocess.run(cmd, capture_output=False, text=True)
+            result = run_crawl(card, pages, settings={'LOG_ENABLED': False})
             
+            print_crawl_summary(result)
             print()
-            print_success('Scraping completed successfully!')
-            print_info(f'Results saved to: {Fore.YELLOW}mtg_cards.db')
+            print_success(f'Scraping completed! Found {Fore.YELLOW}{result["items"]}{Fore.GREEN} cards!')
+            print_info(f'Results saved to: {Fore.YELLOW}{database_name()}')
             print_info(f'Run without --card flag to view results in interactive menu')
             
         except Exception as e:
@@ -1948,5 +2265,544 @@ def main(menu, card, pages):
         interactive_menu()
 
 
+@main.command('menu')
+def menu_command():
+    '''
+    Open the interactive menu
+    '''
+    interactive_menu()
+
+
+@main.command('scrape')
+@click.option('--card', '-c', required=True, help='Card name or search query')
+@click.option('--method', '-m', default='scrapy', type=click.Choice(['scrapy', 'api', 'playwright']), help='Scraping method')
+@click.option('--pages', '-p', default=3, type=int, help='Number of pages to scrape (scrapy/playwright)')
+@click.option('--limit', '-l', default=20, type=int, help='Maximum results (api) or results per page (playwright)')
+@click.option('--demo', is_flag=True, help='Use simulated results for the API method')
+@click.option('--incremental', is_flag=True, help='Newest listings first, stopping at listings scraped before')
+@click.pass_obj
+def scrape_command(cli, card, method, pages, limit, demo, incremental):
+    '''
+    Scrape listings for a card without prompts
+    '''
+    def action():
+        result = {'command': 'scrape', 'method': method, 'card': card}
+        
+        if method == 'scrapy':
+            from mtgscraper.runner import run_crawl
+            
+            crawl = run_crawl(card, pages, settings={'LOG_ENABLED': False}, incremental=incremental)
+            stats = crawl.pop('stats')
+            result.update(crawl)
+            if incremental:
+                result['known'] = stats.get('incremental/known', 0)
+        elif method == 'api':
+            client_id = os.environ.get('EBAY_CLIENT_ID')
+            client_secret = os.environ.get('EBAY_CLIENT_SECRET')
+            if demo:
+                client_id = client_secret = 'DEMO_MODE'
+            elif not client_id or not client_secret:
+                raise click.ClickException('Set EBAY_CLIENT_ID and EBAY_CLIENT_SECRET, or pass --demo')
+            result['items'] = search_ebay_api(cli.engine(create=True), card, limit, client_id, client_secret, incremental)
+        elif incremental:
+            from mtgscraper.seen import open_seen
+            
+            engine = cli.engine(create=True)
+            seen = open_seen(engine=engine)
+            try:
+                results = run_playwright_scrape(card, sort_param='&_sop=10', limit=limit, max_pages=pages, seen=seen)
+                result['items'] = save_scraped_results(engine, results, seen)
+            finally:
+                if seen is not None:
+                    seen.close()
+        else:
+            results = run_playwright_scrape(card, limit=limit, max_pages=pages)
+            result['items'] = save_scraped_results(cli.engine(create=True), results)
+        
+        return result
+    
+    def render(result):
+        if 'elapsed_seconds' in result:
+            print_crawl_summary(result)
+        if 'known' in result:
+            print_info(f'Skipped {result["known"]} listings already scraped')
+        print_success(f'Scraping completed! Found {Fore.YELLOW}{result["items"]}{Fore.GREEN} cards!')
+    
+    cli.emit(action, render)
+
+
+@main.command('crawl-watchlist')
+@click.argument('watchlist', type=click.Path(exists=True, dir_okay=False))
+@click.option('--workers', '-w', type=click.IntRange(min=1), help='Crawl processes to run at once (default: one per CPU)')
+@click.option('--pages', '-p', default=3, type=int, help='Number of pages to scrape per card')
+@click.option('--proxies', 'proxy_file', type=click.Path(exists=True, dir_okay=False), envvar='PROXY_LIST',
+              help='Proxy list, one per line, split between the workers (default: $PROXY_LIST)')
+@click.option('--ingest', default='shared', type=click.Choice(['shared', 'shards']),
+              help='Write to the database in WAL mode, or to per-worker SQLite shards merged at the end')
+@click.option('--shard-dir', default='shards', type=click.Path(file_okay=False), help='Directory for --ingest shards')
+@click.option('--frontier', 'frontier_url', envvar='MTG_FRONTIER_URL',
+              help='Share one request queue between the workers and other machines: redis://host:6379/0 '
+                   'or sqlite:///frontier.db (default: $MTG_FRONTIER_URL, else a queue per worker)')
+@click.option('--incremental', is_flag=True, help='Newest listings first, stopping at listings scraped before')
+@click.option('--job', 'job_name', help='Run as a resumable job: rerunning the same job skips finished cards '
+                                         'and resumes the others where they stopped (state in jobs/NAME.db)')
+@click.pass_obj
+def crawl_watchlist_command(cli, watchlist, workers, pages, proxy_file, ingest, shard_dir, frontier_url, job_name,
+                            incremental):
+    '''
+    Crawl every card in a watchlist file with several Scrapy processes at once
+    '''
+    def action():
+        from mtgscraper.runner import load_watchlist, run_fanout
+        
+        cards = load_watchlist(watchlist)
+        if not cards:
+            raise click.ClickException(f'No cards in {watchlist}')
+        proxies = None
+        if proxy_file:
+            with open(proxy_file) as f:
+                proxies = [line.strip() for line in f if line.strip()]
+        
+        settings = {'LOG_ENABLED': False}
+        job = None
+        if job_name:
+            from mtgscraper.jobs import job_path
+            
+            if frontier_url:
+                raise click.UsageError('--job keeps its own frontier and cannot be combined with --frontier')
+            job = job_path(job_name)
+        elif frontier_url:
+            from mtgscraper.frontier import connect
+            
+            # Fail here on a bad URL or missing redis package, not in every worker
+            connect(frontier_url).close()
+            settings.update(
+                SCHEDULER='mtgscraper.frontier.FrontierScheduler',
+                DUPEFILTER_CLASS='mtgscraper.frontier.FrontierDupeFilter',
+                FRONTIER_URL=frontier_url,
+            )
+        
+        result = run_fanout(
+            cards, workers=workers, max_pages=pages, settings=settings,
+            proxies=proxies, ingest=ingest, shard_dir=shard_dir, job=job, incremental=incremental
+        )
+        result.pop('stats')
+        return dict(result, command='crawl-watchlist', ingest=ingest, frontier=frontier_url, job=job_name)
+    
+    def render(result):
+        print_crawl_summary(result)
+        for worker in result['workers']:
+            print_info(
+                f'Worker {worker["worker"]}: {worker["cards"]} cards, {worker["items"]} items, '
+                f'{worker["pages"]} pages, {worker["errors"] + worker["failed"]} errors'
+            )
+        for failure in result['failed']:
+            print_error(f'{failure["card"]}: {failure["error"]}')
+        if result['job']:
+            progress = result['job_progress']
+            print_info(
+                f'Job {result["job"]}: {progress["finished_cards"]} of {progress["cards"]} cards finished, '
+                f'{result["skipped"]} skipped as already finished'
+            )
+        print_success(
+            f'Crawled {Fore.YELLOW}{result["cards"]}{Fore.GREEN} cards with {len(result["workers"])} workers, '
+            f'found {Fore.YELLOW}{result["items"]}{Fore.GREEN} listings!'
+        )
+    
+    cli.emit(action, render)
+
+
+@main.command('view')
+@click.option('--limit', '-l', default=20, type=int, help='Number of results to show')
+@click.option('--card', '-c', 'card_filter', help='Filter by card name')
+@click.option('--before', 'before_id', type=int, help='Show the listings older than this listing ID (next page)')
+@click.option('--after', 'after_id', type=int, help='Show the listings newer than this listing ID (previous page)')
+@click.option('--date', 'day', type=click.DateTime(formats=['%Y-%m-%d']), help='Start at the newest listing scraped on or before this date')
+@click.pass_obj
+def view_command(cli, limit, card_filter, before_id, after_id, day):
+    '''
+    Show the newest listings, a page at a time
+    '''
+    def action():
+        rows, total = query_results(cli.engine(), limit, card_filter, before_id, after_id, day and day.date())
+        return {
+            'command': 'view',
+            'total': total,
+            'rows': rows,
+            'before': rows[-1]['id'] if rows else None,
+            'after': rows[0]['id'] if rows else None,
+        }
+    
+    def render(result):
+        if not result['rows']:
+            print_info('No results found')
+            return
+        print_results_table(result['rows'])
+        print_info(f'Total records in database: {Fore.YELLOW}{result["total"]}')
+        print_info(f'Older: --before {result["before"]}  Newer: --after {result["after"]}')
+    
+    cli.emit(action, render)
+
+
+@main.command('detail')
+@click.argument('card')
+@click.pass_obj
+def detail_command(cli, card):
+    '''
+    Show every field of one listing, by ID or the best match for a card name
+    '''
+    def action():
+        found = find_card_detail(cli.engine(), card)
+        if not found:
+            raise click.ClickException(f'No card found for: {card}')
+        return dict(found, command='detail')
+    
+    cli.emit(action, print_card_detail)
+
+
+@main.command('search')
+@click.argument('query')
+@click.option('--limit', '-l', default=20, type=int, help='Number of results to show')
+@click.option('--offset', default=0, type=int, help='Skip this many results')
+@click.pass_obj
+def search_command(cli, query, limit, offset):
+    '''
+    Full-text search of listings by card name, set and title, best match first
+    '''
+    def action():
+        from mtgscraper.search import search_listings
+        
+        engine = cli.engine()
+        matches = search_listings(engine, query, limit=limit, offset=offset)
+        rows = [dict(get_card_detail(engine, match['id']), rank=match['rank']) for match in matches]
+        return {'command': 'search', 'query': query, 'rows': rows}
+    
+    def render(result):
+        if not result['rows']:
+            print_info('No results found')
+            return
+        print_results_table(result['rows'])
+    
+    cli.emit(action, render)
+
+
+@main.command('stats')
+@click.option('--top', default=10, show_default=True, help='Number of cards in the per-card breakdown')
+@click.option('--days', default=14, show_default=True, help='Number of days in the rows-per-day breakdown')
+@click.option('--exact', is_flag=True, help='Group every listing instead of reading the summary tables')
+@click.option('--refresh-summary', is_flag=True, help='Fold listings written since the last refresh into the summary tables first')
+@click.option('--rebuild-summary', is_flag=True, help='Rebuild the summary tables before reading them')
+@click.pass_obj
+def stats_command(cli, top, days, exact, refresh_summary, rebuild_summary):
+    '''
+    Show database statistics
+    '''
+    def action():
+        from mtgscraper.stats import collect_stats, rebuild_summary as rebuild
+        
+        engine = cli.engine()
+        if rebuild_summary:
+            rebuild(engine)
+        return dict(collect_stats(engine, top=top, days=days, exact=exact, refresh=refresh_summary), command='stats')
+    
+    cli.emit(action, print_stats)
+
+
+@main.command('export')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='File to write (default: timestamped file on the Desktop)')
+@click.option('--format', '-f', 'fmt', type=click.Choice(['csv', 'csv.gz', 'csv.zst', 'parquet']), help='Output format (default: from the file extension, else csv)')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S']), help='Only listings scraped at or after this date')
+@click.option('--card', help='Only listings whose card name contains this text')
+@click.option('--batch-size', default=10000, show_default=True, help='Rows read and written per batch')
+@click.pass_obj
+def export_command(cli, output, fmt, since, card, batch_size):
+    '''
+    Export listings to CSV, gzip CSV or Parquet
+    '''
+    def action():
+        from mtgscraper.export import export_listings
+        
+        path, count = export_listings(cli.engine(), output, fmt=fmt, since=since, card=card, batch_size=batch_size)
+        cli.last_exports = [path] if path else []
+        return {'command': 'export', 'path': path, 'rows': count}
+    
+    def render(result):
+        if not result['rows']:
+            print_info('No results to export')
+            return
+        print_success(f'Exported {result["rows"]} records')
+        print_info(f'File saved: {Fore.YELLOW}{result["path"]}')
+    
+    cli.emit(action, render)
+
+
+@main.command('export-delta')
+@click.option('--dir', '-d', 'directory', type=click.Path(file_okay=False), help='Directory for delta files (default: mtg_cards_exports on the Desktop)')
+@click.option('--format', '-f', 'fmt', type=click.Choice(['csv', 'csv.gz', 'csv.zst', 'parquet']), default='csv', show_default=True, help='Output format')
+@click.option('--name', default='default', show_default=True, help='Export feed name; each feed keeps its own high-water mark')
+@click.option('--snapshot-every', type=int, metavar='DAYS', help='Also write a full snapshot when the last one is older than DAYS')
+@click.option('--prune', is_flag=True, help='Remove delta files covered by a new snapshot')
+@click.option('--reset', is_flag=True, help='Forget the high-water mark and export from the first row')
+@click.option('--batch-size', default=10000, show_default=True, help='Rows read and written per batch')
+@click.pass_obj
+def export_delta_command(cli, directory, fmt, name, snapshot_every, prune, reset, batch_size):
+    '''
+    Export only the listings added since the last export-delta run
+    '''
+    def action():
+        from mtgscraper.export import default_delta_directory, export_incremental, reset_export_state
+        
+        engine = cli.engine()
+        if reset:
+            reset_export_state(engine, name)
+        
+        result = export_incremental(
+            engine,
+            directory or default_delta_directory(),
+            name=name,
+            fmt=fmt,
+            snapshot_every=snapshot_every,
+            prune=prune,
+            batch_size=batch_size
+        )
+        cli.last_exports = [path for path in (result['delta'], result['snapshot']) if path]
+        return dict(result, command='export-delta')
+    
+    def render(result):
+        if result['rows']:
+            print_success(f'Exported {result["rows"]} new records (up to ID {result["last_id"]})')
+            if result['delta']:
+                print_info(f'Delta file: {Fore.YELLOW}{result["delta"]}')
+        else:
+            print_info(f'No new records since ID {result["last_id"]}')
+        if result['snapshot']:
+            print_success(f'Snapshot written: {Fore.YELLOW}{result["snapshot"]}')
+        if result['pruned']:
+            print_info(f'Removed {len(result["pruned"])} delta files covered by the snapshot')
+    
+    cli.emit(action, render)
+
+
+@main.command('upload-s3')
+@click.argument('s3_url')
+@click.option('--file', '-f', 'file_path', type=click.Path(exists=True, dir_okay=False), help='File to upload (default: the files exported earlier in this run)')
+@click.option('--stream', is_flag=True, help='Export listings straight to S3 without writing a local file')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'csv.gz', 'csv.zst', 'parquet']), default='csv.gz', show_default=True, help='Format for --stream')
+@click.option('--name', help='Object name for --stream (default: named after the exported id range)')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S']), help='With --stream, only listings scraped at or after this date')
+@click.option('--card', help='With --stream, only listings whose card name contains this text')
+@click.option('--compression', type=click.Choice(['gzip', 'zstd']), help='Compress uploaded files on the fly')
+@click.option('--part-size', default=16, show_default=True, help='Multipart part size in MB (minimum 5)')
+@click.option('--workers', default=4, show_default=True, help='Parts uploaded in parallel')
+@click.option('--force', is_flag=True, help='Upload even when the object content is unchanged')
+@click.option('--endpoint-url', envvar='AWS_ENDPOINT_URL', help='S3-compatible endpoint, e.g. a local MinIO')
+@click.pass_obj
+def upload_s3_command(cli, s3_url, file_path, stream, fmt, name, since, card, compression, part_size, workers, force, endpoint_url):
+    '''
+    Upload exports to S3 (s3://bucket/prefix)
+    '''
+    def action():
+        from mtgscraper import s3
+        
+        client = s3.create_client(endpoint_url)
+        options = {'part_size': part_size * 1024 * 1024, 'workers': workers, 'skip_unchanged': not force, 'client': client}
+        
+        if stream:
+            result = s3.stream_export(cli.engine(), s3_url, name=name, fmt=fmt, since=since, card=card, **options)
+            return {'command': 'upload-s3', 'uploads': [dict(result, path=None)]}
+        
+        paths = [file_path] if file_path else cli.last_exports
+        if paths is None:
+            # No export earlier in the chain: export everything first
+            from mtgscraper.export import export_listings
+            
+            path, _ = export_listings(cli.engine())
+            if not path:
+                raise click.ClickException('Nothing to upload - the database is empty')
+            paths = cli.last_exports = [path]
+        uploads = [
+            dict(s3.upload_file(path, s3_url, compression=compression, **options), path=path)
+            for path in paths
+        ]
+        return {'command': 'upload-s3', 'uploads': uploads}
+    
+    def render(result):
+        if not result['uploads']:
+            print_info('No new export files to upload')
+            return
+        for upload in result['uploads']:
+            if upload['skipped']:
+                print_info(f'Unchanged, skipped: {Fore.YELLOW}{upload["url"]}')
+            else:
+                print_success(f'Uploaded {upload["bytes"]:,} bytes in {upload["parts"]} part(s)')
+                print_info(f'S3 URL: {Fore.YELLOW}{upload["url"]}')
+    
+    cli.emit(action, render)
+
+
+@main.command('lake-compact')
+@click.option('--dir', '-d', 'directory', help='Lake root directory (default: PARQUET_LAKE_DIR from settings.py)')
+@click.option('--target-mb', default=128, show_default=True, help='Merge files smaller than this into files of about this size')
+@click.option('--row-group-size', default=10000, show_default=True, help='Rows per row group in merged files')
+@click.pass_obj
+def lake_compact_command(cli, directory, target_mb, row_group_size):
+    '''
+    Merge small Parquet files in each lake partition
+    '''
+    def action():
+        from mtgscraper.lake import compact_lake, lake_options
+        
+        root = directory or lake_options()['root']
+        if not os.path.isdir(root):
+            raise click.ClickException(f'No Parquet lake found at {root}')
+        return {'command': 'lake-compact', 'root': root, 'partitions': compact_lake(root, target_mb, row_group_size)}
+    
+    def render(result):
+        if not result['partitions']:
+            print_info('Nothing to compact')
+            return
+        for partition in result['partitions']:
+            print_info(f'{partition["partition"]}: {partition["files_before"]} files -> {partition["files_after"]}')
+        print_success(f'Compacted {len(result["partitions"])} partitions in {result["root"]}')
+    
+    cli.emit(action, render)
+
+
+@main.command('resolve-cards')
+@click.option('--index', 'index_path', type=click.Path(exists=True, dir_okay=False), help='Card list or Scryfall bulk data file (default: CARD_INDEX_PATH from settings.py, else the bundled list)')
+@click.option('--all', 'refresh', is_flag=True, help='Also resolve listings resolved before, from their raw titles')
+@click.option('--no-dbt', 'skip_dbt', is_flag=True, help='Do not rebuild the dbt models built before')
+@click.pass_obj
+def resolve_cards_command(cli, index_path, refresh, skip_dbt):
+    '''
+    Resolve stored listing titles to canonical card and set names
+    The incremental dbt models only load new listings, so the targets built
+    before are rebuilt with --full-refresh when listings changed
+    '''
+    def action():
+        from mtgscraper.cards import backfill_card_identity, card_index, load_card_index, use_card_index
+        from mtgscraper.stats import rebuild_summary
+        
+        if index_path:
+            use_card_index(load_card_index(index_path))
+        engine = cli.engine()
+        listings = backfill_card_identity(engine, refresh=refresh)
+        result = {'command': 'resolve-cards', 'listings': listings, 'known_cards': len(card_index()), 'dbt': []}
+        if listings:
+            rebuild_summary(engine)
+            if not skip_dbt:
+                result['dbt'] = _full_refresh_dbt(engine)
+        return result
+    
+    def render(result):
+        if not result['listings']:
+            print_info('No listings to resolve')
+            return
+        print_success(f'Resolved {result["listings"]:,} listings against {result["known_cards"]:,} known cards')
+        for refresh_result in result['dbt']:
+            if refresh_result['returncode'] == 0:
+                print_success(f'Rebuilt the dbt models of target {refresh_result["target"]}')
+            else:
+                print_error(
+                    f'Could not rebuild the dbt models of target {refresh_result["target"]}: {refresh_result["error"]}\n'
+                    f'  Run: python mtgscraper.py dbt-run --target {refresh_result["target"]} --full-refresh'
+                )
+    
+    cli.emit(action, render)
+
+
+def _full_refresh_dbt(engine):
+    '''
+    Rebuild the dbt targets that have been built (dev in the scraper's SQLite
+    database, duckdb in mtg_analytics.duckdb) with --full-refresh
+    Returns a result dict per target
+    '''
+    from sqlalchemy import inspect
+    
+    targets = []
+    if engine.dialect.name == 'sqlite' and inspect(engine).has_table('fct_card_prices'):
+        targets.append('dev')
+    if os.path.exists('mtg_analytics.duckdb'):
+        targets.append('duckdb')
+    
+    results = []
+    for target in targets:
+        try:
+            completed = run_dbt(['run', '--full-refresh', '--target', target])
+        except FileNotFoundError:
+            results.append({'target': target, 'returncode': None, 'error': 'dbt is not installed'})
+            continue
+        output = (completed.stdout + completed.stderr).strip().splitlines()
+        error = (output[-1] if output else 'dbt failed') if completed.returncode else None
+        results.append({'target': target, 'returncode': completed.returncode, 'error': error})
+    return results
+
+
+def _dbt_command(name, args, success_message, full_refresh=False):
+    '''
+    Build a chainable subcommand that runs one dbt command
+    full_refresh adds a --full-refresh flag that rebuilds incremental models
+    '''
+    @click.option('--target', '-t', envvar='DBT_TARGET', help='dbt target from profiles.yml (dev = SQLite, duckdb = DuckDB)')
+    @click.pass_obj
+    def command(cli, target, full_refresh=False):
+        def action():
+            dbt_args = list(args) + (['--target', target] if target else [])
+            if full_refresh:
+                dbt_args.append('--full-refresh')
+            try:
+                result = run_dbt(dbt_args)
+            except FileNotFoundError:
+                raise click.ClickException('dbt is not installed! Install with: pip install dbt-core dbt-sqlite')
+            if result.returncode != 0:
+                raise click.ClickException(f'dbt {" ".join(dbt_args)} failed:\n{result.stdout}{result.stderr}')
+            return {'command': name, 'target': target, 'returncode': result.returncode, 'output': result.stdout}
+        
+        def render(result):
+            print(result['output'])
+            print_success(success_message)
+        
+        cli.emit(action, render)
+    
+    command.__doc__ = f'Run dbt {" ".join(args)}'
+    if full_refresh:
+        command = click.option(
+            '--full-refresh', is_flag=True,
+            help='Rebuild incremental models from all history instead of only new listings'
+        )(command)
+    return main.command(name)(command)
+
+
+_dbt_command('dbt-run', ['run'], 'dbt models completed successfully!', full_refresh=True)
+_dbt_command('dbt-test', ['test'], 'All tests passed! ✓')
+_dbt_command('dbt-docs', ['docs', 'generate'], 'Documentation generated!')
+
+
+@main.command('analytics')
+@click.argument('view', type=click.Choice(['stats', 'trends', 'top']))
+@click.option('--card', '-c', 'card_filter', help='Filter by card name')
+@click.option('--limit', '-l', default=20, type=int, help='Number of rows to show')
+@click.option('--target', '-t', envvar='DBT_TARGET', help='dbt target the tables were built with (duckdb reads mtg_analytics.duckdb)')
+@click.pass_obj
+def analytics_command(cli, view, card_filter, limit, target):
+    '''
+    Show dbt analytics tables (run dbt-run first)
+    '''
+    def action():
+        if target == 'duckdb':
+            rows = query_duckdb_analytics(view, card_filter, limit)
+        else:
+            rows = query_analytics(cli.engine(), view, card_filter, limit)
+        return {'command': 'analytics', 'view': view, 'rows': rows}
+    
+    def render(result):
+        if not result['rows']:
+            print_info('No analytics data. Run dbt models first (dbt-run)!')
+            return
+        print_analytics(view, result['rows'])
+    
+    cli.emit(action, render)
+
+
 if __name__ == '__main__':
     main()
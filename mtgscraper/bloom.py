@@ -0,0 +1,243 @@
+'''
+Memory-mapped Bloom filter
+A fixed-size bit array in a file, mapped into memory, that answers "have I
+seen this key?" in constant time with no false negatives and a chosen rate of
+false positives. Sized for capacity keys at error_rate, it takes
+-ln(error_rate) / ln(2)^2 bits a key: 1.2 bytes at 1%, 2.4 bytes at 0.01%,
+where a Python set of ints costs upwards of 60 bytes an entry. Pages of the
+file are only read in as they are touched, and the file is sparse until the
+bits are set, so a filter sized for tens of millions of keys opens instantly.
+
+Several processes can share one file: the mapping is shared, and additions
+take an exclusive lock on the file so no two processes overwrite each other's
+bits. Keys are ints, strings or bytes, hashed with BLAKE2b so every process
+and Python run agrees on where a key lives.
+'''
+
+import math
+import mmap
+import os
+import struct
+from hashlib import blake2b
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: additions from several processes at once may lose bits
+    fcntl = None
+
+DEFAULT_CAPACITY = 10_000_000
+DEFAULT_ERROR_RATE = 0.0001
+
+MAGIC = b'MTGBLOOM'
+VERSION = 1
+
+# magic, version, hashes, bits, capacity, error_rate, count, watermark; padded to HEADER_SIZE
+_HEADER = struct.Struct('<8sIIQQdQQ')
+HEADER_SIZE = 64
+
+_MASK = (1 << 64) - 1
+
+
+def optimal_size(capacity, error_rate):
+    '''
+    (bits, hashes) of a filter holding capacity keys at error_rate
+    '''
+    if capacity < 1 or not 0 < error_rate < 1:
+        raise ValueError('capacity must be positive and error_rate between 0 and 1')
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+def _digest(key):
+    if isinstance(key, int):
+        data = key.to_bytes(16, 'little', signed=True)
+    elif isinstance(key, str):
+        data = key.encode('utf-8')
+    else:
+        data = bytes(key)
+    return int.from_bytes(blake2b(data, digest_size=16).digest(), 'little')
+
+
+class BloomFilter:
+    '''
+    Bloom filter stored in the file at path, created with room for capacity
+    keys at error_rate if it does not exist; an existing file keeps the size
+    it was created with
+    '''
+    
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self._create(path, capacity, error_rate)
+        
+        self._file = open(path, 'r+b')
+        try:
+            header = _HEADER.unpack(self._file.read(_HEADER.size))
+            magic, version, self.hashes, self.bits, self.capacity, self.error_rate, _, _ = header
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f'{path} is not a Bloom filter file')
+            if os.path.getsize(path) < HEADER_SIZE + (self.bits + 7) // 8:
+                raise ValueError(f'{path} is truncated')
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        except BaseException:
+            self._file.close()
+            raise
+    
+    @staticmethod
+    def _create(path, capacity, error_rate):
+        bits, hashes = optimal_size(capacity, error_rate)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, hashes, bits, capacity, error_rate, 0, 0).ljust(HEADER_SIZE, b'\0'))
+            # Zero bits without writing them: the file stays sparse
+            f.truncate(HEADER_SIZE + (bits + 7) // 8)
+        # Another process may have created it meanwhile; the first one wins
+        try:
+            os.link(temporary, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temporary)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def __len__(self):
+        '''
+        Keys added, by every process sharing the file
+        '''
+        return _HEADER.unpack_from(self._map)[6]
+    
+    @property
+    def watermark(self):
+        '''
+        An int kept in the header for the filter's owner, e.g. the last row of
+        a table it has been filled from; 0 until it is advanced
+        '''
+        return _HEADER.unpack_from(self._map)[7]
+    
+    def __contains__(self, key):
+        return bool(self.contains_many((key,)))
+    
+    def _start(self, key):
+        '''
+        First bit position of key and the step to its next ones
+        Double hashing: position i is (first + i * step) % bits for the two
+        halves of one digest; callers add step instead of multiplying
+        '''
+        digest = _digest(key)
+        bits = self.bits
+        return (digest & _MASK) % bits, ((digest >> 64) | 1) % bits
+    
+    def contains_many(self, keys):
+        '''
+        The keys of keys that are (probably) in the filter
+        A key is dropped at its first clear bit, so most absent keys cost one or two probes
+        '''
+        bitmap = self._map
+        bits = self.bits
+        hashes = self.hashes
+        found = set()
+        for key in keys:
+            position, step = self._start(key)
+            for _ in range(hashes):
+                if not bitmap[HEADER_SIZE + (position >> 3)] >> (position & 7) & 1:
+                    break
+                position += step
+                if position >= bits:
+                    position -= bits
+            else:
+                found.add(key)
+        return found
+    
+    def add(self, key):
+        '''
+        Add key; returns False if it was (probably) there already
+        '''
+        return self.add_many([key]) == 1
+    
+    def add_many(self, keys):
+        '''
+        Add keys under one file lock; returns how many were not there before
+        '''
+        # Hashed before taking the lock
+        starts = [self._start(key) for key in keys]
+        if not starts:
+            return 0
+        bitmap = self._map
+        bits = self.bits
+        hashes = self.hashes
+        added = 0
+        self._lock()
+        try:
+            for position, step in starts:
+                new = False
+                for _ in range(hashes):
+                    offset = HEADER_SIZE + (position >> 3)
+                    mask = 1 << (position & 7)
+                    byte = bitmap[offset]
+                    if not byte & mask:
+                        bitmap[offset] = byte | mask
+                        new = True
+                    position += step
+                    if position >= bits:
+                        position -= bits
+                added += new
+            if added:
+                # In the header right away, so other processes see it
+                *_, count, watermark = _HEADER.unpack_from(bitmap)
+                self._write_header(count + added, watermark)
+        finally:
+            self._unlock()
+        return added
+    
+    def advance_watermark(self, value):
+        '''
+        Raise the watermark to value; a lower value leaves it as it is
+        '''
+        self._lock()
+        try:
+            *_, count, watermark = _HEADER.unpack_from(self._map)
+            if value > watermark:
+                self._write_header(count, value)
+        finally:
+            self._unlock()
+    
+    def estimated_error_rate(self):
+        '''
+        False positive rate at the current number of keys
+        '''
+        return (1 - math.exp(-self.hashes * len(self) / self.bits)) ** self.hashes
+    
+    def flush(self):
+        '''
+        Write the header and the bits to disk
+        '''
+        self._map.flush()
+    
+    def close(self):
+        if self._map.closed:
+            return
+        self.flush()
+        self._map.close()
+        self._file.close()
+    
+    def _write_header(self, count, watermark):
+        _HEADER.pack_into(
+            self._map, 0, MAGIC, VERSION, self.hashes, self.bits, self.capacity, self.error_rate, count, watermark
+        )
+    
+    def _lock(self):
+        if fcntl:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+    
+    def _unlock(self):
+        if fcntl:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
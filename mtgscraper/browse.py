@@ -0,0 +1,134 @@
+'''
+Keyset pagination over listings for the view command
+Pages run newest first and are addressed by listing id, which follows scrape
+order: the next page is the listings below the last id shown and the previous
+page those above the first, so every page reads page_size rows off the primary
+key however deep it is, where OFFSET would read and skip every row before it.
+A card filter pushes the same bounds into the full-text index. Jumping to a
+date finds the newest listing scraped by then on the timestamp index and pages
+down from there. Rows are fetched as plain column tuples, never ORM objects,
+and ListingPager fetches the next page in the background while one is shown.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+PAGE_SIZE = 20
+
+
+def fetch_page(engine, columns, page_size=PAGE_SIZE, card_filter=None, before_id=None, after_id=None):
+    '''
+    One page of listings as dicts keyed by column name, newest first
+    before_id pages down to older listings, after_id up to newer ones; both are
+    exclusive. With neither, the newest listings
+    '''
+    from sqlalchemy import select
+    from mtgscraper.pipelines import MtgCard
+    from mtgscraper.search import listing_condition
+    
+    query = select(*[getattr(MtgCard, name) for name in columns])
+    if before_id is not None:
+        query = query.where(MtgCard.id < before_id)
+    if after_id is not None:
+        query = query.where(MtgCard.id > after_id)
+    if card_filter:
+        query = query.where(listing_condition(engine, card_filter, page_size, before_id, after_id))
+    
+    ascending = after_id is not None
+    query = query.order_by(MtgCard.id.asc() if ascending else MtgCard.id.desc()).limit(page_size)
+    
+    with engine.connect() as connection:
+        rows = connection.execute(query).all()
+    if ascending:
+        rows.reverse()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def date_cursor(engine, day):
+    '''
+    before_id for the page starting at the newest listing scraped on or before
+    day (a date or 'YYYY-MM-DD'), or None when nothing was scraped by then
+    '''
+    from sqlalchemy import select
+    from mtgscraper.pipelines import MtgCard
+    
+    if not isinstance(day, date):
+        day = date.fromisoformat(day)
+    end = (day + timedelta(days=1)).isoformat()
+    query = (
+        select(MtgCard.id)
+        .where(MtgCard.timestamp < end)
+        .order_by(MtgCard.timestamp.desc(), MtgCard.id.desc())
+        .limit(1)
+    )
+    
+    with engine.connect() as connection:
+        newest = connection.execute(query).scalar()
+    return None if newest is None else newest + 1
+
+
+class ListingPager:
+    '''
+    Newest-first pages of listings for an interactive browser
+    first(), next(), prev() and jump(day) return the new current page, or an
+    empty list past either end, leaving the current page as it was
+    '''
+    
+    def __init__(self, engine, columns, page_size=PAGE_SIZE, card_filter=None):
+        if 'id' not in columns:
+            raise ValueError('columns must include id, the page cursor')
+        self.engine = engine
+        self.columns = list(columns)
+        self.page_size = page_size
+        self.card_filter = card_filter
+        self.page = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='listing-page')
+        self._prefetched = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _fetch(self, before_id=None, after_id=None):
+        return fetch_page(self.engine, self.columns, self.page_size, self.card_filter, before_id, after_id)
+    
+    def _show(self, page):
+        if page:
+            self.page = page
+            # Fetch the page after this one while this one is being read
+            before_id = page[-1]['id']
+            self._prefetched = (before_id, self._executor.submit(self._fetch, before_id))
+        return page
+    
+    def first(self):
+        return self._show(self._fetch())
+    
+    def next(self):
+        if not self.page:
+            return []
+        before_id = self.page[-1]['id']
+        if self._prefetched and self._prefetched[0] == before_id:
+            page = self._prefetched[1].result()
+        else:
+            page = self._fetch(before_id)
+        return self._show(page)
+    
+    def prev(self):
+        if not self.page:
+            return []
+        page = self._fetch(after_id=self.page[0]['id'])
+        if page and len(page) < self.page_size:
+            # Fewer newer listings than a page: show the full newest page instead
+            page = self._fetch()
+        return self._show(page)
+    
+    def jump(self, day):
+        before_id = date_cursor(self.engine, day)
+        if before_id is None:
+            return []
+        return self._show(self._fetch(before_id))
@@ -0,0 +1,250 @@
+'''
+Card identity resolution for listing titles
+eBay titles carry the card name among set names, grades and sales words
+("MTG Black Lotus Alpha LEA PSA 8 Vintage"). resolve_title() finds the card with a
+longest-match walk over a token trie of known card names, then the set among that
+card's printings and the foil flag, so every listing of a card shares one
+card_name and set_name. Lookups are memoized because titles repeat across crawls.
+
+The card list is bundled in data/cards.json; set CARD_INDEX_PATH to use a larger
+one, such as a Scryfall bulk data file (https://scryfall.com/docs/api/bulk-data).
+'''
+
+import json
+import os
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+CACHE_SIZE = 65536
+
+BUNDLED_CARDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cards.json')
+
+IDENTITY_COLUMNS = ['title', 'card_name', 'set_name', 'foil']
+
+# set_name the scrapers give every listing
+UNKNOWN_SET = 'Unknown'
+
+# remainder is the title without the card name, for the condition parser
+CardMatch = namedtuple('CardMatch', ['card_name', 'set_name', 'set_code', 'foil', 'remainder'])
+
+# Scryfall objects that are not cards anyone lists on their own
+SKIPPED_LAYOUTS = {'token', 'double_faced_token', 'emblem', 'art_series', 'vanguard', 'scheme', 'planar'}
+
+FOIL_WORDS = {'foil', 'foils', 'foiled', 'etched'}
+NEGATIONS = {'non', 'no', 'not'}
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+_TERMINAL = None
+
+
+def tokenize(text):
+    '''
+    Lowercase ASCII word tokens: "Jace, the Mind Sculptor" -> ('jace', 'the', 'mind', 'sculptor')
+    Accents are stripped and apostrophes dropped, so "Urza's" and "Urzas" match
+    '''
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return tuple(_TOKEN.findall(text.lower().replace("'", '')))
+
+
+def _insert(trie, tokens, value):
+    node = trie
+    for token in tokens:
+        node = node.setdefault(token, {})
+    node.setdefault(_TERMINAL, []).append(value)
+
+
+def _matches(trie, tokens):
+    '''
+    Every (start, end, values) where tokens[start:end] is a phrase in the trie
+    '''
+    for start in range(len(tokens)):
+        node = trie
+        for end in range(start, len(tokens)):
+            node = node.get(tokens[end])
+            if node is None:
+                break
+            if _TERMINAL in node:
+                yield start, end + 1, node[_TERMINAL]
+
+
+def _is_foil(tokens):
+    for position, token in enumerate(tokens):
+        if token in FOIL_WORDS and not (position and tokens[position - 1] in NEGATIONS):
+            return True
+    return False
+
+
+class CardIndex:
+    '''
+    Token tries of card names and set names/codes, and each card's printings
+    '''
+    
+    def __init__(self):
+        self.cards = {}
+        self.sets = {}
+        self.set_names = {}
+        self.printings = {}
+    
+    def __len__(self):
+        return len(self.printings)
+    
+    def add_set(self, code, name, aliases=()):
+        code = code.upper()
+        self.set_names[code] = name
+        for phrase in (name, code, *aliases):
+            _insert(self.sets, tokenize(phrase), code)
+    
+    def add_card(self, name, set_codes=()):
+        if name not in self.printings:
+            self.printings[name] = []
+            _insert(self.cards, tokenize(name), name)
+            # Double-faced cards are listed by their front face
+            if ' // ' in name:
+                _insert(self.cards, tokenize(name.split(' // ')[0]), name)
+        
+        printings = self.printings[name]
+        for code in set_codes:
+            if code.upper() not in printings:
+                printings.append(code.upper())
+    
+    def _card(self, tokens):
+        # Longest name wins ("Tropical Island" over "Island"), then the leftmost
+        best = None
+        for start, end, names in _matches(self.cards, tokens):
+            if best is None or end - start > best[1] - best[0]:
+                best = (start, end, names[0])
+        return best
+    
+    def _set(self, tokens, printings):
+        best = None
+        for start, end, codes in _matches(self.sets, tokens):
+            code = next((code for code in codes if code in printings), None)
+            if code and (best is None or end - start > best[0]):
+                best = (end - start, code)
+        if best:
+            return best[1]
+        if len(printings) == 1:
+            return printings[0]
+        return None
+    
+    def resolve(self, title):
+        '''
+        CardMatch for a listing title; card_name is None when no known card is found
+        '''
+        tokens = tokenize(title)
+        card = self._card(tokens)
+        if card is None:
+            return CardMatch(None, None, None, _is_foil(tokens), title)
+        
+        start, end, name = card
+        rest = tokens[:start] + tokens[end:]
+        # Set phrases are looked for on each side of the name, never across it
+        code = self._set(tokens[:start], self.printings[name]) or self._set(tokens[end:], self.printings[name])
+        return CardMatch(name, self.set_names.get(code), code, _is_foil(rest), ' '.join(rest))
+
+
+def load_card_index(path=None):
+    '''
+    Build a CardIndex from the bundled card list or from path
+    path is a file in the bundled format ({"sets": [...], "cards": {name: [codes]}})
+    or a Scryfall bulk data file (a JSON list of card objects)
+    '''
+    with open(path or BUNDLED_CARDS, encoding='utf-8') as f:
+        data = json.load(f)
+    
+    index = CardIndex()
+    if isinstance(data, dict):
+        for card_set in data['sets']:
+            index.add_set(card_set['code'], card_set['name'], card_set.get('aliases', ()))
+        for name, set_codes in data['cards'].items():
+            index.add_card(name, set_codes)
+        return index
+    
+    for card in data:
+        if card.get('layout') in SKIPPED_LAYOUTS or not card.get('name'):
+            continue
+        code = card.get('set')
+        if code and code.upper() not in index.set_names:
+            index.add_set(code, card.get('set_name', code))
+        index.add_card(card['name'], [code] if code else [])
+    return index
+
+
+_index = None
+
+
+def card_index():
+    '''
+    The CardIndex resolve_title() uses, loaded on first use from CARD_INDEX_PATH
+    or the bundled list
+    '''
+    global _index
+    if _index is None:
+        from mtgscraper import settings
+        
+        _index = load_card_index(getattr(settings, 'CARD_INDEX_PATH', None))
+    return _index
+
+
+def use_card_index(index):
+    '''
+    Resolve titles against index from now on, forgetting memoized lookups
+    '''
+    global _index
+    _index = index
+    resolve_title.cache_clear()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def resolve_title(title):
+    '''
+    Memoized CardMatch for a listing title against card_index()
+    "MTG Black Lotus Alpha LEA PSA 8" -> ('Black Lotus', 'Limited Edition Alpha', 'LEA', False, ...)
+    '''
+    return card_index().resolve(title)
+
+
+def backfill_card_identity(engine, batch_size=5000, refresh=False):
+    '''
+    Resolve the card identity of stored listings that do not have one yet
+    The raw title is kept in the title column. With refresh, listings resolved
+    before are resolved again from their title, e.g. after loading a larger card
+    index. Returns the number of rows updated
+    '''
+    from sqlalchemy import bindparam, select, update
+    from mtgscraper.normalize import normalize_listing
+    from mtgscraper.pipelines import MtgCard
+    
+    query = (
+        select(MtgCard.id, MtgCard.card_name, MtgCard.set_name, MtgCard.title,
+               MtgCard.price, MtgCard.shipping, MtgCard.condition)
+        .order_by(MtgCard.id)
+        .limit(batch_size)
+    )
+    if not refresh:
+        query = query.where(MtgCard.title.is_(None), MtgCard.card_name.is_not(None))
+    statement = (
+        update(MtgCard.__table__)
+        .where(MtgCard.__table__.c.id == bindparam('row_id'))
+        .values({name: bindparam(name) for name in IDENTITY_COLUMNS + ['condition_normalized']})
+    )
+    
+    def resolved(row):
+        listing = dict(row._mapping)
+        if listing['title'] is not None:
+            # Start over from the raw title and the set the scrapers record
+            listing.update(card_name=listing['title'], title=None, set_name=UNKNOWN_SET)
+        return dict(normalize_listing(listing), row_id=row.id)
+    
+    updated = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(query.where(MtgCard.id > last_id)).all()
+            if not rows:
+                return updated
+            conn.execute(statement, [resolved(row) for row in rows])
+        updated += len(rows)
+        last_id = rows[-1].id
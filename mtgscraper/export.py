@@ -0,0 +1,340 @@
+'''
+Streaming export engine
+Reads listings as plain tuples in fixed-size batches and writes them to CSV,
+gzip or zstd compressed CSV, or Parquet, so memory use stays flat regardless of table size
+'''
+
+import contextlib
+import csv
+import glob
+import gzip
+import io
+import os
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from mtgscraper.pipelines import Base, MtgCard, MtgExportState
+
+EXPORT_COLUMNS = ['id', 'card_name', 'price', 'condition', 'seller', 'shipping', 'buy_it_now', 'url', 'source', 'timestamp']
+
+FORMATS = {
+    'csv': '.csv',
+    'csv.gz': '.csv.gz',
+    'csv.zst': '.csv.zst',
+    'parquet': '.parquet',
+}
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+def format_for_path(path, default='csv'):
+    '''
+    Infer the export format from a file name
+    '''
+    lowered = path.lower() if path else ''
+    for fmt, extension in sorted(FORMATS.items(), key=lambda kv: len(kv[1]), reverse=True):
+        if lowered.endswith(extension):
+            return fmt
+    return default
+
+
+def default_export_path(fmt='csv'):
+    '''
+    Timestamped export file on the Desktop
+    '''
+    desktop_path = os.path.join(os.path.expanduser('~'), 'Desktop')
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return os.path.join(desktop_path, f'mtg_cards_{timestamp}{FORMATS[fmt]}')
+
+
+def default_delta_directory():
+    '''
+    Directory on the Desktop that holds incremental export files
+    '''
+    return os.path.join(os.path.expanduser('~'), 'Desktop', 'mtg_cards_exports')
+
+
+def build_query(since=None, card=None, after_id=None, up_to_id=None, newest_first=True, columns=EXPORT_COLUMNS):
+    '''
+    Select of the export columns with optional filters
+    since: datetime or ISO string; only listings scraped at or after it
+    card: substring match on the card name
+    after_id/up_to_id: id range (after_id, up_to_id] for incremental exports
+    '''
+    order = MtgCard.id.desc() if newest_first else MtgCard.id.asc()
+    query = select(*[getattr(MtgCard, name) for name in columns]).order_by(order)
+    
+    if since:
+        if isinstance(since, datetime):
+            since = since.isoformat()
+        query = query.where(MtgCard.timestamp >= since)
+    if card:
+        query = query.where(MtgCard.card_name.ilike(f'%{card}%'))
+    if after_id is not None:
+        query = query.where(MtgCard.id > after_id)
+    if up_to_id is not None:
+        query = query.where(MtgCard.id <= up_to_id)
+    
+    return query
+
+
+def iter_batches(engine, query, batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    Yield lists of row tuples, batch_size at a time, from a streamed result
+    '''
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+
+
+COMPRESSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+@contextlib.contextmanager
+def compressed_writer(fileobj, compression=None):
+    '''
+    Wrap a binary file object so everything written to it is compressed
+    The wrapper is flushed on exit; the underlying file object is left open
+    gzip output uses a fixed mtime so identical data gives identical bytes
+    '''
+    if not compression:
+        yield fileobj
+    elif compression == 'gzip':
+        # Level 6 keeps gzip close to disk speed with most of the size savings
+        with gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=6, mtime=0) as writer:
+            yield writer
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('zstandard is not installed! Install with: pip install zstandard')
+        with zstandard.ZstdCompressor(level=3).stream_writer(fileobj, closefd=False) as writer:
+            yield writer
+    else:
+        raise ValueError(f'Unknown compression: {compression} (choose from {", ".join(COMPRESSIONS)})')
+
+
+def _write_csv(batches, fileobj, compression=None):
+    count = 0
+    
+    with compressed_writer(fileobj, compression) as raw:
+        csvfile = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        writer = csv.writer(csvfile)
+        writer.writerow(EXPORT_COLUMNS)
+        for batch in batches:
+            writer.writerows(batch)
+            count += len(batch)
+        csvfile.flush()
+        csvfile.detach()
+    
+    return count
+
+
+def _parquet_schema():
+    import pyarrow as pa
+    
+    types = {'id': pa.int64(), 'buy_it_now': pa.bool_()}
+    return pa.schema([(name, types.get(name, pa.string())) for name in EXPORT_COLUMNS])
+
+
+def _write_parquet(batches, fileobj):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('pyarrow is not installed! Install with: pip install pyarrow')
+    
+    schema = _parquet_schema()
+    count = 0
+    
+    # Each database batch becomes one row group
+    with pq.ParquetWriter(pa.PythonFile(fileobj, mode='w'), schema, compression='snappy') as writer:
+        for batch in batches:
+            arrays = [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*batch), schema)
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            count += len(batch)
+    
+    return count
+
+
+WRITERS = {
+    'csv': lambda batches, fileobj: _write_csv(batches, fileobj),
+    'csv.gz': lambda batches, fileobj: _write_csv(batches, fileobj, 'gzip'),
+    'csv.zst': lambda batches, fileobj: _write_csv(batches, fileobj, 'zstd'),
+    'parquet': _write_parquet,
+}
+
+
+def write_stream(batches, fileobj, fmt):
+    '''
+    Write row batches in the given format to a writable binary file object
+    Returns the row count; the file object is not closed
+    '''
+    if fmt not in WRITERS:
+        raise ValueError(f'Unknown export format: {fmt} (choose from {", ".join(FORMATS)})')
+    return WRITERS[fmt](batches, fileobj)
+
+
+def write_batches(batches, path, fmt):
+    '''
+    Write row batches to path in the given format and return the row count
+    The file is written under a temporary name and renamed when complete
+    '''
+    partial_path = f'{path}.part'
+    try:
+        with open(partial_path, 'wb') as fileobj:
+            count = write_stream(batches, fileobj, fmt)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    
+    os.replace(partial_path, path)
+    return count
+
+
+def export_listings(engine, path=None, fmt=None, since=None, card=None, batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    Stream listings to a CSV, gzip CSV or Parquet file, newest first
+    The format defaults to the one implied by path, then CSV
+    Returns (path, row_count); nothing is written when no rows match
+    '''
+    fmt = fmt or format_for_path(path)
+    if fmt not in WRITERS:
+        raise ValueError(f'Unknown export format: {fmt} (choose from {", ".join(FORMATS)})')
+    
+    batches = iter_batches(engine, build_query(since=since, card=card), batch_size=batch_size)
+    first = next(batches, None)
+    if not first:
+        batches.close()
+        return None, 0
+    
+    def all_batches():
+        yield first
+        yield from batches
+    
+    path = path or default_export_path(fmt)
+    return path, write_batches(all_batches(), path, fmt)
+
+
+DELTA_FILE = re.compile(r'^mtg_cards_delta_(\d+)_(\d+)\.')
+
+
+def get_export_state(engine, name='default'):
+    '''
+    Return the export state row for a feed as a dict, or None before its first export
+    '''
+    Base.metadata.create_all(engine, tables=[MtgExportState.__table__])
+    
+    with engine.connect() as conn:
+        row = conn.execute(
+            select(MtgExportState.__table__).where(MtgExportState.name == name)
+        ).first()
+    return dict(row._mapping) if row else None
+
+
+def _save_export_state(engine, name, **values):
+    table = MtgExportState.__table__
+    with engine.begin() as conn:
+        updated = conn.execute(table.update().where(table.c.name == name).values(**values))
+        if updated.rowcount == 0:
+            conn.execute(table.insert().values(name=name, **values))
+
+
+def reset_export_state(engine, name='default'):
+    '''
+    Forget the high-water mark so the next incremental export starts from the first row
+    '''
+    table = MtgExportState.__table__
+    Base.metadata.create_all(engine, tables=[table])
+    with engine.begin() as conn:
+        conn.execute(table.delete().where(table.c.name == name))
+
+
+def prune_deltas(directory, up_to_id):
+    '''
+    Remove delta files fully covered by a snapshot ending at up_to_id
+    Returns the removed paths
+    '''
+    removed = []
+    for path in sorted(glob.glob(os.path.join(directory, 'mtg_cards_delta_*'))):
+        match = DELTA_FILE.match(os.path.basename(path))
+        if match and int(match.group(2)) <= up_to_id:
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+def export_incremental(engine, directory, name='default', fmt='csv', snapshot_every=None,
+                       prune=False, batch_size=DEFAULT_BATCH_SIZE, now=None):
+    '''
+    Write the listings added since the previous run of the named feed as a delta file
+    Delta files are named mtg_cards_delta_<first id>_<last id>.<ext> in id order.
+    With snapshot_every (days), a full snapshot up to the new high-water mark is also
+    written when the last one is older than that; prune=True then removes the deltas
+    it covers. The state is only advanced after the files are complete.
+    Returns a dict with the delta path, row count, high-water mark and snapshot path
+    '''
+    if fmt not in WRITERS:
+        raise ValueError(f'Unknown export format: {fmt} (choose from {", ".join(FORMATS)})')
+    
+    now = now or datetime.now()
+    os.makedirs(directory, exist_ok=True)
+    
+    state = get_export_state(engine, name) or {}
+    last_id = state.get('last_id') or 0
+    
+    with engine.connect() as conn:
+        # Fix the upper bound first so rows inserted during the export land in the next delta
+        max_id, max_timestamp = conn.execute(
+            select(func.max(MtgCard.id), func.max(MtgCard.timestamp)).where(MtgCard.id > last_id)
+        ).one()
+    
+    result = {
+        'name': name,
+        'delta': None,
+        'rows': 0,
+        'last_id': last_id,
+        'snapshot': None,
+        'pruned': [],
+    }
+    values = {}
+    
+    if max_id is not None:
+        query = build_query(after_id=last_id, up_to_id=max_id, newest_first=False)
+        delta_path = os.path.join(directory, f'mtg_cards_delta_{last_id + 1}_{max_id}{FORMATS[fmt]}')
+        result['rows'] = write_batches(iter_batches(engine, query, batch_size), delta_path, fmt)
+        result['delta'] = delta_path
+        result['last_id'] = max_id
+        values.update(last_id=max_id, last_timestamp=max_timestamp, exported_at=now)
+    
+    snapshot_at = state.get('snapshot_at')
+    snapshot_due = snapshot_every is not None and (
+        snapshot_at is None or now - snapshot_at >= timedelta(days=snapshot_every)
+    )
+    if snapshot_due and result['last_id']:
+        snapshot_id = result['last_id']
+        query = build_query(up_to_id=snapshot_id, newest_first=False)
+        snapshot_path = os.path.join(directory, f'mtg_cards_snapshot_{snapshot_id}{FORMATS[fmt]}')
+        write_batches(iter_batches(engine, query, batch_size), snapshot_path, fmt)
+        result['snapshot'] = snapshot_path
+        values.update(snapshot_id=snapshot_id, snapshot_at=now)
+        
+        if prune:
+            result['pruned'] = prune_deltas(directory, snapshot_id)
+            if result['delta'] in result['pruned']:
+                result['delta'] = None
+    
+    if values:
+        _save_export_state(engine, name, **values)
+    
+    return result
@@ -0,0 +1,338 @@
+'''
+Shared request frontier
+FrontierScheduler and FrontierDupeFilter keep a crawl's pending requests and
+request fingerprints outside the Scrapy process, so several crawlers, on one
+machine or many, pull from one queue and never fetch a page twice, and a
+crawl that dies leaves its queue behind for the next run to pick up.
+
+The frontier lives in Redis (any server speaking its protocol: Redis, Valkey,
+KeyDB, ...) for crawlers on several machines, or in an SQLite file for
+crawlers on one machine. Enable it in settings.py or per crawl:
+
+    SCHEDULER = 'mtgscraper.frontier.FrontierScheduler'
+    DUPEFILTER_CLASS = 'mtgscraper.frontier.FrontierDupeFilter'
+    FRONTIER_URL = 'redis://queue-host:6379/0'
+
+Requests are stored as pickled Request.to_dict() with their priority; equal
+priorities come out in the order they went in. Crawlers sharing FRONTIER_URL
+and FRONTIER_KEY share a frontier, so every spider of the same name does by
+default. Redis needs the redis package (pip install redis).
+'''
+
+import logging
+import os
+import pickle
+import sqlite3
+import struct
+from collections import deque
+
+FRONTIER_URL = 'sqlite:///frontier.db'
+
+# Key under which a crawl's queue and fingerprints are stored
+FRONTIER_KEY = '%(spider)s'
+
+# How long an SQLite frontier waits for another crawler to commit
+BUSY_TIMEOUT_SECONDS = 30
+
+# Requests an SQLite frontier takes per write transaction; the rest of a batch
+# is handed out from memory, so crawlers queue for the write lock less often.
+# A crawler that is killed loses the ones it still holds, like the requests it
+# is downloading
+POP_BATCH_SIZE = 16
+
+logger = logging.getLogger(__name__)
+
+
+def connect(url=FRONTIER_URL):
+    '''
+    The frontier backend for url: redis://, rediss:// or unix:// for a Redis
+    server, sqlite:///path for a local file
+    '''
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError('redis is not installed! Install with: pip install redis')
+        return RedisFrontier(redis.Redis.from_url(url))
+    if url.startswith('sqlite:///'):
+        return SQLiteFrontier(url[len('sqlite:///'):])
+    raise ValueError(f'Unsupported frontier URL: {url} (use redis://... or sqlite:///path)')
+
+
+def frontier_key(settings, spider_name):
+    '''
+    FRONTIER_KEY with %(spider)s filled in
+    '''
+    return settings.get('FRONTIER_KEY', FRONTIER_KEY) % {'spider': spider_name}
+
+
+class RedisFrontier:
+    '''
+    Frontier in Redis: requests in the sorted set <key>:requests scored by
+    negated priority, fingerprints in the set <key>:fingerprints
+    Each queued member is prefixed with a number from the <key>:sequence
+    counter, which keeps equal scores first in, first out whatever the clocks
+    of the crawlers say; ZPOPMIN hands every request to one crawler
+    '''
+    
+    name = 'redis'
+    
+    def __init__(self, client):
+        self.client = client
+    
+    def push(self, key, data, priority=0):
+        member = struct.pack('>Q', self.client.incr(f'{key}:sequence')) + data
+        self.client.zadd(f'{key}:requests', {member: -priority})
+    
+    def pop(self, key):
+        popped = self.client.zpopmin(f'{key}:requests')
+        return popped[0][0][8:] if popped else None
+    
+    def size(self, key):
+        return self.client.zcard(f'{key}:requests')
+    
+    def add_fingerprint(self, key, fingerprint):
+        '''
+        Record fingerprint, returning False if it was already recorded
+        '''
+        return self.client.sadd(f'{key}:fingerprints', fingerprint) == 1
+    
+    def clear_fingerprints(self, key):
+        self.client.delete(f'{key}:fingerprints')
+    
+    def clear(self, key):
+        self.client.delete(f'{key}:requests', f'{key}:fingerprints', f'{key}:sequence')
+    
+    def close(self):
+        self.client.close()
+
+
+class SQLiteFrontier:
+    '''
+    Frontier in an SQLite file in WAL mode, shared by the crawlers on one machine
+    A pop deletes up to batch_size of the next requests in one write
+    transaction, so two crawlers never get the same one, and keeps them in
+    memory for the following pops. Requests still held there go back to the
+    queue on close
+    '''
+    
+    name = 'sqlite'
+    
+    def __init__(self, path, batch_size=POP_BATCH_SIZE):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.taken = {}
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS frontier_requests ('
+            'id INTEGER PRIMARY KEY, key TEXT NOT NULL, priority INTEGER NOT NULL, data BLOB NOT NULL)'
+        )
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS frontier_requests_next ON frontier_requests (key, priority DESC, id)'
+        )
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS frontier_fingerprints ('
+            'key TEXT NOT NULL, fingerprint BLOB NOT NULL, PRIMARY KEY (key, fingerprint)) WITHOUT ROWID'
+        )
+    
+    def push(self, key, data, priority=0):
+        self.connection.execute(
+            'INSERT INTO frontier_requests (key, priority, data) VALUES (?, ?, ?)', (key, priority, data)
+        )
+    
+    def pop(self, key):
+        taken = self.taken.get(key)
+        if not taken:
+            taken = self.taken[key] = self._take(key)
+        return taken.popleft()[2] if taken else None
+    
+    def _take(self, key):
+        '''
+        Delete the next batch_size requests of key; returns them in queue order
+        '''
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = connection.execute(
+                'DELETE FROM frontier_requests WHERE id IN ('
+                'SELECT id FROM frontier_requests WHERE key = ? ORDER BY priority DESC, id LIMIT ?'
+                ') RETURNING priority, id, data', (key, self.batch_size)
+            ).fetchall()
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        # RETURNING gives the rows in no particular order
+        return deque(sorted(rows, key=lambda row: (-row[0], row[1])))
+    
+    def _give_back(self):
+        '''
+        Requeue the requests taken but not handed out, under their old ids where
+        those are still free so they keep their place in the queue
+        '''
+        for key, taken in self.taken.items():
+            for priority, request_id, data in taken:
+                cursor = self.connection.execute(
+                    'INSERT OR IGNORE INTO frontier_requests (id, key, priority, data) VALUES (?, ?, ?, ?)',
+                    (request_id, key, priority, data)
+                )
+                if cursor.rowcount != 1:
+                    self.push(key, data, priority)
+        self.taken.clear()
+    
+    def size(self, key):
+        queued = self.connection.execute('SELECT count(*) FROM frontier_requests WHERE key = ?', (key,)).fetchone()[0]
+        return queued + len(self.taken.get(key, ()))
+    
+    def add_fingerprint(self, key, fingerprint):
+        '''
+        Record fingerprint, returning False if it was already recorded
+        '''
+        cursor = self.connection.execute(
+            'INSERT OR IGNORE INTO frontier_fingerprints (key, fingerprint) VALUES (?, ?)', (key, fingerprint)
+        )
+        return cursor.rowcount == 1
+    
+    def clear_fingerprints(self, key):
+        self.connection.execute('DELETE FROM frontier_fingerprints WHERE key = ?', (key,))
+    
+    def clear(self, key):
+        self.taken.pop(key, None)
+        self.connection.execute('DELETE FROM frontier_requests WHERE key = ?', (key,))
+        self.clear_fingerprints(key)
+    
+    def close(self):
+        self._give_back()
+        self.connection.close()
+
+
+class FrontierDupeFilter:
+    '''
+    Request fingerprints kept in the frontier, so a page one crawler has
+    scheduled is filtered out for all of them
+    '''
+    
+    def __init__(self, frontier, key, fingerprinter, debug=False):
+        self.frontier = frontier
+        self.key = key
+        self.fingerprinter = fingerprinter
+        self.debug = debug
+        self.logdupes = True
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            connect(settings.get('FRONTIER_URL', FRONTIER_URL)),
+            frontier_key(settings, crawler.spidercls.name),
+            crawler.request_fingerprinter,
+            debug=settings.getbool('DUPEFILTER_DEBUG'),
+        )
+    
+    def request_seen(self, request):
+        return not self.frontier.add_fingerprint(self.key, self.fingerprinter.fingerprint(request))
+    
+    def open(self):
+        pass
+    
+    def close(self, reason):
+        self.frontier.close()
+    
+    def clear(self):
+        self.frontier.clear_fingerprints(self.key)
+    
+    def log(self, request, spider):
+        if self.debug:
+            spider.logger.debug(f'Filtered duplicate request: {request}')
+        elif self.logdupes:
+            spider.logger.debug(f'Filtered duplicate request: {request} - no more duplicates will be shown')
+            self.logdupes = False
+        spider.crawler.stats.inc_value('dupefilter/filtered')
+
+
+class FrontierScheduler:
+    '''
+    Scrapy scheduler over a shared frontier (see the module docstring)
+    Duplicates are filtered by DUPEFILTER_CLASS, normally FrontierDupeFilter.
+    Requests that cannot be pickled, e.g. with a callback that is not a spider
+    method, stay in this process. When a crawl finishes with nothing queued,
+    the fingerprints are dropped so the next crawl fetches the same pages
+    again; FRONTIER_PERSIST keeps them
+    '''
+    
+    def __init__(self, frontier, key, dupefilter, stats, persist=False):
+        self.frontier = frontier
+        self.key = key
+        self.df = dupefilter
+        self.stats = stats
+        self.persist = persist
+        self.local = deque()
+        self.spider = None
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        from scrapy.utils.misc import build_from_crawler, load_object
+        
+        settings = crawler.settings
+        dupefilter = build_from_crawler(load_object(settings['DUPEFILTER_CLASS']), crawler)
+        return cls(
+            connect(settings.get('FRONTIER_URL', FRONTIER_URL)),
+            frontier_key(settings, crawler.spidercls.name),
+            dupefilter,
+            crawler.stats,
+            persist=settings.getbool('FRONTIER_PERSIST'),
+        )
+    
+    def open(self, spider):
+        self.spider = spider
+        queued = self.frontier.size(self.key)
+        if queued:
+            spider.logger.info(f'Resuming {queued} queued requests from the {self.frontier.name} frontier')
+        return self.df.open()
+    
+    def close(self, reason):
+        if reason == 'finished' and not self.persist and not self.frontier.size(self.key) and hasattr(self.df, 'clear'):
+            self.df.clear()
+        self.frontier.close()
+        return self.df.close(reason)
+    
+    def has_pending_requests(self):
+        return bool(self.local) or self.frontier.size(self.key) > 0
+    
+    def enqueue_request(self, request):
+        if not request.dont_filter and self.df.request_seen(request):
+            self.df.log(request, self.spider)
+            return False
+        try:
+            data = pickle.dumps(request.to_dict(spider=self.spider), protocol=4)
+        except (ValueError, TypeError, AttributeError, pickle.PicklingError) as e:
+            logger.debug(f'Keeping unserializable request {request} in this process: {e}')
+            self.local.append(request)
+            self.stats.inc_value('scheduler/enqueued/memory')
+        else:
+            self.frontier.push(self.key, data, request.priority)
+            self.stats.inc_value(f'scheduler/enqueued/{self.frontier.name}')
+        self.stats.inc_value('scheduler/enqueued')
+        return True
+    
+    def next_request(self):
+        from scrapy.utils.request import request_from_dict
+        
+        if self.local:
+            request = self.local.popleft()
+            self.stats.inc_value('scheduler/dequeued/memory')
+        else:
+            data = self.frontier.pop(self.key)
+            if data is None:
+                return None
+            request = request_from_dict(pickle.loads(data), spider=self.spider)
+            self.stats.inc_value(f'scheduler/dequeued/{self.frontier.name}')
+        self.stats.inc_value('scheduler/dequeued')
+        return request
+    
+    def __len__(self):
+        return len(self.local) + self.frontier.size(self.key)
@@ -1,5 +1,19 @@
+import sys
+
+import attrs
 import scrapy
 
+# Values shared by every eBay listing, interned so all items point at one copy
+EBAY_SOURCE = sys.intern('eBay')
+EBAY_SELLER = sys.intern('eBay Seller')
+UNKNOWN_SET = sys.intern('Unknown')
+
+# Scraped fields of a listing, in MtgCard column order
+LISTING_FIELDS = (
+    'card_name', 'set_name', 'price', 'condition', 'seller',
+    'url', 'source', 'timestamp', 'shipping', 'buy_it_now',
+)
+
 
 class MtgCardItem(scrapy.Item):
     '''
@@ -15,3 +29,55 @@ class MtgCardItem(scrapy.Item):
     timestamp = scrapy.Field()
     shipping = scrapy.Field()
     buy_it_now = scrapy.Field()
+
+
+@attrs.define
+class MtgListing:
+    '''
+    Slotted item for high-volume crawls, with the fields of MtgCardItem
+    There is no dict per instance, and ItemAdapter supports attrs classes, so
+    it works with every pipeline and feed export. MtgScraperPipeline reads its
+    fields directly and hands them to the batched writer as a plain row
+    '''
+    card_name = attrs.field(default=None)
+    set_name = attrs.field(default=None)
+    price = attrs.field(default=None)
+    condition = attrs.field(default=None)
+    seller = attrs.field(default=None)
+    url = attrs.field(default=None)
+    source = attrs.field(default=None)
+    timestamp = attrs.field(default=None)
+    shipping = attrs.field(default=None)
+    buy_it_now = attrs.field(default=False)
+    
+    def row(self):
+        '''
+        The fields as a dict of MtgCard column names
+        '''
+        return {
+            'card_name': self.card_name,
+            'set_name': self.set_name,
+            'price': self.price,
+            'condition': self.condition,
+            'seller': self.seller,
+            'url': self.url,
+            'source': self.source,
+            'timestamp': self.timestamp,
+            'shipping': self.shipping,
+            'buy_it_now': self.buy_it_now,
+        }
+
+
+def listing_row(item):
+    '''
+    The LISTING_FIELDS of any item type ItemAdapter supports, as a dict
+    '''
+    if isinstance(item, MtgListing):
+        return item.row()
+    from itemadapter import ItemAdapter
+    
+    adapter = ItemAdapter(item)
+    row = {name: adapter.get(name) for name in LISTING_FIELDS}
+    if row['buy_it_now'] is None:
+        row['buy_it_now'] = False
+    return row
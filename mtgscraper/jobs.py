@@ -0,0 +1,334 @@
+'''
+Resumable crawl jobs
+A job is one SQLite file under CRAWL_JOB_DIR holding everything needed to
+pick a crawl up where it stopped: the request frontier with its fingerprints
+(mtgscraper/frontier.py), the cards of the job and a marker for every search
+results page whose listings are safely in the database.
+
+A page is marked finished once all of its listings have gone through
+MtgScraperPipeline and been committed by one of its checkpoints, so a marker
+never gets ahead of the listings it stands for. A card is finished with the
+last page it has. Restarting a job then skips finished cards, lets queued
+requests run from the frontier, and starts any other unfinished card at the
+page after its last finished one, so an interrupted run refetches at most the
+pages that were in flight when it died.
+
+Spiders opt in by putting 'card' and 'page' in the meta of their search
+requests; a search_request(page) method lets a card resume past page 1.
+'''
+
+import os
+import pickle
+import sqlite3
+from datetime import datetime
+
+from mtgscraper.frontier import BUSY_TIMEOUT_SECONDS, frontier_key
+
+CRAWL_JOB_DIR = 'jobs'
+
+
+def job_path(name, directory=CRAWL_JOB_DIR):
+    '''
+    File of the job called name: 'nightly' -> jobs/nightly.db
+    '''
+    if not name or os.sep in name or name.startswith('.'):
+        raise ValueError(f'Invalid job name: {name!r}')
+    return os.path.abspath(os.path.join(directory, f'{name}.db'))
+
+
+def job_settings(path, queued=None, resuming=False):
+    '''
+    Scrapy settings that run a crawl as part of the job in path
+    queued and resuming are the job's queued_cards and has_fingerprints. Crawlers
+    sharing the job's frontier pop each other's requests, so a fan-out takes
+    them once before any crawler starts; otherwise each crawler takes its own
+    '''
+    settings = {
+        'SCHEDULER': 'mtgscraper.frontier.FrontierScheduler',
+        'DUPEFILTER_CLASS': 'mtgscraper.frontier.FrontierDupeFilter',
+        'FRONTIER_URL': f'sqlite:///{path}',
+        'FRONTIER_PERSIST': True,
+        'CRAWL_JOB_PATH': path,
+    }
+    if queued is not None:
+        settings['CRAWL_JOB_QUEUED_CARDS'] = sorted(queued)
+        settings['CRAWL_JOB_RESUMING'] = resuming
+    return settings
+
+
+class CrawlJob:
+    '''
+    Card and page progress of a crawl job
+    '''
+    
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS job_cards ('
+            'card TEXT PRIMARY KEY, pages INTEGER NOT NULL DEFAULT 0, items INTEGER NOT NULL DEFAULT 0, '
+            'finished_at TEXT)'
+        )
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS job_pages ('
+            'card TEXT NOT NULL, page INTEGER NOT NULL, items INTEGER NOT NULL, finished_at TEXT NOT NULL, '
+            'PRIMARY KEY (card, page)) WITHOUT ROWID'
+        )
+    
+    def add_cards(self, cards):
+        self.connection.executemany('INSERT OR IGNORE INTO job_cards (card) VALUES (?)', [(card,) for card in cards])
+    
+    def finished_cards(self):
+        return {card for card, in self.connection.execute('SELECT card FROM job_cards WHERE finished_at IS NOT NULL')}
+    
+    def next_page(self, card):
+        '''
+        First page of card not finished yet, or None when the card is finished
+        '''
+        row = self.connection.execute('SELECT finished_at FROM job_cards WHERE card = ?', (card,)).fetchone()
+        if row and row[0]:
+            return None
+        page = 1
+        for done, in self.connection.execute('SELECT page FROM job_pages WHERE card = ? ORDER BY page', (card,)):
+            if done != page:
+                break
+            page += 1
+        return page
+    
+    def finish_pages(self, pages):
+        '''
+        Record (card, page, items, last) tuples as finished in one transaction;
+        last finishes the card too
+        '''
+        now = datetime.now().isoformat()
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for card, page, items, last in pages:
+                connection.execute('INSERT OR IGNORE INTO job_cards (card) VALUES (?)', (card,))
+                connection.execute(
+                    'INSERT OR REPLACE INTO job_pages (card, page, items, finished_at) VALUES (?, ?, ?, ?)',
+                    (card, page, items, now)
+                )
+                connection.execute(
+                    'UPDATE job_cards SET (pages, items) = '
+                    '(SELECT count(*), coalesce(sum(items), 0) FROM job_pages WHERE card = ?) WHERE card = ?',
+                    (card, card)
+                )
+                if last:
+                    connection.execute('UPDATE job_cards SET finished_at = ? WHERE card = ?', (now, card))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+    
+    def has_fingerprints(self, key):
+        '''
+        Whether an earlier run of the job has scheduled requests under key
+        '''
+        try:
+            return self.connection.execute(
+                'SELECT 1 FROM frontier_fingerprints WHERE key = ? LIMIT 1', (key,)
+            ).fetchone() is not None
+        except sqlite3.OperationalError:
+            return False
+    
+    def forget_fingerprint(self, key, fingerprint):
+        try:
+            self.connection.execute(
+                'DELETE FROM frontier_fingerprints WHERE key = ? AND fingerprint = ?', (key, fingerprint)
+            )
+        except sqlite3.OperationalError:
+            pass
+    
+    def queued_cards(self, key):
+        '''
+        Cards with a request waiting in the job's frontier under key
+        '''
+        cards = set()
+        try:
+            rows = self.connection.execute('SELECT data FROM frontier_requests WHERE key = ?', (key,))
+            for data, in rows:
+                card = pickle.loads(data).get('meta', {}).get('card')
+                if card is not None:
+                    cards.add(card)
+        except sqlite3.OperationalError:
+            # No frontier in this file yet
+            pass
+        return cards
+    
+    def progress(self):
+        '''
+        Counts of cards, finished cards, finished pages and their items
+        '''
+        cards, finished, pages, items = self.connection.execute(
+            'SELECT count(*), count(finished_at), coalesce(sum(pages), 0), coalesce(sum(items), 0) FROM job_cards'
+        ).fetchone()
+        return {'cards': cards, 'finished_cards': finished, 'finished_pages': pages, 'items': items}
+    
+    def close(self):
+        self.connection.close()
+
+
+class JobProgressMiddleware:
+    '''
+    Spider middleware recording page and card progress for the job in
+    CRAWL_JOB_PATH, and skipping or resuming the start requests of its cards
+    Listings are followed from the spider's output to item_scraped, and their
+    page is marked finished at the next listings_committed checkpoint
+    '''
+    
+    def __init__(self, crawler, job):
+        self.crawler = crawler
+        self.job = job
+        self.key = frontier_key(crawler.settings, crawler.spidercls.name)
+        queued = crawler.settings.get('CRAWL_JOB_QUEUED_CARDS')
+        self.queued = set(queued) if queued is not None else None
+        self.resuming = crawler.settings.getbool('CRAWL_JOB_RESUMING')
+        # Cards restarted from their markers, whose next pages may already
+        # have fingerprints from the run that stopped
+        self.relinked = set()
+        # id(item) -> (card, page) of the items still in the pipeline
+        self.items = {}
+        # (card, page) -> progress of the pages whose listings are not all stored yet
+        self.pages = {}
+        # (card, page, items, last) of the pages waiting for a checkpoint
+        self.ready = []
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        from scrapy import signals
+        from scrapy.exceptions import NotConfigured
+        from mtgscraper.pipelines import listings_committed
+        
+        path = crawler.settings.get('CRAWL_JOB_PATH')
+        if not path:
+            raise NotConfigured('CRAWL_JOB_PATH is not set')
+        middleware = cls(crawler, CrawlJob(path))
+        crawler.signals.connect(middleware.item_stored, signal=signals.item_scraped)
+        crawler.signals.connect(middleware.item_stored, signal=signals.item_dropped)
+        crawler.signals.connect(middleware.item_failed, signal=signals.item_error)
+        crawler.signals.connect(middleware.checkpoint, signal=listings_committed)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+    
+    async def process_start(self, start):
+        async for request in start:
+            request = self._resume(request)
+            if request is not None:
+                yield request
+    
+    def process_start_requests(self, start_requests, spider):
+        for request in start_requests:
+            request = self._resume(request)
+            if request is not None:
+                yield request
+    
+    def process_spider_output(self, response, result, spider=None):
+        page = self._open_page(response)
+        for output in result:
+            yield self._track(page, output)
+        self._close_page(page)
+    
+    async def process_spider_output_async(self, response, result, spider=None):
+        page = self._open_page(response)
+        async for output in result:
+            yield self._track(page, output)
+        self._close_page(page)
+    
+    def _resume(self, request):
+        from scrapy import Request
+        
+        card = request.meta.get('card') if isinstance(request, Request) else None
+        if card is None:
+            return request
+        
+        spider = self.crawler.spider
+        self.job.add_cards([card])
+        page = self.job.next_page(card)
+        if page is None:
+            spider.logger.info(f'Job: {card} is already finished, skipping it')
+            self.crawler.stats.inc_value('job/cards_skipped')
+            return None
+        if self.queued is None:
+            self.queued = self.job.queued_cards(self.key)
+            self.resuming = self.job.has_fingerprints(self.key)
+        if card in self.queued:
+            spider.logger.info(f'Job: resuming {card} from its queued requests')
+            return None
+        if self.resuming:
+            self.relinked.add(card)
+        if page > 1 and hasattr(spider, 'search_request'):
+            spider.logger.info(f'Job: resuming {card} at page {page}')
+            self.crawler.stats.inc_value('job/cards_resumed')
+            # Filtered, so the fingerprints catch the page if it is issued again
+            request = spider.search_request(page).replace(dont_filter=False)
+            if card in self.relinked:
+                # Not queued, so a fingerprint is from a request the stopped run lost in flight
+                self.job.forget_fingerprint(self.key, self.crawler.request_fingerprinter.fingerprint(request))
+            return request
+        return request
+    
+    def _open_page(self, response):
+        meta = response.meta if response is not None else {}
+        if meta.get('card') is None or meta.get('page') is None:
+            return None
+        page = (meta['card'], meta['page'])
+        self.pages[page] = {'pending': 0, 'items': 0, 'more': False, 'done': False, 'failed': False}
+        return page
+    
+    def _track(self, page, output):
+        from scrapy import Request
+        
+        if page is None:
+            return output
+        state = self.pages[page]
+        if isinstance(output, Request):
+            if output.meta.get('card') == page[0] and (output.meta.get('page') or 0) > page[1]:
+                if not state['more'] and page[0] in self.relinked:
+                    # The stopped run may have fingerprinted this page and lost it in flight
+                    self.job.forget_fingerprint(self.key, self.crawler.request_fingerprinter.fingerprint(output))
+                state['more'] = True
+        else:
+            self.items[id(output)] = page
+            state['pending'] += 1
+            state['items'] += 1
+        return output
+    
+    def _close_page(self, page):
+        if page is not None:
+            self.pages[page]['done'] = True
+            self._settle(page)
+    
+    def _settle(self, page):
+        state = self.pages[page]
+        if state['done'] and not state['pending']:
+            del self.pages[page]
+            if not state['failed']:
+                self.ready.append((page[0], page[1], state['items'], not state['more']))
+    
+    def item_stored(self, item):
+        page = self.items.pop(id(item), None)
+        if page is not None:
+            self.pages[page]['pending'] -= 1
+            self._settle(page)
+    
+    def item_failed(self, item):
+        page = self.items.pop(id(item), None)
+        if page is not None:
+            # Not marked, so a resumed job fetches the page again
+            self.pages[page]['failed'] = True
+            self.pages[page]['pending'] -= 1
+            self._settle(page)
+    
+    def checkpoint(self):
+        if self.ready:
+            ready, self.ready = self.ready, []
+            self.job.finish_pages(ready)
+            self.crawler.stats.inc_value('job/pages_finished', len(ready))
+            self.crawler.stats.inc_value('job/cards_finished', sum(1 for page in ready if page[3]))
+    
+    def spider_closed(self):
+        self.job.close()
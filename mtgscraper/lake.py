@@ -0,0 +1,297 @@
+'''
+Parquet data lake for scraped listings
+Listings are appended to Hive-partitioned Parquet files laid out as
+<root>/source=<source>/date=<YYYY-MM-DD>/part-*.parquet, with buffered row
+groups, dictionary-encoded strings and size-based file rollover.
+compact_lake() merges the small files a partition collects over many crawls.
+'''
+
+import glob
+import os
+import uuid
+from datetime import datetime
+from urllib.parse import quote
+
+from mtgscraper.normalize import normalize_listing
+
+# id is the listing's mtg_cards id, the key of the lake's rows
+LAKE_COLUMNS = [
+    'id', 'card_name', 'set_name', 'price', 'price_value', 'condition', 'seller',
+    'url', 'timestamp', 'shipping', 'buy_it_now',
+    'price_max', 'currency', 'shipping_value', 'condition_normalized',
+    'title', 'foil',
+]
+
+FLOAT_COLUMNS = ['price_value', 'price_max', 'shipping_value']
+
+# Low-cardinality text columns; everything else stays plain encoded
+DICTIONARY_COLUMNS = ['card_name', 'set_name', 'condition', 'seller', 'shipping', 'currency', 'condition_normalized']
+
+DEFAULT_ROW_GROUP_SIZE = 10000
+DEFAULT_MAX_FILE_MB = 128
+IN_PROGRESS_SUFFIX = '.inprogress'
+
+
+def lake_schema():
+    import pyarrow as pa
+    
+    types = dict.fromkeys(FLOAT_COLUMNS, pa.float64())
+    types['id'] = pa.int64()
+    types['buy_it_now'] = pa.bool_()
+    types['foil'] = pa.bool_()
+    return pa.schema([(name, types.get(name, pa.string())) for name in LAKE_COLUMNS])
+
+
+def partition_dir(root, source, day):
+    '''
+    Directory of one source/date partition, with values URI-encoded as pyarrow expects
+    '''
+    return os.path.join(
+        root,
+        f'source={quote(source or "unknown", safe="")}',
+        f'date={quote(day or "unknown", safe="")}'
+    )
+
+
+def _new_file_path(directory):
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+    return os.path.join(directory, f'part-{stamp}-{uuid.uuid4().hex[:8]}.parquet')
+
+
+class _PartitionFile:
+    '''
+    One open Parquet file in a partition, written as <name>.inprogress until closed
+    '''
+    
+    def __init__(self, path, schema):
+        import pyarrow.parquet as pq
+        
+        self.path = path
+        self._sink = open(path + IN_PROGRESS_SUFFIX, 'wb')
+        self._writer = pq.ParquetWriter(
+            self._sink,
+            schema,
+            compression='zstd',
+            use_dictionary=DICTIONARY_COLUMNS,
+        )
+    
+    @property
+    def size(self):
+        return self._sink.tell()
+    
+    def write_table(self, table):
+        self._writer.write_table(table, row_group_size=table.num_rows)
+    
+    def close(self):
+        self._writer.close()
+        self._sink.close()
+        os.replace(self.path + IN_PROGRESS_SUFFIX, self.path)
+    
+    def abort(self):
+        self._writer.close()
+        self._sink.close()
+        os.remove(self.path + IN_PROGRESS_SUFFIX)
+
+
+class LakeWriter:
+    '''
+    Buffers listing dicts per source/date partition and appends them as row groups
+    A file is closed and a new one started once it passes max_file_mb
+    Files only appear under their final name when complete, so readers never
+    see a half-written footer
+    '''
+    
+    def __init__(self, root, row_group_size=DEFAULT_ROW_GROUP_SIZE, max_file_mb=DEFAULT_MAX_FILE_MB):
+        try:
+            self.schema = lake_schema()
+        except ImportError:
+            raise ImportError('pyarrow is not installed! Install with: pip install pyarrow')
+        
+        self.root = root
+        self.row_group_size = row_group_size
+        self.max_file_bytes = max_file_mb * 1024 * 1024
+        self.rows_written = 0
+        self.files_written = 0
+        
+        self._buffers = {}
+        self._files = {}
+    
+    def write(self, listing):
+        '''
+        Add one listing dict (MtgCard column names)
+        '''
+        timestamp = listing.get('timestamp') or ''
+        key = (listing.get('source'), timestamp[:10])
+        
+        row = {name: listing.get(name) for name in LAKE_COLUMNS}
+        row.update(normalize_listing(listing))
+        row['buy_it_now'] = bool(listing.get('buy_it_now'))
+        
+        buffer = self._buffers.setdefault(key, [])
+        buffer.append(row)
+        if len(buffer) >= self.row_group_size:
+            self._flush(key)
+    
+    def write_many(self, listings):
+        for listing in listings:
+            self.write(listing)
+    
+    def _flush(self, key):
+        import pyarrow as pa
+        
+        rows = self._buffers.pop(key, None)
+        if not rows:
+            return
+        
+        partition_file = self._files.get(key)
+        if partition_file is None:
+            directory = partition_dir(self.root, *key)
+            os.makedirs(directory, exist_ok=True)
+            partition_file = self._files[key] = _PartitionFile(_new_file_path(directory), self.schema)
+        
+        partition_file.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+        self.rows_written += len(rows)
+        
+        if partition_file.size >= self.max_file_bytes:
+            partition_file.close()
+            self.files_written += 1
+            del self._files[key]
+    
+    def close(self):
+        '''
+        Flush every buffered partition and finalize open files
+        '''
+        for key in list(self._buffers):
+            self._flush(key)
+        for partition_file in self._files.values():
+            partition_file.close()
+            self.files_written += 1
+        self._files.clear()
+
+
+def lake_options(settings=None):
+    '''
+    Lake settings as a dict, read from a Scrapy settings object or mtgscraper.settings
+    '''
+    if settings is None:
+        from mtgscraper import settings as module
+        
+        def get(name, default):
+            return getattr(module, name, default)
+    else:
+        get = settings.get
+    
+    return {
+        'enabled': bool(get('PARQUET_LAKE_ENABLED', False)),
+        'root': get('PARQUET_LAKE_DIR', 'lake'),
+        'row_group_size': int(get('PARQUET_LAKE_ROW_GROUP_SIZE', DEFAULT_ROW_GROUP_SIZE)),
+        'max_file_mb': int(get('PARQUET_LAKE_MAX_FILE_MB', DEFAULT_MAX_FILE_MB)),
+    }
+
+
+def open_lake_writer(settings=None):
+    '''
+    LakeWriter configured from settings, or None when the lake is disabled
+    or pyarrow is not installed
+    '''
+    options = lake_options(settings)
+    if not options['enabled']:
+        return None
+    try:
+        return LakeWriter(options['root'], options['row_group_size'], options['max_file_mb'])
+    except ImportError:
+        return None
+
+
+def _conform_batch(batch, schema):
+    '''
+    Select and cast a record batch to the lake schema
+    Columns missing from files written before they were added are filled with nulls
+    '''
+    import pyarrow as pa
+    
+    arrays = [
+        batch.column(field.name).cast(field.type) if field.name in batch.schema.names
+        else pa.nulls(batch.num_rows, field.type)
+        for field in schema
+    ]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _partition_dirs(root):
+    return sorted(path for path in glob.glob(os.path.join(root, 'source=*', 'date=*')) if os.path.isdir(path))
+
+
+def compact_partition(directory, target_file_mb=DEFAULT_MAX_FILE_MB, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+    '''
+    Merge the small Parquet files of one partition into as few files as possible
+    Files already at the target size are left alone. Returns (files_before, files_after)
+    '''
+    import pyarrow.parquet as pq
+    
+    target_bytes = target_file_mb * 1024 * 1024
+    small = sorted(
+        path for path in glob.glob(os.path.join(directory, '*.parquet'))
+        if os.path.getsize(path) < target_bytes
+    )
+    if len(small) < 2:
+        return len(small), len(small)
+    
+    schema = lake_schema()
+    written = []
+    current = None
+    pending = []
+    pending_rows = 0
+    
+    def flush_pending():
+        nonlocal current, pending, pending_rows
+        import pyarrow as pa
+        
+        if not pending:
+            return
+        if current is None:
+            current = _PartitionFile(_new_file_path(directory), schema)
+        current.write_table(pa.Table.from_batches(pending, schema=schema))
+        pending, pending_rows = [], 0
+        
+        if current.size >= target_bytes:
+            current.close()
+            written.append(current.path)
+            current = None
+    
+    try:
+        for path in small:
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=row_group_size):
+                pending.append(_conform_batch(batch, schema))
+                pending_rows += batch.num_rows
+                if pending_rows >= row_group_size:
+                    flush_pending()
+        flush_pending()
+        if current is not None:
+            current.close()
+            written.append(current.path)
+    except BaseException:
+        if current is not None:
+            current.abort()
+        for path in written:
+            os.remove(path)
+        raise
+    
+    # The merged files are complete; only now drop the originals
+    for path in small:
+        os.remove(path)
+    
+    return len(small), len(written)
+
+
+def compact_lake(root, target_file_mb=DEFAULT_MAX_FILE_MB, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+    '''
+    Compact every partition under root
+    Returns a list of dicts with the partition path and file counts before and after
+    '''
+    results = []
+    for directory in _partition_dirs(root):
+        before, after = compact_partition(directory, target_file_mb, row_group_size)
+        if before != after:
+            results.append({'partition': os.path.relpath(directory, root), 'files_before': before, 'files_after': after})
+    return results
@@ -239,6 +239,12 @@ class ProxyMiddleware:
         Initialize middleware from crawler settings
         '''
         import os
+        # PROXIES is a list given to one crawl, e.g. a fan-out worker's share
+        proxies = crawler.settings.getlist('PROXIES')
+        if proxies:
+            middleware = cls()
+            middleware.proxies = proxies
+            return middleware
         proxy_file = os.environ.get('PROXY_LIST')
         return cls(proxy_list_file=proxy_file)
     
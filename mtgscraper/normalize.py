@@ -0,0 +1,298 @@
+'''
+Ingest-time normalization of scraped listing fields
+Price, shipping and condition text is parsed once when a listing is saved and
+stored in numeric and canonical columns, so SQL never has to take strings apart.
+The listing title is resolved to a canonical card and set (mtgscraper.cards).
+The parsers are memoized because the same strings repeat across many listings.
+'''
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from mtgscraper.cards import resolve_title
+
+CACHE_SIZE = 65536
+
+NORMALIZED_COLUMNS = ['price_value', 'price_max', 'currency', 'shipping_value', 'condition_normalized']
+
+PriceInfo = namedtuple('PriceInfo', ['value', 'max', 'currency'])
+
+CURRENCY_SYMBOLS = {
+    'US $': 'USD',
+    'C $': 'CAD',
+    'AU $': 'AUD',
+    'NZ $': 'NZD',
+    'HK $': 'HKD',
+    '$': 'USD',
+    '£': 'GBP',
+    '€': 'EUR',
+    '¥': 'JPY',
+}
+CURRENCY_CODES = ['USD', 'CAD', 'AUD', 'NZD', 'HKD', 'GBP', 'EUR', 'JPY', 'CHF', 'SEK', 'PLN', 'MXN']
+
+# Prefixed symbols are listed first so "C $" is not read as plain "$"
+_CURRENCY = re.compile(
+    r'\b(?P<code>' + '|'.join(CURRENCY_CODES) + r')\b'
+    r'|(?P<symbol>' + '|'.join(re.escape(symbol) for symbol in CURRENCY_SYMBOLS) + ')'
+)
+_NUMBER = re.compile(r'\d(?:[\d.,]*\d)?')
+_RANGE = re.compile(r'\s+(?:to|-|–)\s+', re.IGNORECASE)
+_FREE = re.compile(r'\bfree\b', re.IGNORECASE)
+
+# Checked in order and the first match wins, so the specific grades come before
+# the bare "Played" that falls back to Moderately Played
+CONDITIONS = [
+    ('Graded', r'\b(?:graded|psa|bgs|cgc|slabbed)\b'),
+    ('Damaged', r'\b(?:damaged|dmg)\b'),
+    ('Heavily Played', r'\b(?:heavily played|hp|poor|acceptable)\b'),
+    ('Lightly Played', r'\b(?:lightly played|slightly played|lp|sp|excellent|ex|very good)\b'),
+    ('Near Mint', r'\b(?:near mint|nm(?:/m|-m)?|mint|like new)\b'),
+    ('Moderately Played', r'\b(?:moderately played|mp|played|pl|good)\b'),
+    ('New', r'\b(?:brand new|new|sealed)\b'),
+    ('Used', r'\b(?:used|pre-?\s?owned)\b'),
+]
+_CONDITIONS = [(name, re.compile(pattern, re.IGNORECASE)) for name, pattern in CONDITIONS]
+
+
+def _to_number(text):
+    '''
+    Float value of a number using "," and "." as thousands or decimal separators
+    "1,234.56" and "1.234,56" -> 1234.56, "12,50" -> 12.5, "1,234" -> 1234.0
+    '''
+    if ',' in text and '.' in text:
+        if text.rfind(',') > text.rfind('.'):
+            text = text.replace('.', '').replace(',', '.')
+        else:
+            text = text.replace(',', '')
+    elif ',' in text:
+        head, _, tail = text.rpartition(',')
+        if len(tail) == 3:
+            text = text.replace(',', '')
+        else:
+            text = head.replace(',', '') + '.' + tail
+    elif text.count('.') > 1:
+        text = text.replace('.', '')
+    return float(text)
+
+
+def _first_number(text):
+    match = _NUMBER.search(text)
+    return _to_number(match.group()) if match else None
+
+
+def _currency(text):
+    match = _CURRENCY.search(text)
+    if not match:
+        return None
+    return match.group('code') or CURRENCY_SYMBOLS[match.group('symbol')]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_price_text(text):
+    parts = _RANGE.split(text, maxsplit=1)
+    value = _first_number(parts[0])
+    if value is None:
+        return PriceInfo(None, None, None)
+    
+    high = _first_number(parts[1]) if len(parts) > 1 else None
+    return PriceInfo(value, high if high is not None else value, _currency(text))
+
+
+def parse_price_info(price):
+    '''
+    Parse a scraped price into PriceInfo(value, max, currency)
+    "$1,234.56" -> (1234.56, 1234.56, 'USD')
+    "$10.00 to $20.00" -> (10.0, 20.0, 'USD'), "EUR 12,50" -> (12.5, 12.5, 'EUR')
+    value is None when no number is found; currency is None when none is given
+    '''
+    if price is None:
+        return PriceInfo(None, None, None)
+    if isinstance(price, (int, float)):
+        return PriceInfo(float(price), float(price), None)
+    return _parse_price_text(price)
+
+
+def parse_price(price):
+    '''
+    Numeric value of a scraped price string, the low end of a range
+    Returns None when no number is found
+    '''
+    return parse_price_info(price).value
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_shipping_text(text):
+    if _FREE.search(text):
+        return 0.0
+    return _first_number(text)
+
+
+def parse_shipping(shipping):
+    '''
+    Shipping cost as a number: "Free shipping" -> 0.0, "+$4.99 shipping" -> 4.99
+    Returns None when the cost is not given ("See listing")
+    '''
+    if shipping is None:
+        return None
+    if isinstance(shipping, (int, float)):
+        return float(shipping)
+    return _parse_shipping_text(shipping)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize_condition_text(text):
+    for name, pattern in _CONDITIONS:
+        if pattern.search(text):
+            return name
+    return None
+
+
+def normalize_condition(condition):
+    '''
+    Map free-form condition text to one of the CONDITIONS names
+    "NM/M" -> 'Near Mint', "Pre-Owned" -> 'Used'; None when nothing matches
+    '''
+    if not condition:
+        return None
+    return _normalize_condition_text(condition)
+
+
+def resolve_identity(listing):
+    '''
+    Card identity columns for a listing whose card_name is the raw title
+    card_name and set_name become the canonical card and set when the title names
+    a known card; the raw title is kept in title. Also returns the condition the
+    title states, for listings whose condition field does not say
+    '''
+    title = listing.get('card_name')
+    if not title:
+        return {}, None
+    
+    match = resolve_title(title)
+    identity = {
+        'title': title,
+        'card_name': match.card_name or title,
+        'set_name': match.set_name or listing.get('set_name'),
+        'foil': match.foil,
+    }
+    return identity, normalize_condition(match.remainder)
+
+
+def normalize_listing(listing):
+    '''
+    Normalized column values for one listing dict (MtgCard column names)
+    Values the listing already carries are kept, so this is safe to apply twice;
+    a listing with a title has been resolved already and keeps its identity
+    '''
+    price = parse_price_info(listing.get('price'))
+    normalized = {
+        'price_value': price.value,
+        'price_max': price.max,
+        'currency': price.currency,
+        'shipping_value': parse_shipping(listing.get('shipping')),
+        'condition_normalized': normalize_condition(listing.get('condition')),
+    }
+    if listing.get('title') is None:
+        identity, title_condition = resolve_identity(listing)
+        normalized.update(identity)
+        normalized['condition_normalized'] = normalized['condition_normalized'] or title_condition
+    
+    for name in NORMALIZED_COLUMNS:
+        if listing.get(name) is not None:
+            normalized[name] = listing.get(name)
+    return normalized
+
+
+def normalized(listing):
+    '''
+    Copy of a listing dict with the normalized columns filled in
+    '''
+    return dict(listing, **normalize_listing(listing))
+
+
+def cache_info():
+    '''
+    Hit/miss counters of the memo caches, keyed by parser
+    '''
+    return {
+        'price': _parse_price_text.cache_info(),
+        'shipping': _parse_shipping_text.cache_info(),
+        'condition': _normalize_condition_text.cache_info(),
+        'title': resolve_title.cache_info(),
+    }
+
+
+def backfill_listings(engine, batch_size=5000):
+    '''
+    Fill the normalized columns of stored listings that do not have them yet
+    Rows are read in id order in batches. Returns the number of rows updated
+    '''
+    from sqlalchemy import bindparam, select, update
+    from mtgscraper.pipelines import MtgCard
+    
+    query = (
+        select(MtgCard.id, MtgCard.price, MtgCard.shipping, MtgCard.condition)
+        .where(MtgCard.price_value.is_(None), MtgCard.price.is_not(None))
+        .order_by(MtgCard.id)
+        .limit(batch_size)
+    )
+    statement = (
+        update(MtgCard.__table__)
+        .where(MtgCard.__table__.c.id == bindparam('row_id'))
+        .values({name: bindparam(name) for name in NORMALIZED_COLUMNS})
+    )
+    
+    updated = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(query.where(MtgCard.id > last_id)).all()
+            if not rows:
+                return updated
+            conn.execute(statement, [
+                dict(normalize_listing(row._mapping), row_id=row.id) for row in rows
+            ])
+        updated += len(rows)
+        last_id = rows[-1].id
+
+
+def upgrade_listings_table(engine):
+    '''
+    Add the normalized columns and the indexes to a mtg_cards table created
+    before they existed and backfill the columns for the stored rows.
+    Returns the number of row updates
+    '''
+    from sqlalchemy import inspect, text
+    from mtgscraper.cards import backfill_card_identity
+    from mtgscraper.pipelines import MtgCard
+    
+    inspector = inspect(engine)
+    if not inspector.has_table(MtgCard.__tablename__):
+        return 0
+    
+    indexes = {index['name'] for index in inspector.get_indexes(MtgCard.__tablename__)}
+    for index in MtgCard.__table__.indexes:
+        if index.name not in indexes:
+            index.create(engine)
+    
+    existing = {column['name'] for column in inspector.get_columns(MtgCard.__tablename__)}
+    missing = [column for column in MtgCard.__table__.columns if column.name not in existing]
+    if not missing:
+        return 0
+    
+    with engine.begin() as conn:
+        for column in missing:
+            conn.execute(text(
+                f'ALTER TABLE {MtgCard.__tablename__} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}'
+            ))
+    
+    updated = backfill_listings(engine)
+    if 'title' not in existing:
+        resolved = backfill_card_identity(engine)
+        if resolved and inspector.has_table('mtg_card_summary'):
+            # The per-card totals were keyed by raw titles
+            from mtgscraper.stats import rebuild_summary
+            rebuild_summary(engine)
+        updated += resolved
+    return updated
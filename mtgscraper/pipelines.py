@@ -1,12 +1,25 @@
-from itemadapter import ItemAdapter
-from sqlalchemy import create_engine, Column, String, DateTime, Boolean, Integer
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from datetime import datetime
 import os
+import time
+
+from mtgscraper.items import listing_row
+from mtgscraper.normalize import normalize_listing
+from mtgscraper.seen import listing_id
+from mtgscraper.storage import database_name, get_engine, insert_listings
 
 Base = declarative_base()
 
+# Sent by MtgScraperPipeline after each checkpoint, once the items it has
+# processed so far are committed (see mtgscraper/jobs.py), with listings, the
+# row dicts committed by the checkpoint, ids included
+listings_committed = object()
+
+# Defaults for PIPELINE_CHECKPOINT_ITEMS and PIPELINE_CHECKPOINT_SECONDS
+CHECKPOINT_ITEMS = 500
+CHECKPOINT_SECONDS = 30
+
 
 class MtgCard(Base):
     '''
@@ -22,54 +35,220 @@ class MtgCard(Base):
     seller = Column(String)
     url = Column(String)
     source = Column(String)
-    timestamp = Column(String)
+    # Indexed for jumping to a date when paging through listings (mtgscraper.browse)
+    timestamp = Column(String, index=True)
     shipping = Column(String)
     buy_it_now = Column(Boolean)
+    
+    # Parsed from the text columns at ingest by mtgscraper.normalize
+    price_value = Column(Float)
+    price_max = Column(Float)
+    currency = Column(String)
+    shipping_value = Column(Float)
+    condition_normalized = Column(String)
+    
+    # Raw listing title; card_name and set_name are resolved from it by mtgscraper.cards
+    title = Column(String)
+    foil = Column(Boolean)
+    
+    # Lets the stats screen read a card's median price from the middle of the index
+    __table_args__ = (Index('ix_mtg_cards_card_name_price_value', 'card_name', 'price_value'),)
+
+
+class MtgCardSummary(Base):
+    '''
+    Per source and card listing totals, maintained incrementally by mtgscraper.stats
+    '''
+    __tablename__ = 'mtg_card_summary'
+    
+    source = Column(String, primary_key=True)
+    card_name = Column(String, primary_key=True)
+    listings = Column(Integer, nullable=False, default=0)
+    priced_listings = Column(Integer, nullable=False, default=0)
+    min_price = Column(Float)
+    max_price = Column(Float)
+    price_total = Column(Float)
+    newest_timestamp = Column(String)
+
+
+class MtgDailySummary(Base):
+    '''
+    Listings scraped per day and source, maintained incrementally by mtgscraper.stats
+    '''
+    __tablename__ = 'mtg_daily_summary'
+    
+    day = Column(String, primary_key=True)
+    source = Column(String, primary_key=True)
+    listings = Column(Integer, nullable=False, default=0)
+
+
+class MtgSummaryState(Base):
+    '''
+    Highest mtg_cards id already folded into the summary tables
+    '''
+    __tablename__ = 'mtg_summary_state'
+    
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+
+
+class MtgExportState(Base):
+    '''
+    High-water mark of an incremental export feed (see mtgscraper.export)
+    '''
+    __tablename__ = 'mtg_export_state'
+    
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    last_timestamp = Column(String)
+    exported_at = Column(DateTime)
+    snapshot_id = Column(Integer)
+    snapshot_at = Column(DateTime)
 
 
 class MtgScraperPipeline:
     '''
-    Pipeline to store scraped items in SQLite database
+    Pipeline to store scraped items in the database (SQLite unless DATABASE_URL says otherwise)
+    Items become plain row dicts, not ORM objects, and are written in
+    batches: with COPY through mtgscraper.postgres on PostgreSQL, as one
+    executemany per checkpoint elsewhere
+    Items are committed every PIPELINE_CHECKPOINT_ITEMS items or
+    PIPELINE_CHECKPOINT_SECONDS seconds, so a crawl that dies loses at most
+    the items since the last checkpoint
     '''
     
     def open_spider(self, spider):
         '''
         Initialize database connection when spider opens
         '''
-        db_path = os.path.join(os.getcwd(), 'mtg_cards.db')
-        self.engine = create_engine(f'sqlite:///{db_path}')
-        Base.metadata.create_all(self.engine)
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
-        spider.logger.info(f"Database initialized at: {db_path}")
+        url = spider.settings.get('DATABASE_URL')
+        self.engine = get_engine(url, create=True)
+        self.writer = None
+        if self.engine.dialect.name == 'postgresql':
+            from mtgscraper.postgres import COPY_BATCH_SIZE, ListingCopyWriter
+            self.writer = ListingCopyWriter(
+                self.engine, spider.settings.getint('POSTGRES_COPY_BATCH_SIZE', COPY_BATCH_SIZE)
+            )
+        # Rows since the last checkpoint
+        self.rows = []
+        self.checkpoint_items = spider.settings.getint('PIPELINE_CHECKPOINT_ITEMS', CHECKPOINT_ITEMS)
+        self.checkpoint_seconds = spider.settings.getfloat('PIPELINE_CHECKPOINT_SECONDS', CHECKPOINT_SECONDS)
+        self.uncommitted = 0
+        self.last_checkpoint = time.monotonic()
+        # Ids of the listings since the last checkpoint, for the seen-listings
+        # set of an incremental spider, which opens and closes it
+        self.seen = getattr(spider, 'seen', None)
+        self.uncommitted_ids = []
+        spider.logger.info(f"Database initialized at: {database_name(url)}")
+    
+    def checkpoint(self, spider):
+        '''
+        Commit the items processed so far and announce it with listings_committed
+        '''
+        rows, self.rows = self.rows, []
+        if self.writer:
+            self.writer.flush()
+        elif rows:
+            with self.engine.begin() as connection:
+                insert_listings(connection, rows)
+        if self.seen is not None and self.uncommitted_ids:
+            self.seen.add(self.uncommitted_ids)
+        self.uncommitted_ids = []
+        self.uncommitted = 0
+        self.last_checkpoint = time.monotonic()
+        spider.crawler.signals.send_catch_log(signal=listings_committed, spider=spider, listings=rows)
     
     def close_spider(self, spider):
         '''
         Close database connection when spider closes
         '''
-        self.session.commit()
-        self.session.close()
+        self.checkpoint(spider)
+        if self.writer:
+            self.writer.close()
+        
+        if spider.settings.getbool('STATS_SUMMARY_ENABLED', True):
+            from mtgscraper.stats import refresh_summary
+            folded = refresh_summary(self.engine)
+            spider.logger.info(f"Stats summary updated with {folded} new listings")
+        
         spider.logger.info("Database connection closed")
     
     def process_item(self, item, spider):
         '''
         Process and store each scraped item
         '''
-        adapter = ItemAdapter(item)
+        listing = listing_row(item)
+        listing.update(normalize_listing(listing))
         
-        card = MtgCard(
-            card_name=adapter.get('card_name'),
-            set_name=adapter.get('set_name'),
-            price=adapter.get('price'),
-            condition=adapter.get('condition'),
-            seller=adapter.get('seller'),
-            url=adapter.get('url'),
-            source=adapter.get('source'),
-            timestamp=adapter.get('timestamp'),
-            shipping=adapter.get('shipping'),
-            buy_it_now=adapter.get('buy_it_now', False)
-        )
+        self.rows.append(listing)
+        if self.writer:
+            self.writer.write(listing)
+        
+        self.uncommitted += 1
+        if self.seen is not None:
+            self.uncommitted_ids.append(listing_id(listing['url']))
+        if (self.uncommitted >= self.checkpoint_items
+                or time.monotonic() - self.last_checkpoint >= self.checkpoint_seconds):
+            self.checkpoint(spider)
+        
+        return item
+
+
+class ParquetLakePipeline:
+    '''
+    Pipeline that also appends listings to the Hive-partitioned Parquet lake
+    Enabled with PARQUET_LAKE_ENABLED; see mtgscraper/lake.py
+    Listings are written as MtgScraperPipeline commits them, so every lake row
+    carries the id of its database row
+    '''
+    
+    def __init__(self, options):
+        self.options = options
+        self.writer = None
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        from scrapy import signals
+        from scrapy.exceptions import NotConfigured
+        from mtgscraper.lake import lake_options
         
-        self.session.add(card)
+        options = lake_options(crawler.settings)
+        if not options['enabled']:
+            raise NotConfigured('PARQUET_LAKE_ENABLED is off')
+        pipeline = cls(options)
+        crawler.signals.connect(pipeline.listings_committed, signal=listings_committed)
+        # After every pipeline's close_spider, so the last checkpoint is written
+        crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+    
+    def open_spider(self, spider):
+        '''
+        Open the lake writer when spider opens
+        '''
+        from mtgscraper.lake import LakeWriter
         
+        self.writer = LakeWriter(
+            self.options['root'],
+            row_group_size=self.options['row_group_size'],
+            max_file_mb=self.options['max_file_mb']
+        )
+        spider.logger.info(f"Parquet lake at: {os.path.abspath(self.options['root'])}")
+    
+    def spider_closed(self, spider):
+        '''
+        Flush buffered row groups and finalize open files when spider closes
+        '''
+        self.writer.close()
+        spider.logger.info(f"Parquet lake: {self.writer.rows_written} rows in {self.writer.files_written} files")
+    
+    def listings_committed(self, listings=()):
+        '''
+        Buffer the committed listings for their source/date partitions
+        '''
+        self.writer.write_many(listings)
+    
+    def process_item(self, item, spider):
+        '''
+        Items reach the lake through listings_committed
+        '''
         return item
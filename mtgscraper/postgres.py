@@ -0,0 +1,207 @@
+'''
+PostgreSQL storage for listings
+With DATABASE_URL pointing at PostgreSQL (see mtgscraper/storage.py), mtg_cards
+is created range-partitioned by the month of its scrape timestamp, so date
+filters only read the months they cover and old months can be detached or
+dropped whole. Listings are written with COPY FROM STDIN a batch at a time
+instead of one INSERT per row. Several crawler processes can feed the same
+database: each builds its batches over its own connection, and a month's
+partition is created once by whichever writer needs it first. Listings
+without a usable timestamp go to the default partition.
+
+A batch takes its ids, creates its partitions and is copied under one
+advisory lock, held until it commits. Batches therefore commit in id order,
+and readers that only fold in rows above the last id they saw (the stats
+summary, export feeds, the seen-listings set and the incremental dbt
+models) never pass over a batch that commits late.
+
+Requires psycopg2 (pip install psycopg2-binary) or psycopg 3.
+'''
+
+import io
+import re
+from datetime import date, timedelta
+
+COPY_BATCH_SIZE = 5000
+
+# pg_advisory_xact_lock key serializing partition creation and listing writes across processes
+LISTINGS_LOCK_KEY = 0x6d7467
+
+_MONTH = re.compile(r'(\d{4})-(0[1-9]|1[0-2])')
+_SPECIAL = re.compile(r'[\\\t\n\r]')
+_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+# Month partitions this process has created or seen, by database URL
+_partitions = {}
+
+
+def partition_name(month):
+    '''
+    Partition table for a 'YYYY-MM' month: '2026-01' -> 'mtg_cards_2026_01'
+    '''
+    return f'mtg_cards_{month.replace("-", "_")}'
+
+
+def _month(timestamp):
+    match = _MONTH.match(timestamp or '')
+    return match.group(0) if match else None
+
+
+def create_listings_table(engine):
+    '''
+    Create mtg_cards as a partitioned table if it does not exist, with the
+    columns of the MtgCard model and a default partition
+    The primary key of a partitioned table has to include the partition key,
+    so id gets a plain index instead; its sequence keeps it unique
+    '''
+    from sqlalchemy import inspect, text
+    from mtgscraper.pipelines import MtgCard
+    
+    table = MtgCard.__tablename__
+    if inspect(engine).has_table(table):
+        return False
+    
+    quote = engine.dialect.identifier_preparer.quote
+    columns = []
+    for column in MtgCard.__table__.columns:
+        if column.name == 'id':
+            columns.append('id BIGSERIAL NOT NULL')
+        elif column.name == 'timestamp':
+            # Byte order, so ISO timestamps fall between the month bounds in any locale
+            columns.append(f'{quote(column.name)} VARCHAR COLLATE "C"')
+        else:
+            columns.append(f'{quote(column.name)} {column.type.compile(dialect=engine.dialect)}')
+    
+    with engine.begin() as conn:
+        conn.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': LISTINGS_LOCK_KEY})
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS {table} ({", ".join(columns)}) PARTITION BY RANGE ({quote("timestamp")})'
+        ))
+        conn.execute(text(f'CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT'))
+        conn.execute(text(f'CREATE INDEX IF NOT EXISTS {table}_id_idx ON {table} (id)'))
+    return True
+
+
+def ensure_partitions(connection, months):
+    '''
+    Create the partitions for the 'YYYY-MM' months that do not have one yet, in
+    connection's transaction and under the listings lock, which it then holds
+    Rows of such a month already in the default partition, written by a plain
+    INSERT, are moved into the new partition
+    '''
+    from sqlalchemy import text
+    
+    known = _partitions.setdefault(str(connection.engine.url), set())
+    missing = set(months) - known
+    if not missing:
+        return
+    
+    connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': LISTINGS_LOCK_KEY})
+    existing = set(connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'mtg_cards'::regclass"
+    )).scalars())
+    for month in sorted(missing):
+        name = partition_name(month)
+        if name in existing:
+            # Committed, or created earlier in this transaction
+            known.add(month)
+            continue
+        start = date(int(month[:4]), int(month[5:]), 1)
+        end = f'{(start + timedelta(days=32)).replace(day=1):%Y-%m}'
+        connection.execute(text(f'CREATE TABLE {name} (LIKE mtg_cards)'))
+        connection.execute(text(
+            f'WITH moved AS (DELETE FROM mtg_cards_default WHERE "timestamp" >= :start AND "timestamp" < :end RETURNING *) '
+            f'INSERT INTO {name} SELECT * FROM moved'
+        ), {'start': month, 'end': end})
+        connection.execute(text(f"ALTER TABLE mtg_cards ATTACH PARTITION {name} FOR VALUES FROM ('{month}') TO ('{end}')"))
+
+
+def _copy_line(row, columns):
+    '''
+    One row in COPY text format; values are only escaped when they need it
+    '''
+    values = []
+    for name in columns:
+        value = row.get(name)
+        if value is None:
+            values.append('\\N')
+        elif value is True or value is False:
+            values.append('t' if value else 'f')
+        else:
+            value = str(value)
+            if _SPECIAL.search(value):
+                value = value.translate(_ESCAPES)
+            values.append(value)
+    return '\t'.join(values)
+
+
+def copy_listings(connection, rows):
+    '''
+    Write listing dicts (MtgCard column names) to mtg_cards with COPY FROM STDIN
+    in connection's transaction. Returns the number of rows written
+    The ids are taken from the table's sequence under the listings lock, which
+    the transaction holds until it ends, and set on the dicts
+    '''
+    from sqlalchemy import text
+    from mtgscraper.pipelines import MtgCard
+    
+    if not rows:
+        return 0
+    
+    # Everything but the ids, before the lock
+    columns = [column.name for column in MtgCard.__table__.columns if column.name != 'id']
+    lines = [_copy_line(row, columns) for row in rows]
+    
+    connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': LISTINGS_LOCK_KEY})
+    ensure_partitions(connection, {_month(row.get('timestamp')) for row in rows} - {None})
+    ids = connection.execute(
+        text(f"SELECT nextval(pg_get_serial_sequence('{MtgCard.__tablename__}', 'id')) FROM generate_series(1, :n)"),
+        {'n': len(rows)}
+    ).scalars().all()
+    for row, listing_id in zip(rows, ids):
+        row['id'] = listing_id
+    
+    columns.insert(0, 'id')
+    buffer = io.StringIO(''.join(f'{listing_id}\t{line}\n' for listing_id, line in zip(ids, lines)))
+    
+    quote = connection.dialect.identifier_preparer.quote
+    sql = f'COPY {MtgCard.__tablename__} ({", ".join(quote(name) for name in columns)}) FROM STDIN'
+    cursor = connection.connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):
+            cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+class ListingCopyWriter:
+    '''
+    Buffers listings and COPYs them to PostgreSQL batch_size at a time, each
+    batch in its own transaction
+    '''
+    
+    def __init__(self, engine, batch_size=COPY_BATCH_SIZE):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.batch = []
+        self.rows_written = 0
+    
+    def write(self, listing):
+        self.batch.append(listing)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        if not self.batch:
+            return
+        with self.engine.begin() as conn:
+            self.rows_written += copy_listings(conn, self.batch)
+        self.batch = []
+    
+    def close(self):
+        self.flush()
@@ -0,0 +1,409 @@
+'''
+In-process crawl runner
+Keeps one worker process with a running Twisted reactor alive across crawls,
+so repeated scrapes skip interpreter and Scrapy bootstrap and report exact stats.
+run_fanout() spreads a watchlist of cards over several such workers, one per
+core, each with its own share of the proxies, and merges their stats.
+'''
+
+import atexit
+import glob
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+INGEST_MODES = ['shared', 'shards']
+
+
+class CrawlError(Exception):
+    '''
+    Raised when the crawl worker fails to start or a crawl fails
+    '''
+
+
+class CrawlWorker:
+    '''
+    Parent-side handle for a long-lived crawl worker process
+    Crawls are sent over a pipe and run one at a time with CrawlerRunner
+    '''
+    
+    def __init__(self, project_dir=None):
+        self.project_dir = project_dir or os.getcwd()
+        self._process = None
+        self._conn = None
+        self._lock = threading.Lock()
+    
+    @property
+    def alive(self):
+        return self._process is not None and self._process.is_alive()
+    
+    def start(self):
+        '''
+        Spawn the worker process if it is not already running
+        '''
+        if self.alive:
+            return
+        
+        # spawn keeps the worker independent of whatever the parent has imported
+        context = multiprocessing.get_context('spawn')
+        parent_conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_worker_main,
+            args=(child_conn, self.project_dir),
+            name='mtgscraper-crawl-worker',
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        
+        # Wait for the worker to import Scrapy and start its reactor
+        reply = self._receive()
+        if 'error' in reply:
+            self._reset()
+            if reply.get('import_error'):
+                raise ImportError(reply['error'])
+            raise CrawlError(reply['error'])
+    
+    def crawl(self, spider_name='ebay', settings=None, **spider_kwargs):
+        '''
+        Run one crawl in the worker and return its summarized stats
+        '''
+        with self._lock:
+            self.start()
+            self._conn.send({
+                'spider': spider_name,
+                'settings': settings or {},
+                'kwargs': spider_kwargs,
+            })
+            reply = self._receive()
+        
+        if 'error' in reply:
+            raise CrawlError(reply['error'])
+        return summarize_stats(reply['stats'])
+    
+    def close(self):
+        '''
+        Stop the worker reactor and wait for the process to exit
+        '''
+        with self._lock:
+            if self.alive:
+                try:
+                    self._conn.send(None)
+                    self._process.join(timeout=10)
+                except (OSError, EOFError):
+                    pass
+                if self._process.is_alive():
+                    self._process.terminate()
+            self._reset()
+    
+    def _receive(self):
+        try:
+            return self._conn.recv()
+        except (EOFError, OSError):
+            self._reset()
+            raise CrawlError('Crawl worker exited unexpectedly')
+    
+    def _reset(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._process = None
+
+
+_worker = None
+
+
+def get_worker():
+    '''
+    Return the process-wide crawl worker, creating it on first use
+    '''
+    global _worker
+    if _worker is None:
+        _worker = CrawlWorker()
+        atexit.register(_worker.close)
+    return _worker
+
+
+def run_crawl(card_name, max_pages=3, settings=None, spider_name='ebay', incremental=False):
+    '''
+    Crawl one card search in the shared worker and return its stats
+    incremental only fetches listings newer than the stored ones
+    '''
+    return get_worker().crawl(
+        spider_name,
+        settings=settings,
+        **spider_arguments(card_name, max_pages, incremental)
+    )
+
+
+def spider_arguments(card_name, max_pages, incremental=False):
+    '''
+    Spider keyword arguments for one card search
+    '''
+    arguments = {'card_name': card_name, 'max_pages': max_pages}
+    if incremental:
+        arguments['incremental'] = True
+    return arguments
+
+
+def load_watchlist(path):
+    '''
+    Card names from a watchlist file, one per line
+    Blank lines and lines starting with # are skipped, repeats are dropped
+    '''
+    with open(path, encoding='utf-8') as f:
+        cards = [line.strip() for line in f]
+    return list(dict.fromkeys(card for card in cards if card and not card.startswith('#')))
+
+
+def shard(items, count):
+    '''
+    Split items round-robin into count lists: shard('abcde', 2) -> ['ace', 'bd']
+    '''
+    return [list(items[index::count]) for index in range(count)]
+
+
+def merge_stats(results, elapsed_seconds):
+    '''
+    Combine summarized crawl stats into one summary over elapsed_seconds of wall time
+    Counters in the raw stats are added up; elapsed_crawl_seconds is the time
+    spent crawling summed over workers
+    '''
+    merged = {'items': 0, 'pages': 0, 'requests': 0, 'errors': 0}
+    stats = {}
+    for result in results:
+        for key in merged:
+            merged[key] += result[key]
+        for key, value in result['stats'].items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                stats[key] = stats.get(key, 0) + value
+    
+    starts = [result['start_time'] for result in results if result['start_time']]
+    finishes = [result['finish_time'] for result in results if result['finish_time']]
+    merged.update(
+        finish_reason='finished',
+        start_time=min(starts) if starts else None,
+        finish_time=max(finishes) if finishes else None,
+        elapsed_seconds=elapsed_seconds,
+        elapsed_crawl_seconds=sum(result['elapsed_seconds'] for result in results),
+        stats=stats,
+    )
+    return merged
+
+
+def run_fanout(cards, workers=None, max_pages=3, settings=None, proxies=None,
+               ingest='shared', shard_dir='shards', spider_name='ebay', job=None, incremental=False):
+    '''
+    Crawl every card in cards with workers crawl processes at once (default:
+    one per CPU) and return their merged stats
+    Each worker crawls its shard of the cards one after another and rotates
+    through its own slice of proxies. With ingest='shared' all workers write
+    to the database, switched to WAL mode when it is SQLite; with 'shards'
+    each writes its own SQLite file in shard_dir, merged into the database
+    once every crawl is done. Failed crawls are counted as errors and listed
+    under 'failed'; the other cards are still crawled
+    With job, the path of a crawl job file (see mtgscraper.jobs), cards the
+    job has finished are skipped and the others resume where they stopped.
+    incremental crawls only the listings newer than the stored ones
+    '''
+    from mtgscraper import storage
+    
+    if ingest not in INGEST_MODES:
+        raise ValueError(f'ingest must be one of {", ".join(INGEST_MODES)}')
+    cards = list(cards)
+    settings = dict(settings or {})
+    skipped = 0
+    if job:
+        from mtgscraper.frontier import frontier_key
+        from mtgscraper.jobs import CrawlJob, job_settings
+        
+        key = frontier_key(crawl_settings(settings), spider_name)
+        state = CrawlJob(job)
+        try:
+            state.add_cards(cards)
+            finished = state.finished_cards()
+            # Before any worker pops a request the stopped run left queued
+            queued, resuming = state.queued_cards(key), state.has_fingerprints(key)
+        finally:
+            state.close()
+        skipped = sum(1 for card in cards if card in finished)
+        cards = [card for card in cards if card not in finished]
+        settings.update(job_settings(job, queued, resuming))
+    workers = max(1, min(workers or os.cpu_count() or 1, len(cards)))
+    proxy_shards = shard(list(proxies), workers) if proxies else [None] * workers
+    
+    storage.get_engine(create=True)
+    if ingest == 'shared':
+        storage.use_wal()
+        urls = [storage.database_url()] * workers
+    else:
+        os.makedirs(shard_dir, exist_ok=True)
+        urls = [f'sqlite:///{os.path.abspath(os.path.join(shard_dir, f"worker-{index}.db"))}' for index in range(workers)]
+        # Summaries are built once, in the database the shards are merged into
+        settings['STATS_SUMMARY_ENABLED'] = False
+        settings['SEEN_LISTINGS_DATABASE_URL'] = storage.database_url()
+    if incremental:
+        from mtgscraper.seen import seen_from_settings
+        
+        # Brought up to date once here, not by every worker at the same time
+        seen = seen_from_settings(crawl_settings(settings), storage.get_engine())
+        if seen is not None:
+            seen.close()
+    
+    def crawl_shard(index, shard_cards):
+        worker = CrawlWorker()
+        worker_settings = dict(settings, DATABASE_URL=urls[index])
+        if proxy_shards[index]:
+            worker_settings['PROXIES'] = proxy_shards[index]
+        results, failed = [], []
+        try:
+            for card in shard_cards:
+                try:
+                    results.append(worker.crawl(
+                        spider_name, settings=worker_settings, **spider_arguments(card, max_pages, incremental)
+                    ))
+                except CrawlError as e:
+                    failed.append({'card': card, 'error': str(e)})
+        finally:
+            worker.close()
+        return {'worker': index, 'cards': len(shard_cards), 'results': results, 'failed': failed}
+    
+    started = datetime.now()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='crawl-fanout') as executor:
+        outcomes = list(executor.map(crawl_shard, range(workers), shard(cards, workers)))
+    elapsed = (datetime.now() - started).total_seconds()
+    
+    merged = merge_stats([result for outcome in outcomes for result in outcome['results']], elapsed)
+    merged['failed'] = [failure for outcome in outcomes for failure in outcome['failed']]
+    merged['errors'] += len(merged['failed'])
+    merged['cards'] = len(cards)
+    merged['skipped'] = skipped
+    merged['workers'] = [
+        dict(
+            {key: sum(result[key] for result in outcome['results']) for key in ('items', 'pages', 'errors')},
+            worker=outcome['worker'], cards=outcome['cards'], failed=len(outcome['failed'])
+        )
+        for outcome in outcomes
+    ]
+    
+    if ingest == 'shards':
+        # Shards left by an interrupted run, e.g. with more workers, are merged too
+        leftover = glob.glob(os.path.join(os.path.abspath(shard_dir), 'worker-*.db'))
+        merged['merged_rows'] = storage.merge_shards(urls + [f'sqlite:///{path}' for path in sorted(leftover)])
+        from mtgscraper.stats import refresh_summary
+        refresh_summary(storage.get_engine())
+    if job:
+        state = CrawlJob(job)
+        try:
+            merged['job_progress'] = state.progress()
+        finally:
+            state.close()
+    return merged
+
+
+def crawl_settings(settings=None):
+    '''
+    Project settings with settings, a dict, on top, as a crawl sees them
+    '''
+    from scrapy.utils.project import get_project_settings
+    
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'mtgscraper.settings')
+    merged = get_project_settings()
+    merged.setdict(settings or {}, priority='cmdline')
+    return merged
+
+
+def summarize_stats(stats):
+    '''
+    Reduce raw Scrapy stats to the counts the CLI reports
+    The full stats dict is kept under 'stats'
+    '''
+    errors = stats.get('log_count/ERROR', 0)
+    errors += sum(v for k, v in stats.items() if k.startswith('spider_exceptions/'))
+    
+    return {
+        'items': stats.get('item_scraped_count', 0),
+        'pages': stats.get('response_received_count', 0),
+        'requests': stats.get('downloader/request_count', 0),
+        'errors': errors,
+        'finish_reason': stats.get('finish_reason'),
+        'start_time': stats.get('start_time'),
+        'finish_time': stats.get('finish_time'),
+        'elapsed_seconds': stats.get('elapsed_time_seconds', 0.0),
+        'stats': stats,
+    }
+
+
+def _serializable(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _worker_main(conn, project_dir):
+    '''
+    Worker process entry point: boot Scrapy once, then serve crawl jobs
+    '''
+    try:
+        os.chdir(project_dir)
+        os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'mtgscraper.settings')
+        
+        from scrapy.utils.project import get_project_settings
+        from scrapy.utils.reactor import install_reactor
+        
+        base_settings = get_project_settings()
+        install_reactor(base_settings.get('TWISTED_REACTOR'))
+        
+        from twisted.internet import reactor
+        from scrapy.crawler import CrawlerRunner
+        from scrapy.utils.log import configure_logging
+    except ImportError as e:
+        conn.send({'error': str(e), 'import_error': True})
+        conn.close()
+        return
+    except Exception as e:
+        conn.send({'error': f'Could not start Scrapy: {e}'})
+        conn.close()
+        return
+    
+    def run_job(job):
+        try:
+            settings = base_settings.copy()
+            settings.update(job['settings'], priority='cmdline')
+            configure_logging(settings)
+            
+            runner = CrawlerRunner(settings)
+            crawler = runner.create_crawler(job['spider'])
+            deferred = runner.crawl(crawler, **job['kwargs'])
+        except Exception as e:
+            conn.send({'error': str(e)})
+            return
+        
+        def on_done(_):
+            stats = {k: _serializable(v) for k, v in crawler.stats.get_stats().items()}
+            conn.send({'stats': stats})
+        
+        def on_error(failure):
+            conn.send({'error': failure.getErrorMessage()})
+        
+        deferred.addCallbacks(on_done, on_error)
+    
+    def serve():
+        # Blocking pipe reads happen here; crawls are handed to the reactor thread
+        while True:
+            try:
+                job = conn.recv()
+            except (EOFError, OSError):
+                job = None
+            
+            if job is None:
+                reactor.callFromThread(reactor.stop)
+                return
+            reactor.callFromThread(run_job, job)
+    
+    conn.send({'ready': True})
+    threading.Thread(target=serve, name='crawl-job-reader', daemon=True).start()
+    reactor.run(installSignalHandlers=False)
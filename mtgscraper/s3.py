@@ -0,0 +1,327 @@
+'''
+Streaming S3 uploads
+MultipartUpload is a writable file object that sends parts to S3 in parallel as
+they fill, so exports can be piped to a bucket without a local file. Objects are
+tagged with the SHA-256 of their bytes. Files and streamed exports are hashed
+before anything is sent, and skipped when the object already has that hash.
+Works against AWS, MinIO or moto; pass endpoint_url or set AWS_ENDPOINT_URL.
+'''
+
+import hashlib
+import io
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+DEFAULT_WORKERS = 4
+HASH_TAG = 'sha256'
+
+
+def parse_s3_url(s3_url):
+    '''
+    Split 's3://bucket/prefix' or 'bucket/prefix' into (bucket, prefix)
+    '''
+    if s3_url.startswith('s3://'):
+        s3_url = s3_url[len('s3://'):]
+    
+    parts = s3_url.split('/')
+    return parts[0], '/'.join(parts[1:]).strip('/')
+
+
+def join_key(prefix, name):
+    return f'{prefix}/{name}' if prefix else name
+
+
+def create_client(endpoint_url=None):
+    '''
+    boto3 S3 client; endpoint_url points it at MinIO or another S3 stand-in
+    '''
+    import boto3
+    
+    return boto3.client('s3', endpoint_url=endpoint_url or os.environ.get('AWS_ENDPOINT_URL') or None)
+
+
+def remote_hash(client, bucket, key):
+    '''
+    SHA-256 tag of an existing object, or None if it is missing or untagged
+    '''
+    from botocore.exceptions import ClientError
+    
+    try:
+        tags = client.get_object_tagging(Bucket=bucket, Key=key)['TagSet']
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404', 'NotFound'):
+            return None
+        raise
+    return next((tag['Value'] for tag in tags if tag['Key'] == HASH_TAG), None)
+
+
+class MultipartUpload(io.RawIOBase):
+    '''
+    Writable binary stream that uploads to s3://bucket/key
+    Data is cut into part_size parts and up to `workers` parts are in flight at
+    once, so memory stays near part_size * (workers + 1). Output smaller than one
+    part is sent with a single PUT, after checking the content hash so identical
+    objects are not re-uploaded. Larger output is always uploaded: its parts are
+    sent before the hash is known, so callers that want to skip unchanged data
+    hash it first (see upload_file and stream_export).
+    Call close() to finish the upload; abort() discards it.
+    '''
+    
+    def __init__(self, client, bucket, key, part_size=DEFAULT_PART_SIZE, workers=DEFAULT_WORKERS,
+                 content_type='application/octet-stream', skip_unchanged=True):
+        super().__init__()
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f'S3 parts must be at least {MIN_PART_SIZE // (1024 * 1024)} MB')
+        
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.workers = max(1, workers)
+        self.content_type = content_type
+        self.skip_unchanged = skip_unchanged
+        
+        self.bytes_written = 0
+        self.parts = 0
+        self.skipped = False
+        self.sha256 = None
+        
+        self._buffer = bytearray()
+        self._hash = hashlib.sha256()
+        self._upload_id = None
+        self._executor = None
+        self._pending = {}
+        self._etags = {}
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        if self.closed:
+            raise ValueError('write to closed upload')
+        
+        data = memoryview(data).cast('B')
+        self._buffer += data
+        self._hash.update(data)
+        self.bytes_written += len(data)
+        
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._submit(part)
+        return len(data)
+    
+    def _submit(self, body):
+        if self._upload_id is None:
+            self._upload_id = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type
+            )['UploadId']
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='s3-part')
+        
+        # Bound the parts held in memory before queueing another one
+        while len(self._pending) >= self.workers:
+            done, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+            self._collect(done)
+        
+        self.parts += 1
+        future = self._executor.submit(
+            self.client.upload_part,
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+            PartNumber=self.parts, Body=body
+        )
+        self._pending[future] = self.parts
+    
+    def _collect(self, futures):
+        for future in futures:
+            part_number = self._pending.pop(future)
+            self._etags[part_number] = future.result()['ETag']
+    
+    def close(self):
+        '''
+        Flush the last part and complete the upload
+        '''
+        if self.closed:
+            return
+        try:
+            self._finish()
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            super().close()
+    
+    def _finish(self):
+        self.sha256 = self._hash.hexdigest()
+        
+        if self._upload_id is None:
+            if self.skip_unchanged and remote_hash(self.client, self.bucket, self.key) == self.sha256:
+                self.skipped = True
+                return
+            self.parts = 1
+            self.client.put_object(
+                Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer),
+                ContentType=self.content_type, Tagging=f'{HASH_TAG}={self.sha256}'
+            )
+            return
+        
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        self._collect(list(self._pending))
+        self._executor.shutdown()
+        
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+            MultipartUpload={'Parts': [
+                {'PartNumber': number, 'ETag': etag} for number, etag in sorted(self._etags.items())
+            ]}
+        )
+        self.client.put_object_tagging(
+            Bucket=self.bucket, Key=self.key,
+            Tagging={'TagSet': [{'Key': HASH_TAG, 'Value': self.sha256}]}
+        )
+    
+    def abort(self):
+        '''
+        Discard the upload and any parts already sent
+        '''
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+        self._abort_multipart()
+        self._buffer.clear()
+        if not self.closed:
+            super().close()
+    
+    def _abort_multipart(self):
+        if self._upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+            self._upload_id = None
+    
+    def result(self):
+        return {
+            'url': f's3://{self.bucket}/{self.key}',
+            'bytes': self.bytes_written,
+            'parts': self.parts,
+            'sha256': self.sha256,
+            'skipped': self.skipped,
+        }
+
+
+class _HashSink(io.RawIOBase):
+    '''
+    Writable stream that only feeds a SHA-256 digest
+    '''
+    
+    def __init__(self):
+        super().__init__()
+        self.digest = hashlib.sha256()
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self.digest.update(data)
+        return len(data)
+
+
+def _file_sha256(path, compression=None):
+    from mtgscraper.export import compressed_writer
+    
+    hasher = _HashSink()
+    with open(path, 'rb') as source, compressed_writer(hasher, compression) as sink:
+        for chunk in iter(lambda: source.read(1024 * 1024), b''):
+            sink.write(chunk)
+    return hasher.digest.hexdigest()
+
+
+def upload_file(path, s3_url, compression=None, part_size=DEFAULT_PART_SIZE, workers=DEFAULT_WORKERS,
+                skip_unchanged=True, client=None):
+    '''
+    Upload a local file under the bucket/prefix of s3_url, optionally compressing it
+    The file is hashed first, so unchanged files are skipped without sending any data
+    Returns the upload summary dict
+    '''
+    from mtgscraper.export import COMPRESSIONS, compressed_writer
+    
+    client = client or create_client()
+    bucket, prefix = parse_s3_url(s3_url)
+    key = join_key(prefix, os.path.basename(path) + (COMPRESSIONS[compression] if compression else ''))
+    
+    if skip_unchanged:
+        sha256 = _file_sha256(path, compression)
+        if remote_hash(client, bucket, key) == sha256:
+            return {'url': f's3://{bucket}/{key}', 'bytes': 0, 'parts': 0, 'sha256': sha256, 'skipped': True}
+    
+    upload = MultipartUpload(client, bucket, key, part_size=part_size, workers=workers, skip_unchanged=False)
+    try:
+        with open(path, 'rb') as source, compressed_writer(upload, compression) as sink:
+            for chunk in iter(lambda: source.read(1024 * 1024), b''):
+                sink.write(chunk)
+    except BaseException:
+        upload.abort()
+        raise
+    upload.close()
+    return upload.result()
+
+
+def export_name(first_id, last_id, fmt='csv.gz', since=None, card=None):
+    '''
+    Object name of an export of ids first_id..last_id with the given filters
+    The same rows and filters always map to the same name, so a re-run finds
+    the object it uploaded last time and can skip it
+    '''
+    from mtgscraper.export import FORMATS
+    
+    parts = ['mtg_cards']
+    if since:
+        since = since if isinstance(since, str) else since.isoformat()
+        parts.append('since_' + re.sub(r'[^0-9]', '', since)[:8])
+    if card:
+        parts.append(re.sub(r'[^a-z0-9]+', '-', card.lower()).strip('-') or 'card')
+    parts.append(f'{first_id}-{last_id}' if last_id is not None else 'empty')
+    return '_'.join(parts) + FORMATS[fmt]
+
+
+def stream_export(engine, s3_url, name=None, fmt='csv.gz', since=None, card=None,
+                  part_size=DEFAULT_PART_SIZE, workers=DEFAULT_WORKERS, skip_unchanged=True,
+                  batch_size=None, client=None):
+    '''
+    Export listings straight into an S3 object with no intermediate file
+    The export is pinned to the ids present when it starts; name defaults to
+    export_name() of that id range under the s3_url prefix. With skip_unchanged
+    the rows are serialized once to hash them, and only serialized again and
+    uploaded when the object does not already have that hash
+    Returns the upload summary dict with the exported row count
+    '''
+    from sqlalchemy import func, select
+    from mtgscraper.export import DEFAULT_BATCH_SIZE, build_query, iter_batches, write_stream
+    
+    client = client or create_client()
+    bucket, prefix = parse_s3_url(s3_url)
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    
+    ids = build_query(since=since, card=card, columns=['id']).order_by(None).subquery()
+    with engine.connect() as conn:
+        first_id, last_id = conn.execute(select(func.min(ids.c.id), func.max(ids.c.id))).one()
+    key = join_key(prefix, name or export_name(first_id, last_id, fmt, since, card))
+    # Rows inserted while exporting are left out, so both passes see the same rows
+    query = build_query(since=since, card=card, up_to_id=last_id if last_id is not None else 0)
+    
+    if skip_unchanged:
+        hasher = _HashSink()
+        rows = write_stream(iter_batches(engine, query, batch_size=batch_size), hasher, fmt)
+        sha256 = hasher.digest.hexdigest()
+        if remote_hash(client, bucket, key) == sha256:
+            return {'url': f's3://{bucket}/{key}', 'bytes': 0, 'parts': 0, 'sha256': sha256, 'skipped': True, 'rows': rows}
+    
+    upload = MultipartUpload(client, bucket, key, part_size=part_size, workers=workers, skip_unchanged=False)
+    try:
+        rows = write_stream(iter_batches(engine, query, batch_size=batch_size), upload, fmt)
+    except BaseException:
+        upload.abort()
+        raise
+    upload.close()
+    return dict(upload.result(), rows=rows)
@@ -0,0 +1,234 @@
+'''
+Full-text search over listings with SQLite FTS5
+mtg_cards_fts indexes card_name, set_name and title of mtg_cards as an
+external-content table: it stores only the index, and triggers keep it in sync
+on every insert, update and delete, whichever code path writes the listing.
+mtg_card_names keeps the distinct card names with their own small index, for
+filtering the per-card analytics tables. Queries match whole words plus a prefix
+of the last one ("black lot" finds "Black Lotus") and rank with bm25, so a card
+filter is an index lookup instead of a LIKE '%...%' scan of every row.
+Databases whose SQLite lacks FTS5 fall back to LIKE.
+'''
+
+import re
+
+FTS_TABLE = 'mtg_cards_fts'
+FTS_COLUMNS = ['card_name', 'set_name', 'title']
+NAMES_TABLE = 'mtg_card_names'
+NAMES_FTS_TABLE = 'mtg_card_names_fts'
+
+# bm25 column weights: a hit in the resolved card name counts most
+RANK_WEIGHTS = (10.0, 2.0, 1.0)
+
+# Escape character of the LIKE fallbacks, so % and _ in a filter match themselves
+LIKE_ESCAPE = '\\'
+
+_WORD = re.compile(r'\w+')
+
+
+def _values(prefix):
+    return ', '.join(f'{prefix}.{column}' for column in FTS_COLUMNS)
+
+
+TABLES = [
+    f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {", ".join(FTS_COLUMNS)},
+        content='mtg_cards', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    ''',
+    f'CREATE TABLE IF NOT EXISTS {NAMES_TABLE} (card_name VARCHAR PRIMARY KEY)',
+    f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {NAMES_FTS_TABLE} USING fts5(
+        card_name, content='{NAMES_TABLE}',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    ''',
+]
+
+# Names are only ever added: a name no listing uses any more matches no analytics row
+TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON mtg_cards BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, {", ".join(FTS_COLUMNS)}) VALUES (new.id, {_values("new")});
+        INSERT OR IGNORE INTO {NAMES_TABLE} (card_name) SELECT new.card_name WHERE new.card_name IS NOT NULL;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON mtg_cards BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {", ".join(FTS_COLUMNS)}) VALUES ('delete', old.id, {_values("old")});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF {", ".join(FTS_COLUMNS)} ON mtg_cards BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, {", ".join(FTS_COLUMNS)}) VALUES ('delete', old.id, {_values("old")});
+        INSERT INTO {FTS_TABLE} (rowid, {", ".join(FTS_COLUMNS)}) VALUES (new.id, {_values("new")});
+        INSERT OR IGNORE INTO {NAMES_TABLE} (card_name) SELECT new.card_name WHERE new.card_name IS NOT NULL;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS {NAMES_TABLE}_insert AFTER INSERT ON {NAMES_TABLE} BEGIN
+        INSERT INTO {NAMES_FTS_TABLE} (rowid, card_name) VALUES (new.rowid, new.card_name);
+    END
+    ''',
+]
+
+# Listing ids matching :query, for use as a subquery
+MATCH_IDS_SQL = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :query'
+
+# Card names matching :query, for filtering the analytics tables
+MATCH_NAMES_SQL = (
+    f'SELECT card_name FROM {NAMES_TABLE} WHERE rowid IN '
+    f'(SELECT rowid FROM {NAMES_FTS_TABLE} WHERE {NAMES_FTS_TABLE} MATCH :query)'
+)
+
+
+def match_expression(text, column=None):
+    '''
+    FTS5 query for free text: every word must match, the last one as a prefix
+    "black lot" -> '"black" AND "lot"*'. None when text has no words
+    Whole words keep common terms cheap; only the word being typed is expanded
+    column restricts the match to one indexed column: 'card_name : (...)'
+    '''
+    words = _WORD.findall(text or '')
+    if not words:
+        return None
+    query = ' AND '.join([f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*'])
+    return f'{column} : ({query})' if column else query
+
+
+def like_pattern(text):
+    '''
+    LIKE pattern for text anywhere in a value, with LIKE_ESCAPE before its wildcards
+    '''
+    return '%' + re.sub(r'([\\%_])', r'\\\1', text) + '%'
+
+
+def has_search_index(engine):
+    '''
+    Whether the full-text tables exist in the engine's database
+    '''
+    from sqlalchemy import inspect
+    
+    if engine.dialect.name != 'sqlite':
+        return False
+    inspector = inspect(engine)
+    return inspector.has_table(FTS_TABLE) and inspector.has_table(NAMES_FTS_TABLE)
+
+
+def _populate(conn):
+    from sqlalchemy import text
+    
+    conn.execute(text(
+        f'INSERT OR IGNORE INTO {NAMES_TABLE} (card_name) '
+        f'SELECT DISTINCT card_name FROM mtg_cards WHERE card_name IS NOT NULL'
+    ))
+    for table in (FTS_TABLE, NAMES_FTS_TABLE):
+        conn.execute(text(f"INSERT INTO {table} ({table}) VALUES ('rebuild')"))
+
+
+def ensure_search_index(engine):
+    '''
+    Create the FTS5 tables and their sync triggers if they do not exist yet, and
+    index the listings already stored. Returns False when the database is not
+    SQLite or its SQLite was built without FTS5
+    '''
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    
+    if engine.dialect.name != 'sqlite':
+        return False
+    if has_search_index(engine):
+        return True
+    
+    try:
+        with engine.begin() as conn:
+            for statement in TABLES:
+                conn.execute(text(statement))
+            _populate(conn)
+            for statement in TRIGGERS:
+                conn.execute(text(statement))
+    except OperationalError:
+        return False
+    return True
+
+
+def rebuild_search_index(engine):
+    '''
+    Re-index every listing, e.g. after rows were written with the triggers missing
+    '''
+    with engine.begin() as conn:
+        _populate(conn)
+
+
+def listing_condition(engine, text, limit=None, before_id=None, after_id=None):
+    '''
+    SQLAlchemy condition on MtgCard for listings matching text
+    limit caps the match at that many listings, newest first, or oldest first
+    when after_id is given; before_id and after_id are exclusive id bounds.
+    Together they let the index stop early for one page of a keyset listing
+    Matches card_name only, with the FTS index when the database has one, else
+    with a case-insensitive substring match
+    '''
+    from sqlalchemy import column, text as sql_text
+    from mtgscraper.pipelines import MtgCard
+    
+    query = match_expression(text, 'card_name')
+    if query is None or not has_search_index(engine):
+        return MtgCard.card_name.ilike(like_pattern(text), escape=LIKE_ESCAPE)
+    
+    sql = MATCH_IDS_SQL
+    params = {'query': query}
+    if before_id is not None:
+        sql += ' AND rowid < :before_id'
+        params['before_id'] = before_id
+    if after_id is not None:
+        sql += ' AND rowid > :after_id'
+        params['after_id'] = after_id
+    sql += ' ORDER BY rowid ASC' if after_id is not None else ' ORDER BY rowid DESC'
+    if limit:
+        sql += f' LIMIT {int(limit)}'
+    return MtgCard.id.in_(sql_text(sql).bindparams(**params).columns(column('rowid')))
+
+
+def card_name_condition(engine, text, column='card_name'):
+    '''
+    (sql, params) restricting a text query to the card names matching text
+    For the dbt analytics tables, which live in the same database as mtg_cards
+    and are indexed on card_name
+    '''
+    query = match_expression(text)
+    if query is None or not has_search_index(engine):
+        return f"{column} LIKE :card_filter ESCAPE '{LIKE_ESCAPE}'", {'card_filter': like_pattern(text)}
+    return f'{column} IN ({MATCH_NAMES_SQL.replace(":query", ":card_filter")})', {'card_filter': query}
+
+
+def search_listings(engine, text, limit=20, offset=0):
+    '''
+    Listings matching text, best match first
+    Returns row dicts with id, card_name, set_name, title and rank (lower is better)
+    '''
+    from sqlalchemy import text as sql_text
+    
+    query = match_expression(text)
+    if query is None:
+        return []
+    
+    if not has_search_index(engine):
+        sql = f'''
+            SELECT id, card_name, set_name, title, 0.0 AS rank FROM mtg_cards
+            WHERE lower(card_name) LIKE lower(:pattern) ESCAPE '{LIKE_ESCAPE}' ORDER BY id DESC LIMIT :limit OFFSET :offset
+        '''
+        params = {'pattern': like_pattern(text), 'limit': limit, 'offset': offset}
+    else:
+        weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+        sql = f'''
+            SELECT rowid AS id, card_name, set_name, title, bm25({FTS_TABLE}, {weights}) AS rank
+            FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :query
+            ORDER BY rank, rowid DESC LIMIT :limit OFFSET :offset
+        '''
+        params = {'query': query, 'limit': limit, 'offset': offset}
+    
+    with engine.connect() as conn:
+        return [dict(row._mapping) for row in conn.execute(sql_text(sql), params)]
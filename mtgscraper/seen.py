@@ -0,0 +1,255 @@
+'''
+Listings already scraped
+Incremental scrapes, with the Scrapy spider, the Playwright scraper or the
+Browse API, skip the listings whose eBay item ids are in this set. A crawl
+sorted by newly listed only needs the head of each search: once most of a
+results page is listings stored before, the rest are older still.
+
+The set lives in the file SEEN_LISTINGS_PATH in settings.py. A path ending in
+.bloom is a memory-mapped Bloom filter (mtgscraper/bloom.py): a few bytes a
+listing and constant-time checks for tens of millions of listings, at a rate
+of SEEN_LISTINGS_ERROR_RATE new listings wrongly taken for seen. Any other path
+is an exact SQLite set, one integer primary key a listing, about 10 bytes on
+disk. Opening the set adds the listings stored since it was last opened, up
+from the last mtg_cards id it holds, so scrapes that are not incremental
+never touch it; incremental ones add their own listings as they commit them.
+'''
+
+import os
+import re
+import sqlite3
+
+SEEN_PATH = 'seen_listings.bloom'
+
+# Ids asked about or added per statement, well under SQLite's variable limit
+CHUNK_SIZE = 500
+
+# Default share of already-seen listings on a page that ends an incremental scrape
+INCREMENTAL_STOP_RATIO = 0.5
+
+_ITEM_ID = re.compile(r'/itm/(?:[^/?#]+/)?(\d+)')
+
+
+def listing_id(url):
+    '''
+    eBay item id of a listing URL as an int, or None:
+    'https://www.ebay.com/itm/Black-Lotus/123456789012?hash=x' -> 123456789012
+    '''
+    match = _ITEM_ID.search(url or '')
+    return int(match.group(1)) if match else None
+
+
+def open_seen(path=None, capacity=None, error_rate=None, engine=None):
+    '''
+    The seen-listings set at path, by default SEEN_LISTINGS_PATH from
+    settings.py; None when that setting is None
+    Bloom filters are created for capacity listings at error_rate, by default
+    SEEN_LISTINGS_CAPACITY and SEEN_LISTINGS_ERROR_RATE. The set is brought up
+    to date with the listings in the database at engine
+    '''
+    from mtgscraper import settings
+    from mtgscraper.bloom import DEFAULT_CAPACITY, DEFAULT_ERROR_RATE
+    
+    if path is None:
+        path = getattr(settings, 'SEEN_LISTINGS_PATH', SEEN_PATH)
+        if path is None:
+            return None
+    if path.endswith('.bloom'):
+        seen = BloomSeenListings(
+            path,
+            capacity or getattr(settings, 'SEEN_LISTINGS_CAPACITY', DEFAULT_CAPACITY),
+            error_rate or getattr(settings, 'SEEN_LISTINGS_ERROR_RATE', DEFAULT_ERROR_RATE),
+        )
+    else:
+        seen = SeenListings(path)
+    if engine is not None:
+        seen.add_from_listings(engine)
+    return seen
+
+
+def seen_from_settings(settings, engine=None):
+    '''
+    open_seen() for the SEEN_LISTINGS_* values of Scrapy settings
+    '''
+    # Settings.get() takes None for unset, but None here turns the set off
+    path = settings['SEEN_LISTINGS_PATH'] if 'SEEN_LISTINGS_PATH' in settings else SEEN_PATH
+    if not path:
+        return None
+    return open_seen(
+        path,
+        settings.getint('SEEN_LISTINGS_CAPACITY') or None,
+        settings.getfloat('SEEN_LISTINGS_ERROR_RATE') or None,
+        engine,
+    )
+
+
+def record_listings(seen, listings):
+    '''
+    Add the ids of stored listing dicts to seen, if there is one
+    '''
+    if seen is not None:
+        seen.add(listing_id(listing.get('url')) for listing in listings)
+
+
+def mostly_seen(known, total, ratio=INCREMENTAL_STOP_RATIO):
+    '''
+    Whether a newest-first results page with known of its total listings seen
+    before is the last worth fetching
+    '''
+    return known > 0 and known >= ratio * total
+
+
+class SeenSet:
+    '''
+    Methods shared by the seen-listings stores
+    '''
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def __contains__(self, listing):
+        return bool(self.known([listing]))
+    
+    def unseen(self, listings):
+        '''
+        The listing dicts whose ids are not in the set; listings without an
+        id are always kept
+        '''
+        listings = list(listings)
+        known = self.known(listing_id(listing.get('url')) for listing in listings)
+        if not known:
+            return listings
+        return [listing for listing in listings if listing_id(listing.get('url')) not in known]
+    
+    def add_from_listings(self, engine, batch_size=50000):
+        '''
+        Add the ids of the listings stored in the database at engine since the
+        set was last filled from it, e.g. by full crawls
+        Returns how many were new
+        '''
+        from sqlalchemy import select
+        from mtgscraper.pipelines import MtgCard
+        
+        added = 0
+        with engine.connect() as connection:
+            rows = connection.execution_options(yield_per=batch_size).execute(
+                select(MtgCard.id, MtgCard.url).where(MtgCard.id > self.filled_through()).order_by(MtgCard.id)
+            )
+            for batch in rows.partitions():
+                added += self.add(listing_id(url) for _, url in batch)
+                self.fill_through(batch[-1][0])
+        return added
+
+
+class SeenListings(SeenSet):
+    '''
+    Exact set of listing ids in SQLite
+    '''
+    
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS seen_listings (id INTEGER PRIMARY KEY)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS seen_filled (last_id INTEGER NOT NULL)')
+    
+    def __len__(self):
+        return self.connection.execute('SELECT count(*) FROM seen_listings').fetchone()[0]
+    
+    def filled_through(self):
+        '''
+        Last mtg_cards id the set has been filled up to
+        '''
+        return self.connection.execute('SELECT coalesce(max(last_id), 0) FROM seen_filled').fetchone()[0]
+    
+    def fill_through(self, last_id):
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('DELETE FROM seen_filled WHERE last_id < ?', (last_id,))
+            connection.execute(
+                'INSERT INTO seen_filled (last_id) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM seen_filled)', (last_id,)
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+    
+    def known(self, ids):
+        '''
+        The ids in ids that have been added before
+        '''
+        ids = list({listing for listing in ids if listing is not None})
+        found = set()
+        for offset in range(0, len(ids), CHUNK_SIZE):
+            chunk = ids[offset:offset + CHUNK_SIZE]
+            rows = self.connection.execute(
+                f'SELECT id FROM seen_listings WHERE id IN ({",".join("?" * len(chunk))})', chunk
+            )
+            found.update(listing for listing, in rows)
+        return found
+    
+    def add(self, ids):
+        '''
+        Add ids in one transaction; returns how many were new
+        '''
+        rows = [(listing,) for listing in set(ids) if listing is not None]
+        if not rows:
+            return 0
+        connection = self.connection
+        before = connection.total_changes
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany('INSERT OR IGNORE INTO seen_listings (id) VALUES (?)', rows)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return connection.total_changes - before
+    
+    def close(self):
+        self.connection.close()
+
+
+class BloomSeenListings(SeenSet):
+    '''
+    Listing ids in a memory-mapped Bloom filter: no false negatives, and
+    error_rate of unseen ids reported as seen
+    '''
+    
+    def __init__(self, path, capacity=None, error_rate=None):
+        from mtgscraper.bloom import DEFAULT_CAPACITY, DEFAULT_ERROR_RATE, BloomFilter
+        
+        self.path = path
+        self.filter = BloomFilter(path, capacity or DEFAULT_CAPACITY, error_rate or DEFAULT_ERROR_RATE)
+    
+    def __len__(self):
+        return len(self.filter)
+    
+    def filled_through(self):
+        '''
+        Last mtg_cards id the set has been filled up to, kept in the filter's header
+        '''
+        return self.filter.watermark
+    
+    def fill_through(self, last_id):
+        self.filter.advance_watermark(last_id)
+    
+    def known(self, ids):
+        '''
+        The ids in ids that have (probably) been added before
+        '''
+        return self.filter.contains_many({listing for listing in ids if listing is not None})
+    
+    def add(self, ids):
+        '''
+        Add ids; returns how many were (probably) new
+        '''
+        return self.filter.add_many({listing for listing in ids if listing is not None})
+    
+    def close(self):
+        self.filter.close()
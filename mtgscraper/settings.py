@@ -61,6 +61,7 @@ DEFAULT_REQUEST_HEADERS = {
 # Enable or disable spider middlewares
 SPIDER_MIDDLEWARES = {
     'scrapy_splash.SplashDeduplicateArgsMiddleware': 100,
+    'mtgscraper.jobs.JobProgressMiddleware': 40,
 }
 
 # Enable or disable downloader middlewares
@@ -72,11 +73,62 @@ DOWNLOADER_MIDDLEWARES = {
     'mtgscraper.middlewares.ProxyMiddleware': 590,
 }
 
+# Database for listings and summaries (see mtgscraper/storage.py)
+# None uses mtg_cards.db in the working directory; MTG_DATABASE_URL overrides it
+DATABASE_URL = None
+# Commit scraped listings every so many items or seconds (see mtgscraper/pipelines.py)
+PIPELINE_CHECKPOINT_ITEMS = 500
+PIPELINE_CHECKPOINT_SECONDS = 30
+# Listings per COPY when DATABASE_URL is PostgreSQL (see mtgscraper/postgres.py)
+POSTGRES_COPY_BATCH_SIZE = 5000
+
+# Keep the mtg_card_summary tables current after each crawl (see mtgscraper/stats.py)
+STATS_SUMMARY_ENABLED = True
+
+# Also append listings to a Hive-partitioned Parquet lake (requires pyarrow, see mtgscraper/lake.py)
+PARQUET_LAKE_ENABLED = False
+PARQUET_LAKE_DIR = 'lake'
+PARQUET_LAKE_ROW_GROUP_SIZE = 10000
+PARQUET_LAKE_MAX_FILE_MB = 128
+
+# Card list for resolving listing titles to canonical cards (see mtgscraper/cards.py)
+# None uses the bundled list; point it at a Scryfall bulk data file for every card
+CARD_INDEX_PATH = None
+
 # Splash Settings (optional - only if using Splash)
 SPLASH_URL = 'http://localhost:8050'
 DUPEFILTER_CLASS = 'scrapy_splash.SplashAwareDupeFilter'
 HTTPCACHE_STORAGE = 'scrapy_splash.SplashAwareFSCacheStorage'
 
+# Shared request frontier for crawlers on several machines or processes (see mtgscraper/frontier.py)
+# Uncomment both to queue requests and fingerprints in FRONTIER_URL instead of in memory
+# SCHEDULER = 'mtgscraper.frontier.FrontierScheduler'
+# DUPEFILTER_CLASS = 'mtgscraper.frontier.FrontierDupeFilter'
+FRONTIER_URL = 'sqlite:///frontier.db'
+FRONTIER_KEY = '%(spider)s'
+# Keep fingerprints after a finished crawl, so its pages are not fetched again
+FRONTIER_PERSIST = False
+
+# Ids of every stored listing, checked by incremental scrapes (see mtgscraper/seen.py)
+# A .bloom path is a memory-mapped Bloom filter sized for SEEN_LISTINGS_CAPACITY listings
+# at SEEN_LISTINGS_ERROR_RATE false positives; any other path an exact SQLite set; None disables it
+SEEN_LISTINGS_PATH = 'seen_listings.bloom'
+SEEN_LISTINGS_CAPACITY = 10000000
+SEEN_LISTINGS_ERROR_RATE = 0.0001
+# Database the set is brought up to date from, by default DATABASE_URL;
+# crawl-watchlist --ingest shards points it at the database the shards are merged into
+SEEN_LISTINGS_DATABASE_URL = None
+# Share of already-seen listings on a page that stops an incremental scrape
+INCREMENTAL_STOP_RATIO = 0.5
+
+# Resumable crawl jobs (see mtgscraper/jobs.py); crawl-watchlist --job sets CRAWL_JOB_PATH
+CRAWL_JOB_DIR = 'jobs'
+CRAWL_JOB_PATH = None
+# Set by crawl-watchlist --job before its workers start: the cards with a request
+# queued in the job's frontier, and whether an earlier run scheduled any pages
+CRAWL_JOB_QUEUED_CARDS = None
+CRAWL_JOB_RESUMING = False
+
 # Set settings whose default value is deprecated
 REQUEST_FINGERPRINTER_IMPLEMENTATION = '2.7'
 TWISTED_REACTOR = 'twisted.internet.asyncioreactor.AsyncioSelectorReactor'
@@ -1,12 +1,21 @@
 import scrapy
+import sys
 from datetime import datetime
-from mtgscraper.items import MtgCardItem
+from mtgscraper.items import EBAY_SELLER, EBAY_SOURCE, UNKNOWN_SET, MtgListing
+from mtgscraper.seen import INCREMENTAL_STOP_RATIO, listing_id, mostly_seen, seen_from_settings
 from urllib.parse import urlencode
 
+# eBay sort orders: best match, and newest listings first for incremental crawls
+SORT_BEST_MATCH = 12
+SORT_NEWLY_LISTED = 10
+
 
 class EbayMtgSpider(scrapy.Spider):
     '''
     Spider to scrape Magic: The Gathering card listings from eBay
+    With incremental=1 results are sorted newly listed first, listings stored
+    by earlier scrapes are skipped, and pagination stops at the first page that
+    is mostly such listings (see mtgscraper/seen.py)
     '''
     name = 'ebay'
     allowed_domains = ['ebay.com']
@@ -14,32 +23,72 @@ class EbayMtgSpider(scrapy.Spider):
     custom_settings = {
         'ITEM_PIPELINES': {
             'mtgscraper.pipelines.MtgScraperPipeline': 300,
+            'mtgscraper.pipelines.ParquetLakePipeline': 400,
         }
     }
     
-    def __init__(self, card_name=None, max_pages=3, *args, **kwargs):
+    def __init__(self, card_name=None, max_pages=3, incremental=False, *args, **kwargs):
         super(EbayMtgSpider, self).__init__(*args, **kwargs)
         self.card_name = card_name or 'Black Lotus'
         self.max_pages = int(max_pages)
         self.page_count = 0
+        self.incremental = str(incremental).lower() in ('1', 'true', 'yes')
+        self.seen = None
+    
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        if spider.incremental:
+            from scrapy import signals
+            
+            from mtgscraper.storage import get_engine
+            
+            # Shard workers write a database of their own but fill the set from the main one
+            url = crawler.settings.get('SEEN_LISTINGS_DATABASE_URL') or crawler.settings.get('DATABASE_URL')
+            engine = get_engine(url, create=True)
+            spider.seen = seen_from_settings(crawler.settings, engine)
+            if spider.seen is None:
+                spider.logger.warning('SEEN_LISTINGS_PATH is not set, incremental crawl will fetch every page')
+                return spider
+            spider.stop_ratio = crawler.settings.getfloat('INCREMENTAL_STOP_RATIO', INCREMENTAL_STOP_RATIO)
+            crawler.signals.connect(spider.close_seen, signal=signals.spider_closed)
+        return spider
+    
+    def close_seen(self):
+        self.seen.close()
+    
+    async def start(self):
+        '''
+        Scrapy 2.13+ entry point; yields the same requests as start_requests
+        '''
+        for request in self.start_requests():
+            yield request
         
     def start_requests(self):
         '''
         Generate the initial search URL for eBay
         '''
+        self.logger.info(f"Searching eBay for: {self.card_name}")
+        yield self.search_request(1)
+    
+    def search_request(self, page):
+        '''
+        Request for one page of the search results, e.g. to resume a crawl job
+        at the page after the last one it finished
+        '''
         search_query = f"mtg {self.card_name}"
         params = {
             '_nkw': search_query,
-            '_sop': 12,
+            '_sop': SORT_NEWLY_LISTED if self.incremental else SORT_BEST_MATCH,
             'LH_BIN': 1,
             'LH_ItemCondition': 3000,
         }
+        if page > 1:
+            params['_pgn'] = page
         
         base_url = 'https://www.ebay.com/sch/i.html'
         url = f"{base_url}?{urlencode(params)}"
         
-        self.logger.info(f"Searching eBay for: {self.card_name}")
-        
         # Add extra headers to look more like a real browser
         headers = {
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -54,11 +103,12 @@ class EbayMtgSpider(scrapy.Spider):
             'Cache-Control': 'max-age=0',
         }
         
-        yield scrapy.Request(
+        return scrapy.Request(
             url=url, 
             callback=self.parse,
             headers=headers,
             errback=self.errback_httpbin,
+            meta={'card': self.card_name, 'page': page, 'max_pages': self.max_pages},
             dont_filter=True
         )
     
@@ -74,6 +124,10 @@ class EbayMtgSpider(scrapy.Spider):
         Parse the search results page
         '''
         self.page_count += 1
+        # The page number travels with the request, so the limit holds when
+        # another crawler sharing the frontier fetched the previous page
+        page = response.meta.get('page', self.page_count)
+        max_pages = response.meta.get('max_pages', self.max_pages)
         
         # Extract listing items
         listings = response.css('div.s-item__info')
@@ -82,9 +136,11 @@ class EbayMtgSpider(scrapy.Spider):
             # Try alternate selectors
             listings = response.css('li.s-item')
         
+        # One timestamp per page; conditions and shipping texts repeat across
+        # listings, so they are interned to keep one copy of each
+        timestamp = datetime.now().isoformat()
+        items = []
         for listing in listings:
-            item = MtgCardItem()
-            
             # Extract card/item name
             title = listing.css('div.s-item__title span::text').get()
             if not title or title.lower() == 'shop on ebay':
@@ -104,22 +160,44 @@ class EbayMtgSpider(scrapy.Spider):
             
             # Only yield if we have minimum required data
             if title and price_text:
-                item['card_name'] = title.strip()
-                item['price'] = price_text.strip()
-                item['condition'] = condition.strip() if condition else 'Not specified'
-                item['url'] = url
-                item['source'] = 'eBay'
-                item['timestamp'] = datetime.now().isoformat()
-                item['shipping'] = shipping.strip() if shipping else 'See listing'
-                item['buy_it_now'] = True
-                item['seller'] = 'eBay Seller'
-                item['set_name'] = 'Unknown'
-                
-                yield item
+                items.append(MtgListing(
+                    card_name=title.strip(),
+                    set_name=UNKNOWN_SET,
+                    price=price_text.strip(),
+                    condition=sys.intern(condition.strip()) if condition else 'Not specified',
+                    seller=EBAY_SELLER,
+                    url=url,
+                    source=EBAY_SOURCE,
+                    timestamp=timestamp,
+                    shipping=sys.intern(shipping.strip()) if shipping else 'See listing',
+                    buy_it_now=True,
+                ))
+        
+        known = 0
+        if self.seen is not None:
+            ids = [listing_id(item.url) for item in items]
+            seen = self.seen.known(ids)
+            known = sum(1 for listing in ids if listing in seen)
+            items = [item for item, listing in zip(items, ids) if listing not in seen]
+            self.crawler.stats.inc_value('incremental/known', known)
+            self.crawler.stats.inc_value('incremental/new', len(items))
+        
+        yield from items
+        
+        # Newest first, so a page of mostly known listings has only older ones after it
+        if self.seen is not None and mostly_seen(known, known + len(items), self.stop_ratio):
+            self.logger.info(f"Page {page}: {known} of {known + len(items)} listings already seen, stopping")
+            self.crawler.stats.inc_value('incremental/stopped_early')
+            return
         
         # Follow pagination if within max_pages limit
-        if self.page_count < self.max_pages:
+        if page < max_pages:
             next_page = response.css('a.pagination__next::attr(href)').get()
             if next_page:
-                self.logger.info(f"Following pagination: Page {self.page_count + 1}")
-                yield response.follow(next_page, callback=self.parse)
+                self.logger.info(f"Following pagination: Page {page + 1}")
+                yield response.follow(
+                    next_page,
+                    callback=self.parse,
+                    errback=self.errback_httpbin,
+                    meta={'card': response.meta.get('card', self.card_name), 'page': page + 1, 'max_pages': max_pages}
+                )
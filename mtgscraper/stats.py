@@ -0,0 +1,342 @@
+'''
+Database statistics engine
+Answers the stats screen from small summary tables that are folded forward
+incrementally by the writers, or from GROUP BY queries over mtg_cards when
+exact figures are needed. Median prices are read for the top cards only
+'''
+
+from sqlalchemy import case, desc, func, inspect, or_, select, update
+
+from mtgscraper.pipelines import Base, MtgCard, MtgCardSummary, MtgDailySummary, MtgSummaryState
+
+SUMMARY_STATE_NAME = 'mtg_cards'
+
+
+def _scraped_day(timestamp):
+    '''
+    Day part of an ISO timestamp string
+    '''
+    return timestamp[:10] if timestamp else ''
+
+
+def _insert_for(conn):
+    '''
+    Dialect insert construct that supports ON CONFLICT upserts
+    '''
+    if conn.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _claim_range(conn):
+    '''
+    Advance the summary high-water mark to the current max id
+    Returns (last_id, new_last_id), or None when there is nothing to fold in
+    or another writer claimed the same range first
+    '''
+    # Create the state row if this is the first refresh; several crawl workers
+    # may get here at once. Writing first also makes SQLite take its write lock
+    # before the reads below, so they cannot go stale
+    insert = _insert_for(conn)
+    conn.execute(
+        insert(MtgSummaryState.__table__).values(name=SUMMARY_STATE_NAME, last_id=0).on_conflict_do_nothing()
+    )
+    last_id = conn.execute(
+        select(MtgSummaryState.last_id).where(MtgSummaryState.name == SUMMARY_STATE_NAME)
+    ).scalar()
+    max_id = conn.execute(select(func.max(MtgCard.id))).scalar() or 0
+    
+    if max_id <= last_id:
+        return None
+    
+    # Conditional update so two concurrent refreshes never fold the same rows twice
+    claimed = conn.execute(
+        update(MtgSummaryState)
+        .where(MtgSummaryState.name == SUMMARY_STATE_NAME, MtgSummaryState.last_id == last_id)
+        .values(last_id=max_id)
+    )
+    if claimed.rowcount != 1:
+        return None
+    return last_id, max_id
+
+
+def refresh_summary(engine):
+    '''
+    Fold listings added since the last refresh into the summary tables
+    Creates the tables on first use; returns the number of listings folded in
+    '''
+    Base.metadata.create_all(engine, tables=[
+        MtgCardSummary.__table__, MtgDailySummary.__table__, MtgSummaryState.__table__
+    ])
+    
+    with engine.begin() as conn:
+        claimed = _claim_range(conn)
+        if claimed is None:
+            return 0
+        last_id, max_id = claimed
+        
+        cards = {}
+        days = {}
+        rows = conn.execute(
+            select(MtgCard.source, MtgCard.card_name, MtgCard.price_value, MtgCard.timestamp)
+            .where(MtgCard.id > last_id, MtgCard.id <= max_id)
+        )
+        folded = 0
+        for source, card_name, value, timestamp in rows:
+            folded += 1
+            source = source or ''
+            card = cards.setdefault((source, card_name or ''), [0, 0, None, None, 0.0, None])
+            card[0] += 1
+            if value is not None:
+                card[1] += 1
+                card[2] = value if card[2] is None else min(card[2], value)
+                card[3] = value if card[3] is None else max(card[3], value)
+                card[4] += value
+            if timestamp and (card[5] is None or timestamp > card[5]):
+                card[5] = timestamp
+            
+            day_key = (_scraped_day(timestamp), source)
+            days[day_key] = days.get(day_key, 0) + 1
+        
+        if cards:
+            _upsert_cards(conn, cards)
+            _upsert_days(conn, days)
+    
+    return folded
+
+
+def _upsert_cards(conn, cards):
+    table = MtgCardSummary.__table__
+    insert = _insert_for(conn)
+    
+    stmt = insert(table)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.source, table.c.card_name],
+        set_={
+            'listings': table.c.listings + excluded.listings,
+            'priced_listings': table.c.priced_listings + excluded.priced_listings,
+            'min_price': case(
+                (table.c.min_price.is_(None), excluded.min_price),
+                (excluded.min_price < table.c.min_price, excluded.min_price),
+                else_=table.c.min_price
+            ),
+            'max_price': case(
+                (table.c.max_price.is_(None), excluded.max_price),
+                (excluded.max_price > table.c.max_price, excluded.max_price),
+                else_=table.c.max_price
+            ),
+            'price_total': func.coalesce(table.c.price_total, 0.0) + func.coalesce(excluded.price_total, 0.0),
+            'newest_timestamp': case(
+                (table.c.newest_timestamp.is_(None), excluded.newest_timestamp),
+                (excluded.newest_timestamp > table.c.newest_timestamp, excluded.newest_timestamp),
+                else_=table.c.newest_timestamp
+            ),
+        }
+    )
+    conn.execute(stmt, [
+        {
+            'source': source,
+            'card_name': card_name,
+            'listings': listings,
+            'priced_listings': priced,
+            'min_price': low,
+            'max_price': high,
+            'price_total': total,
+            'newest_timestamp': newest,
+        }
+        for (source, card_name), (listings, priced, low, high, total, newest) in cards.items()
+    ])
+
+
+def _upsert_days(conn, days):
+    table = MtgDailySummary.__table__
+    insert = _insert_for(conn)
+    
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.source],
+        set_={'listings': table.c.listings + stmt.excluded.listings}
+    )
+    conn.execute(stmt, [
+        {'day': day, 'source': source, 'listings': listings}
+        for (day, source), listings in days.items()
+    ])
+
+
+def rebuild_summary(engine):
+    '''
+    Drop and rebuild the summary tables from scratch
+    '''
+    tables = [MtgCardSummary.__table__, MtgDailySummary.__table__, MtgSummaryState.__table__]
+    Base.metadata.drop_all(engine, tables=tables)
+    return refresh_summary(engine)
+
+
+def _median_prices(conn, names):
+    '''
+    Median price of each card name, read from the middle of the card's prices
+    in order; the index on (card_name, price_value) serves both queries without
+    sorting or loading the card's listings
+    '''
+    medians = {}
+    for name in names:
+        # The summary tables and the scan count listings without a name as ''
+        named = MtgCard.card_name == name if name else or_(MtgCard.card_name.is_(None), MtgCard.card_name == '')
+        priced = (named, MtgCard.price_value.is_not(None))
+        count = conn.execute(select(func.count()).where(*priced)).scalar()
+        middle = conn.execute(
+            select(MtgCard.price_value).where(*priced)
+            .order_by(MtgCard.price_value)
+            .offset((count - 1) // 2)
+            .limit(2 - count % 2)
+        ).scalars().all() if count else []
+        medians[name] = sum(middle) / len(middle) if middle else None
+    return medians
+
+
+def summary_stats(engine, top=10, days=14):
+    '''
+    Statistics read from the summary tables, as of their last refresh
+    Only reads; the writers fold new listings in with refresh_summary()
+    Cost depends on the number of distinct cards, plus the top cards' listings for their median
+    Falls back to scan_stats() when no summary has been built yet
+    '''
+    if not inspect(engine).has_table(MtgSummaryState.__tablename__):
+        return scan_stats(engine, top=top, days=days)
+    
+    card = MtgCardSummary
+    with engine.connect() as conn:
+        built = conn.execute(
+            select(MtgSummaryState.last_id).where(MtgSummaryState.name == SUMMARY_STATE_NAME)
+        ).first()
+        if built is None:
+            return scan_stats(engine, top=top, days=days)
+        
+        source_rows = conn.execute(
+            select(card.source, func.sum(card.listings), func.max(card.newest_timestamp))
+            .group_by(card.source)
+            .order_by(desc(func.sum(card.listings)))
+        ).all()
+        
+        card_listings = func.sum(card.listings).label('listings')
+        priced = func.sum(card.priced_listings)
+        card_rows = conn.execute(
+            select(
+                card.card_name,
+                card_listings,
+                func.min(card.min_price),
+                func.max(card.max_price),
+                case((priced > 0, func.sum(card.price_total) / priced), else_=None),
+                func.max(card.newest_timestamp),
+            )
+            .group_by(card.card_name)
+            .order_by(desc(card_listings), card.card_name)
+            .limit(top)
+        ).all()
+        
+        day = MtgDailySummary
+        day_rows = conn.execute(
+            select(day.day, func.sum(day.listings))
+            .group_by(day.day)
+            .order_by(desc(day.day))
+            .limit(days)
+        ).all()
+        
+        medians = _median_prices(conn, [row[0] for row in card_rows])
+    
+    return {
+        'total': sum(count for _, count, _ in source_rows),
+        'newest': max((newest for _, _, newest in source_rows if newest), default=None),
+        'sources': {source: count for source, count, _ in source_rows},
+        'cards': [
+            {
+                'card_name': name,
+                'listings': listings,
+                'min_price': low,
+                'max_price': high,
+                'avg_price': avg,
+                'median_price': medians[name],
+                'newest': newest,
+            }
+            for name, listings, low, high, avg, newest in card_rows
+        ],
+        'per_day': [{'day': d, 'listings': count} for d, count in day_rows],
+        'exact': False,
+    }
+
+
+def scan_stats(engine, top=10, days=14):
+    '''
+    Exact statistics from GROUP BY queries over mtg_cards
+    The database does the counting; only the grouped rows reach Python
+    '''
+    card_name = func.coalesce(MtgCard.card_name, '')
+    source = func.coalesce(MtgCard.source, '')
+    day = func.coalesce(func.substr(MtgCard.timestamp, 1, 10), '')
+    
+    with engine.connect() as conn:
+        source_rows = conn.execute(
+            select(source, func.count(), func.max(MtgCard.timestamp))
+            .group_by(source)
+            .order_by(desc(func.count()))
+        ).all()
+        
+        listings = func.count().label('listings')
+        card_rows = conn.execute(
+            select(
+                card_name,
+                listings,
+                func.min(MtgCard.price_value),
+                func.max(MtgCard.price_value),
+                func.avg(MtgCard.price_value),
+                func.max(MtgCard.timestamp),
+            )
+            .group_by(card_name)
+            .order_by(desc(listings), card_name)
+            .limit(top)
+        ).all()
+        
+        day_rows = conn.execute(
+            select(day, func.count())
+            .group_by(day)
+            .order_by(desc(day))
+            .limit(days)
+        ).all()
+        
+        medians = _median_prices(conn, [row[0] for row in card_rows])
+    
+    return {
+        'total': sum(count for _, count, _ in source_rows),
+        'newest': max((newest for _, _, newest in source_rows if newest), default=None),
+        'sources': {name: count for name, count, _ in source_rows},
+        'cards': [
+            {
+                'card_name': name,
+                'listings': count,
+                'min_price': low,
+                'max_price': high,
+                'avg_price': avg,
+                'median_price': medians[name],
+                'newest': newest,
+            }
+            for name, count, low, high, avg, newest in card_rows
+        ],
+        'per_day': [{'day': d, 'listings': count} for d, count in day_rows],
+        'exact': True,
+    }
+
+
+def collect_stats(engine, top=10, days=14, exact=False, refresh=False):
+    '''
+    Database statistics for the stats screen
+    exact=True groups every listing; otherwise the summary tables are used,
+    after folding in new listings first when refresh=True
+    '''
+    if exact:
+        return scan_stats(engine, top=top, days=days)
+    if refresh:
+        refresh_summary(engine)
+    return summary_stats(engine, top=top, days=days)
@@ -0,0 +1,224 @@
+'''
+Process-wide database access
+The CLI and the Scrapy pipeline get their engine from get_engine(), which
+creates one engine per database URL and keeps it for the life of the process.
+Interactive use then reuses the connection pool, SQLAlchemy's compiled SQL
+cache and each sqlite3 connection's prepared statements across menu choices,
+and the table creation, schema upgrade and search index checks run once per
+process instead of on every open.
+
+The database is mtg_cards.db in the working directory unless DATABASE_URL in
+settings.py or the MTG_DATABASE_URL environment variable names another one.
+'''
+
+import os
+import threading
+
+DATABASE_FILE = 'mtg_cards.db'
+
+# Compiled statements SQLAlchemy keeps per engine, and prepared statements
+# sqlite3 keeps per connection
+QUERY_CACHE_SIZE = 1000
+STATEMENT_CACHE_SIZE = 256
+
+# How long an SQLite writer waits for another one to commit
+BUSY_TIMEOUT_SECONDS = 30
+
+_engines = {}
+_prepared = set()
+_sessions = {}
+_lock = threading.RLock()
+
+
+def database_url(url=None):
+    '''
+    URL of the scraper database: url if given, else MTG_DATABASE_URL, else
+    DATABASE_URL from settings.py, else mtg_cards.db in the working directory
+    '''
+    if url:
+        return url
+    url = os.environ.get('MTG_DATABASE_URL')
+    if not url:
+        from mtgscraper import settings
+        
+        url = getattr(settings, 'DATABASE_URL', None)
+    return url or f'sqlite:///{os.path.join(os.getcwd(), DATABASE_FILE)}'
+
+
+def database_path(url=None):
+    '''
+    File of an SQLite database, or None for an in-memory or server database
+    '''
+    from sqlalchemy.engine import make_url
+    
+    parsed = make_url(database_url(url))
+    if parsed.get_backend_name() != 'sqlite' or parsed.database in (None, '', ':memory:'):
+        return None
+    return os.path.abspath(parsed.database)
+
+
+def database_exists(url=None):
+    '''
+    Whether the database file exists; server databases are assumed to
+    '''
+    path = database_path(url)
+    return path is None or os.path.exists(path)
+
+
+def database_name(url=None):
+    '''
+    The database for messages: its file name, or its URL without the password
+    '''
+    from sqlalchemy.engine import make_url
+    
+    path = database_path(url)
+    if path:
+        return os.path.relpath(path) if path.startswith(os.getcwd() + os.sep) else path
+    return make_url(database_url(url)).render_as_string(hide_password=True)
+
+
+def _create_engine(url):
+    from sqlalchemy import create_engine
+    from sqlalchemy.engine import make_url
+    
+    options = {'query_cache_size': QUERY_CACHE_SIZE}
+    if make_url(url).get_backend_name() == 'sqlite':
+        options['connect_args'] = {'cached_statements': STATEMENT_CACHE_SIZE, 'timeout': BUSY_TIMEOUT_SECONDS}
+    try:
+        return create_engine(url, **options)
+    except ModuleNotFoundError as e:
+        # The database driver, e.g. psycopg2 for postgresql:// URLs
+        raise ImportError(f'{e.name} is not installed! Install with: pip install {e.name}') from e
+
+
+def prepare_database(engine):
+    '''
+    Create the tables that do not exist, upgrade mtg_cards from older
+    versions and build the search index
+    On PostgreSQL mtg_cards is partitioned by month (see mtgscraper.postgres)
+    '''
+    from mtgscraper.normalize import upgrade_listings_table
+    from mtgscraper.pipelines import Base
+    from mtgscraper.search import ensure_search_index
+    
+    if engine.dialect.name == 'postgresql':
+        from mtgscraper.postgres import create_listings_table
+        create_listings_table(engine)
+    Base.metadata.create_all(engine)
+    upgrade_listings_table(engine)
+    ensure_search_index(engine)
+
+
+def get_engine(url=None, create=False):
+    '''
+    The shared engine for the database at url (see database_url)
+    With create=True the tables and search index are created if they do not
+    exist, the first time this process asks for them
+    '''
+    url = database_url(url)
+    with _lock:
+        engine = _engines.get(url)
+        if engine is None:
+            engine = _engines[url] = _create_engine(url)
+        if create and url not in _prepared:
+            prepare_database(engine)
+            _prepared.add(url)
+    return engine
+
+
+def session_factory(url=None):
+    '''
+    The shared sessionmaker for the database at url, with its tables created
+    '''
+    from sqlalchemy.orm import sessionmaker
+    
+    url = database_url(url)
+    with _lock:
+        factory = _sessions.get(url)
+        if factory is None:
+            factory = _sessions[url] = sessionmaker(bind=get_engine(url, create=True))
+    return factory
+
+
+def insert_listings(connection, rows):
+    '''
+    Insert listing dicts (MtgCard column names) in connection's transaction:
+    with COPY on PostgreSQL, as one executemany elsewhere
+    Each dict gets the 'id' of its row, where the database can return it, so
+    copies such as the Parquet lake can be keyed the same way
+    Returns the number of rows inserted
+    '''
+    from sqlalchemy import insert
+    from mtgscraper.pipelines import MtgCard
+    
+    if not rows:
+        return 0
+    if connection.dialect.name == 'postgresql':
+        from mtgscraper.postgres import copy_listings
+        return copy_listings(connection, rows)
+    if connection.dialect.insert_executemany_returning_sort_by_parameter_order:
+        result = connection.execute(insert(MtgCard).returning(MtgCard.id, sort_by_parameter_order=True), rows)
+        for row, listing_id in zip(rows, result.scalars()):
+            row['id'] = listing_id
+    else:
+        connection.execute(insert(MtgCard), rows)
+    return len(rows)
+
+
+def use_wal(url=None):
+    '''
+    Switch an SQLite database to write-ahead logging, which lets several
+    processes read while one writes; the mode is stored in the file
+    Returns False for other databases
+    '''
+    from sqlalchemy import text
+    
+    engine = get_engine(url)
+    if engine.dialect.name != 'sqlite':
+        return False
+    with engine.connect() as conn:
+        return conn.execute(text('PRAGMA journal_mode=WAL')).scalar() == 'wal'
+
+
+def merge_shards(shard_urls, url=None, batch_size=5000):
+    '''
+    Copy the listings of per-worker shard databases into the database at url
+    Each shard is copied in one transaction, then its engine is disposed and,
+    for a shard file, the file deleted so it is never merged twice. Listings
+    get new ids in the target. Returns the number of listings copied
+    '''
+    from sqlalchemy import select
+    from mtgscraper.pipelines import MtgCard
+    
+    target = get_engine(url, create=True)
+    columns = [column for column in MtgCard.__table__.columns if column.name != 'id']
+    merged = 0
+    for shard_url in shard_urls:
+        path = database_path(shard_url)
+        if path and not os.path.exists(path):
+            continue
+        source = get_engine(shard_url)
+        with source.connect() as reader, target.begin() as writer:
+            rows = reader.execution_options(yield_per=batch_size).execute(select(*columns).order_by(MtgCard.id))
+            for batch in rows.partitions():
+                merged += insert_listings(writer, [dict(row._mapping) for row in batch])
+        dispose(shard_url)
+        if path:
+            for suffix in ('', '-wal', '-shm', '-journal'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    return merged
+
+
+def dispose(url=None):
+    '''
+    Close the pooled connections to the database at url and forget its engine,
+    e.g. before deleting the database file
+    '''
+    url = database_url(url)
+    with _lock:
+        engine = _engines.pop(url, None)
+        _prepared.discard(url)
+        _sessions.pop(url, None)
+    if engine is not None:
+        engine.dispose()